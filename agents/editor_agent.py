@@ -1,7 +1,12 @@
 """Editor Agent - Polishes and refines final article."""
+import re
 from api_client import APIClient
 from config import Config
 from utils import read_file
+from prompt_builder import build_prompt
+from citation_validator import CitationValidator
+
+URL_PATTERN = re.compile(r'https?://[^\s\)\]>"]+')
 
 class EditorAgent:
     """Agent 3: Performs final editing and polish."""
@@ -9,9 +14,17 @@ class EditorAgent:
     def __init__(self):
         """Initialize Editor agent."""
         # Pass the specific model for Editor agent if using OpenAI
-        model = Config.OPENAI_EDITOR_MODEL if Config.AI_PROVIDER == 'openai' else None
+        model = Config.OPENAI_EDITOR_MODEL if Config.AI_PROVIDER in ('openai', 'auto') else None
         self.client = APIClient(model=model)
         self.temperature = Config.EDITOR_TEMPERATURE
+        
+        # Model cascade: clients for smaller per-pass models, and what the last finished polish did
+        self._pass_clients = {}
+        self.cascade_stats = {'passes': 0, 'escalated': 0, 'reasons': []}
+        self.quality_analyzer = None
+        if Config.ENABLE_EDITOR_CASCADE and Config.ENABLE_QUALITY_SCORING:
+            from quality_analyzer import QualityAnalyzer
+            self.quality_analyzer = QualityAnalyzer()
     
     def polish_article(self, article, rules_path):
         """
@@ -28,13 +41,29 @@ class EditorAgent:
         if not rules:
             raise ValueError("Editor rules file is missing or empty")
         
-        polish_prompt = f"""You are a professional editor performing final polish on an article.
-
-# EDITING RULES AND GUIDELINES
-{rules}
-
-# ARTICLE TO POLISH
-{article}
+        polished_article = self._run_passes(article, rules, self._single_pass_plan())
+        return polished_article
+    
+    async def polish_article_async(self, article, rules_path):
+        """
+        Polish and refine article without blocking the event loop.
+        
+        Args:
+            article: The selected article from LLMON agent
+            rules_path: Path to editor_rules.md (editing guidelines)
+        
+        Returns:
+            Polished final article
+        """
+        rules = read_file(rules_path)
+        if not rules:
+            raise ValueError("Editor rules file is missing or empty")
+        
+        return await self._run_passes_async(article, rules, self._single_pass_plan())
+    
+    def _polish_prompt(self, article, rules):
+        """Single pass: Full polish and refinement."""
+        task = """You are a professional editor performing final polish on an article.
 
 # YOUR TASK
 Review and polish this article by:
@@ -49,8 +78,11 @@ Do NOT make major structural changes. Focus on polish and refinement.
 
 Generate the COMPLETE polished article now:"""
 
-        polished_article = self.client.generate_content(polish_prompt, self.temperature)
-        return polished_article
+        return build_prompt(
+            [("EDITING RULES AND GUIDELINES", rules)],
+            [("ARTICLE TO POLISH", article)],
+            task
+        )
     
     def apply_minor_revisions(self, article, revision_notes):
         """
@@ -63,13 +95,7 @@ Generate the COMPLETE polished article now:"""
         Returns:
             Article with minor revisions applied
         """
-        revision_prompt = f"""You are a professional editor applying minor revisions to a polished article.
-
-# CURRENT ARTICLE
-{article}
-
-# REVISION REQUESTS
-{revision_notes}
+        task = """You are a professional editor applying minor revisions to a polished article.
 
 # YOUR TASK
 Apply the requested minor revisions while:
@@ -80,7 +106,13 @@ Apply the requested minor revisions while:
 
 Generate the COMPLETE revised article now:"""
 
-        revised_article = self.client.generate_content(revision_prompt, self.temperature)
+        revision_prompt = build_prompt([], [
+            ("CURRENT ARTICLE", article),
+            ("REVISION REQUESTS", revision_notes)
+        ], task)
+        revised_article = self.client.generate_content(
+            revision_prompt, self.temperature, task='revision', source_text=article
+        )
         return revised_article
     
     def polish_article_multipass(self, article, rules_path):
@@ -98,29 +130,184 @@ Generate the COMPLETE revised article now:"""
         if not rules:
             raise ValueError("Editor rules file is missing or empty")
         
-        # Pass 1: Grammar and Mechanics
-        article = self._grammar_pass(article, rules)
+        return self._run_passes(article, rules, self._multipass_plan())
+    
+    async def polish_article_multipass_async(self, article, rules_path):
+        """
+        Polish article using multiple focused editing passes without blocking the event loop.
         
-        # Pass 2: Style and Voice
-        article = self._style_pass(article, rules)
+        Args:
+            article: The article to polish
+            rules_path: Path to editor_rules.md
         
-        # Pass 3: Flow and Transitions
-        article = self._flow_pass(article, rules)
+        Returns:
+            Polished article after all passes
+        """
+        rules = read_file(rules_path)
+        if not rules:
+            raise ValueError("Editor rules file is missing or empty")
+        
+        return await self._run_passes_async(article, rules, self._multipass_plan())
+    
+    def _single_pass_plan(self):
+        """Editing plan for single-pass polishing."""
+        return [('polish', self._polish_prompt, self.temperature)]
+    
+    def _multipass_plan(self):
+        """
+        Editing plan for multi-pass polishing.
         
-        # Pass 4: Final Consistency Check
-        article = self._consistency_pass(article, rules)
+        Returns:
+            Ordered list of (pass_name, prompt_builder, temperature) steps
+        """
+        return [
+            # Pass 1: Grammar and Mechanics
+            ('grammar', self._grammar_prompt, self.temperature - 0.1),  # Lower temp for precision
+            # Pass 2: Style and Voice
+            ('style', self._style_prompt, self.temperature),
+            # Pass 3: Flow and Transitions
+            ('flow', self._flow_prompt, self.temperature),
+            # Pass 4: Final Consistency Check
+            ('consistency', self._consistency_prompt, self.temperature - 0.1)  # Lower temp for precision
+        ]
         
+    def _run_passes(self, article, rules, plan, tool_review=False):
+        """
+        Run each editing pass of a plan in order, feeding output forward.
+        
+        A pass with a smaller model (EDITOR_PASS_MODELS / OPENAI_EDITOR_FAST_MODEL)
+        runs on it first; in cascade mode the result is checked locally and the
+        pass is rerun on the editor model if a check fails. The cascade
+        counts are kept locally (one EditorAgent may polish several articles
+        at once) and stored in self.cascade_stats when the polish finishes.
+        """
+        stats = {'passes': 0, 'escalated': 0, 'reasons': []}
+        for name, prompt_builder, temperature in plan:
+            prompt = prompt_builder(article, rules)
+            client, cascaded = self._pass_client(name)
+            edited = client.generate_content(
+                prompt, temperature, use_cache=True, hedge=True, task='edit_pass', source_text=article
+            )
+            if cascaded and self._needs_escalation(name, article, edited, stats, tool_review):
+                edited = self.client.generate_content(
+                    prompt, temperature, use_cache=True, hedge=True, task='edit_pass', source_text=article
+                )
+            article = edited
+        self.cascade_stats = stats
         return article
     
-    def _grammar_pass(self, article, rules):
+    async def _run_passes_async(self, article, rules, plan, tool_review=False):
+        """Async counterpart of _run_passes()."""
+        stats = {'passes': 0, 'escalated': 0, 'reasons': []}
+        for name, prompt_builder, temperature in plan:
+            prompt = prompt_builder(article, rules)
+            client, cascaded = self._pass_client(name)
+            edited = await client.async_client.generate_content(
+                prompt, temperature, use_cache=True, hedge=True, task='edit_pass', source_text=article
+            )
+            if cascaded and self._needs_escalation(name, article, edited, stats, tool_review):
+                edited = await self.client.async_client.generate_content(
+                    prompt, temperature, use_cache=True, hedge=True, task='edit_pass', source_text=article
+                )
+            article = edited
+        self.cascade_stats = stats
+        return article
+    
+    def _pass_client(self, pass_name):
+        """
+        Pick the client for the first attempt at an editing pass.
+        
+        Args:
+            pass_name: Name from the editing plan (e.g. 'grammar', 'format')
+        
+        Returns:
+            (client, cascaded) - cascaded is True when the client runs a smaller
+            model whose output must pass the local checks
+        """
+        model = Config.EDITOR_PASS_MODELS.get(pass_name)
+        if not model and Config.ENABLE_EDITOR_CASCADE:
+            model = Config.OPENAI_EDITOR_FAST_MODEL
+        
+        # Gemini runs a single model, so there is nothing to cascade from
+        if not model or model == self.client.model or Config.AI_PROVIDER == 'gemini':
+            return self.client, False
+        
+        if model not in self._pass_clients:
+            self._pass_clients[model] = APIClient(model=model)
+        
+        # Smaller-model passes stream to the same place as the editor's own
+        client = self._pass_clients[model]
+        client.stream_handler = self.client.stream_handler
+        return client, Config.ENABLE_EDITOR_CASCADE
+    
+    def _needs_escalation(self, pass_name, before, after, stats, tool_review=False):
+        """
+        Check a small model's pass output and decide whether to rerun it on the editor model.
+        
+        Args:
+            pass_name: Name of the editing pass
+            before: Article the pass was given
+            after: Article the small model returned
+            stats: This polish's cascade counts (updated in place)
+            tool_review: Also enforce the tool review format rules
+        
+        Returns:
+            True if the pass should be escalated
+        """
+        reasons = self._cascade_failures(before, after, tool_review)
+        stats['passes'] += 1
+        if reasons:
+            stats['escalated'] += 1
+            stats['reasons'].append(f"{pass_name}: {'; '.join(reasons)}")
+        return bool(reasons)
+    
+    def _cascade_failures(self, before, after, tool_review=False):
+        """
+        Local checks a cheap editing pass must pass (no API calls).
+        
+        Returns:
+            List of failure descriptions (empty if the output is acceptable)
+        """
+        if not after or not after.strip():
+            return ["empty output"]
+        
+        failures = []
+        before_words, after_words = len(before.split()), len(after.split())
+        if after_words < before_words * Config.EDITOR_CASCADE_MIN_LENGTH_RATIO:
+            failures.append(f"shortened to {after_words} of {before_words} words")
+        
+        # Editing must not add, drop or rewrite links
+        before_urls, after_urls = self._cited_urls(before), self._cited_urls(after)
+        if after_urls - before_urls:
+            failures.append(f"{len(after_urls - before_urls)} new URL(s)")
+        if before_urls - after_urls:
+            failures.append(f"{len(before_urls - after_urls)} URL(s) dropped")
+        
+        if tool_review:
+            before_issues = set(self._validate_tool_review_format(before)['issues'])
+            new_issues = [issue for issue in self._validate_tool_review_format(after)['issues']
+                          if issue not in before_issues]
+            if new_issues:
+                failures.append(f"format: {new_issues[0]}")
+        
+        if self.quality_analyzer:
+            drop = (self.quality_analyzer.analyze(before)['overall_score']
+                    - self.quality_analyzer.analyze(after)['overall_score'])
+            if drop > Config.EDITOR_CASCADE_MAX_QUALITY_DROP:
+                failures.append(f"quality score dropped {drop:.1f} points")
+        
+        return failures
+    
+    @staticmethod
+    def _cited_urls(article):
+        """URLs in markdown links plus bare URLs."""
+        urls = {citation['url'] for citation in CitationValidator().extract_citations_from_content(article)}
+        urls.update(url.rstrip('.,;:') for url in URL_PATTERN.findall(article))
+        return urls
+    
+    def _grammar_prompt(self, article, rules):
         """First pass: Focus on grammar, spelling, and punctuation."""
-        prompt = f"""You are a professional copy editor performing a GRAMMAR AND MECHANICS pass.
-
-# EDITING GUIDELINES
-{rules}
-
-# ARTICLE
-{article}
+        task = """You are a professional copy editor performing a GRAMMAR AND MECHANICS pass.
 
 # YOUR TASK - PASS 1: GRAMMAR & MECHANICS
 Focus ONLY on:
@@ -135,17 +322,15 @@ Do NOT make stylistic changes or reorganize content. Fix only mechanical issues.
 
 Generate the COMPLETE article with grammar corrections:"""
 
-        return self.client.generate_content(prompt, self.temperature - 0.1)  # Lower temp for precision
+        return build_prompt(
+            [("EDITING GUIDELINES", rules)],
+            [("ARTICLE", article)],
+            task
+        )
     
-    def _style_pass(self, article, rules):
+    def _style_prompt(self, article, rules):
         """Second pass: Focus on style, voice, and tone consistency."""
-        prompt = f"""You are a professional editor performing a STYLE AND VOICE pass.
-
-# EDITING GUIDELINES
-{rules}
-
-# ARTICLE (after grammar pass)
-{article}
+        task = """You are a professional editor performing a STYLE AND VOICE pass.
 
 # YOUR TASK - PASS 2: STYLE & VOICE
 Focus on:
@@ -160,17 +345,15 @@ Do NOT reorganize structure. Focus on stylistic improvements.
 
 Generate the COMPLETE article with style improvements:"""
 
-        return self.client.generate_content(prompt, self.temperature)
+        return build_prompt(
+            [("EDITING GUIDELINES", rules)],
+            [("ARTICLE (after grammar pass)", article)],
+            task
+        )
     
-    def _flow_pass(self, article, rules):
+    def _flow_prompt(self, article, rules):
         """Third pass: Focus on flow, transitions, and coherence."""
-        prompt = f"""You are a professional editor performing a FLOW AND TRANSITIONS pass.
-
-# EDITING GUIDELINES
-{rules}
-
-# ARTICLE (after style pass)
-{article}
+        task = """You are a professional editor performing a FLOW AND TRANSITIONS pass.
 
 # YOUR TASK - PASS 3: FLOW & TRANSITIONS
 Focus on:
@@ -185,17 +368,15 @@ Make only minor structural adjustments to improve flow.
 
 Generate the COMPLETE article with improved flow:"""
 
-        return self.client.generate_content(prompt, self.temperature)
+        return build_prompt(
+            [("EDITING GUIDELINES", rules)],
+            [("ARTICLE (after style pass)", article)],
+            task
+        )
     
-    def _consistency_pass(self, article, rules):
+    def _consistency_prompt(self, article, rules):
         """Fourth pass: Final consistency and quality check."""
-        prompt = f"""You are a professional editor performing a FINAL CONSISTENCY CHECK.
-
-# EDITING GUIDELINES
-{rules}
-
-# ARTICLE (after flow pass)
-{article}
+        task = """You are a professional editor performing a FINAL CONSISTENCY CHECK.
 
 # YOUR TASK - PASS 4: FINAL CONSISTENCY
 Perform final checks on:
@@ -210,7 +391,11 @@ This is the final pass - ensure everything is perfect.
 
 Generate the COMPLETE polished article:"""
 
-        return self.client.generate_content(prompt, self.temperature - 0.1)  # Lower temp for precision
+        return build_prompt(
+            [("EDITING GUIDELINES", rules)],
+            [("ARTICLE (after flow pass)", article)],
+            task
+        )
     
     def polish_article_tool_review(self, article, rules_path):
         """
@@ -227,34 +412,51 @@ Generate the COMPLETE polished article:"""
         if not rules:
             raise ValueError("Tool review editor rules file is missing or empty")
         
+        return self._run_passes(article, rules, self._tool_review_plan(), tool_review=True)
+    
+    async def polish_article_tool_review_async(self, article, rules_path):
+        """
+        Polish tool review with special format validation without blocking the event loop.
+        
+        Args:
+            article: The tool review to polish
+            rules_path: Path to editor_tool_review_rules.md
+        
+        Returns:
+            Polished tool review
+        """
+        rules = read_file(rules_path)
+        if not rules:
+            raise ValueError("Tool review editor rules file is missing or empty")
+        
+        return await self._run_passes_async(article, rules, self._tool_review_plan(), tool_review=True)
+    
+    def _tool_review_plan(self):
+        """
+        Editing plan for tool reviews.
+        
+        Returns:
+            Ordered list of (pass_name, prompt_builder, temperature) steps
+        """
         # Multi-pass editing for tool reviews
         if Config.ENABLE_MULTIPASS_EDITING:
-            # Pass 1: Format compliance (critical for tool reviews)
-            article = self._tool_review_format_pass(article, rules)
+            return [
+                # Pass 1: Format compliance (critical for tool reviews)
+                ('format', self._tool_review_format_prompt, 0.4),  # Low temp for precision
+                # Pass 2: Factual & structural check
+                ('factual', self._tool_review_factual_prompt, 0.4),
+                # Pass 3: Grammar, clarity & flow
+                ('clarity', self._tool_review_clarity_prompt, 0.5),
+                # Pass 4: Final consistency & polish
+                ('final', self._tool_review_final_prompt, 0.4)
+            ]
             
-            # Pass 2: Factual & structural check
-            article = self._tool_review_factual_pass(article, rules)
+        # Single-pass editing
+        return [('single', self._tool_review_single_prompt, self.temperature)]
             
-            # Pass 3: Grammar, clarity & flow
-            article = self._tool_review_clarity_pass(article, rules)
-            
-            # Pass 4: Final consistency & polish
-            article = self._tool_review_final_pass(article, rules)
-        else:
-            # Single-pass editing
-            article = self._tool_review_single_pass(article, rules)
-        
-        return article
-    
-    def _tool_review_format_pass(self, article, rules):
+    def _tool_review_format_prompt(self, article, rules):
         """First pass: Format compliance for tool reviews."""
-        prompt = f"""You are a professional editor performing TOOL REVIEW FORMAT COMPLIANCE check.
-
-# TOOL REVIEW EDITING RULES
-{rules}
-
-# TOOL REVIEW ARTICLE
-{article}
+        task = """You are a professional editor performing TOOL REVIEW FORMAT COMPLIANCE check.
 
 # YOUR TASK - PASS 1: FORMAT COMPLIANCE (CRITICAL)
 Focus ONLY on format violations:
@@ -278,17 +480,15 @@ Do NOT make other changes in this pass. Focus solely on format compliance.
 
 Generate the COMPLETE article with format fixes:"""
 
-        return self.client.generate_content(prompt, 0.4)  # Low temp for precision
+        return build_prompt(
+            [("TOOL REVIEW EDITING RULES", rules)],
+            [("TOOL REVIEW ARTICLE", article)],
+            task
+        )
     
-    def _tool_review_factual_pass(self, article, rules):
+    def _tool_review_factual_prompt(self, article, rules):
         """Second pass: Factual accuracy and structural check."""
-        prompt = f"""You are a professional editor performing TOOL REVIEW FACTUAL CHECK.
-
-# TOOL REVIEW EDITING RULES
-{rules}
-
-# TOOL REVIEW ARTICLE (after format pass)
-{article}
+        task = """You are a professional editor performing TOOL REVIEW FACTUAL CHECK.
 
 # YOUR TASK - PASS 2: FACTUAL & STRUCTURAL CHECK
 Focus on:
@@ -303,17 +503,15 @@ Do NOT change the narrative voice or story elements.
 
 Generate the COMPLETE article with factual checks:"""
 
-        return self.client.generate_content(prompt, 0.4)
+        return build_prompt(
+            [("TOOL REVIEW EDITING RULES", rules)],
+            [("TOOL REVIEW ARTICLE (after format pass)", article)],
+            task
+        )
     
-    def _tool_review_clarity_pass(self, article, rules):
+    def _tool_review_clarity_prompt(self, article, rules):
         """Third pass: Grammar, clarity, and flow."""
-        prompt = f"""You are a professional editor performing TOOL REVIEW CLARITY & FLOW pass.
-
-# TOOL REVIEW EDITING RULES
-{rules}
-
-# TOOL REVIEW ARTICLE (after factual pass)
-{article}
+        task = """You are a professional editor performing TOOL REVIEW CLARITY & FLOW pass.
 
 # YOUR TASK - PASS 3: GRAMMAR, CLARITY & FLOW
 Focus on:
@@ -331,17 +529,15 @@ BUT PRESERVE:
 
 Generate the COMPLETE article with clarity improvements:"""
 
-        return self.client.generate_content(prompt, 0.5)
+        return build_prompt(
+            [("TOOL REVIEW EDITING RULES", rules)],
+            [("TOOL REVIEW ARTICLE (after factual pass)", article)],
+            task
+        )
     
-    def _tool_review_final_pass(self, article, rules):
+    def _tool_review_final_prompt(self, article, rules):
         """Fourth pass: Final consistency and polish."""
-        prompt = f"""You are a professional editor performing TOOL REVIEW FINAL POLISH.
-
-# TOOL REVIEW EDITING RULES
-{rules}
-
-# TOOL REVIEW ARTICLE (after clarity pass)
-{article}
+        task = """You are a professional editor performing TOOL REVIEW FINAL POLISH.
 
 # YOUR TASK - PASS 4: FINAL CONSISTENCY & POLISH
 Final checks:
@@ -356,17 +552,15 @@ This is the final pass. Ensure publication-ready quality.
 
 Generate the COMPLETE polished tool review:"""
 
-        return self.client.generate_content(prompt, 0.4)
+        return build_prompt(
+            [("TOOL REVIEW EDITING RULES", rules)],
+            [("TOOL REVIEW ARTICLE (after clarity pass)", article)],
+            task
+        )
     
-    def _tool_review_single_pass(self, article, rules):
+    def _tool_review_single_prompt(self, article, rules):
         """Single-pass editing for tool reviews when multipass disabled."""
-        prompt = f"""You are a professional editor polishing a tool review article.
-
-# TOOL REVIEW EDITING RULES
-{rules}
-
-# TOOL REVIEW ARTICLE
-{article}
+        task = """You are a professional editor polishing a tool review article.
 
 # YOUR TASK
 Polish this tool review by:
@@ -393,7 +587,11 @@ Polish this tool review by:
 
 Generate the COMPLETE polished tool review:"""
 
-        return self.client.generate_content(prompt, self.temperature)
+        return build_prompt(
+            [("TOOL REVIEW EDITING RULES", rules)],
+            [("TOOL REVIEW ARTICLE", article)],
+            task
+        )
     
     def _validate_tool_review_format(self, article):
         """
@@ -1,9 +1,19 @@
 """LLMON Agent - Creates multiple article variations."""
+import re
+import time
 import asyncio
 import concurrent.futures
-from api_client import APIClient
+from api_client import APIClient, NonRetryableAPIError, SafetyBlockedError, run_async, run_sync
 from config import Config
 from utils import read_file
+from prompt_builder import build_prompt
+from llm_scheduler import get_scheduler
+
+# Marker line that starts each variation in a batched (multi-output) response
+VARIATION_MARKER = "=== VARIATION {} ==="
+VARIATION_MARKER_PATTERN = re.compile(
+    r'^[ \t>*_#`]*=+\s*VARIATION\s+(\d+)\s*=+[ \t*_`]*$', re.MULTILINE | re.IGNORECASE
+)
 
 class LLMONAgent:
     """Agent 2: Generates three distinct article variations."""
@@ -11,10 +21,18 @@ class LLMONAgent:
     def __init__(self):
         """Initialize LLMON agent."""
         # Pass the specific model for LLMON agent if using OpenAI
-        model = Config.OPENAI_LLMON_MODEL if Config.AI_PROVIDER == 'openai' else None
+        model = Config.OPENAI_LLMON_MODEL if Config.AI_PROVIDER in ('openai', 'auto') else None
         self.client = APIClient(model=model)
         self.temperature = Config.LLMON_TEMPERATURE
         self.versions_count = Config.LLMON_VERSIONS_COUNT
+        self.regeneration_stats = None  # Last differentiation retry (see ensure_differentiation)
+        
+        # Over-generation: which candidates were kept, optionally weighted by quality
+        self.selection_stats = None
+        self.quality_analyzer = None
+        if Config.LLMON_DIVERSITY_QUALITY_WEIGHT and Config.ENABLE_QUALITY_SCORING:
+            from quality_analyzer import QualityAnalyzer
+            self.quality_analyzer = QualityAnalyzer()
     
     def generate_variations(self, article, rules_path):
         """
@@ -31,29 +49,13 @@ class LLMONAgent:
         if not rules:
             raise ValueError("LLMON rules file is missing or empty")
         
+        if self._batch_mode():
+            return self._generate_variations_batched(article, rules)
+        
         variations = []
         
         for i in range(1, self.versions_count + 1):
-            variation_prompt = f"""You are a content transformation specialist creating variation #{i} of {self.versions_count}.
-
-# STYLISTIC RULES
-{rules}
-
-# ORIGINAL ARTICLE
-{article}
-
-# YOUR TASK FOR VARIATION {i}
-Transform the article according to the stylistic rules while:
-1. Maintaining all key information and facts
-2. Applying the style guidelines distinctly
-3. Creating a DIFFERENT feel/approach than other variations would have
-4. Ensuring professional quality
-
-For variation {i}, emphasize: {self._get_variation_emphasis(i)}
-
-Generate the COMPLETE transformed article now:"""
-
-            variation = self.client.generate_content(variation_prompt, self.temperature)
+            variation = self._generate_single_variation(article, rules, i)
             variations.append(variation)
         
         return variations
@@ -69,29 +71,13 @@ Generate the COMPLETE transformed article now:"""
         Returns:
             List of article variations
         """
+        if self._batch_mode():
+            return self._generate_variations_batched(article, custom_rules)
+        
         variations = []
         
         for i in range(1, self.versions_count + 1):
-            variation_prompt = f"""You are a content transformation specialist creating variation #{i} of {self.versions_count}.
-
-# CUSTOM STYLISTIC RULES
-{custom_rules}
-
-# ORIGINAL ARTICLE
-{article}
-
-# YOUR TASK FOR VARIATION {i}
-Transform the article according to these CUSTOM rules while:
-1. Maintaining all key information and facts
-2. Applying the style guidelines distinctly
-3. Creating a DIFFERENT approach for this variation
-4. Ensuring professional quality
-
-For variation {i}, emphasize: {self._get_variation_emphasis(i)}
-
-Generate the COMPLETE transformed article now:"""
-
-            variation = self.client.generate_content(variation_prompt, self.temperature)
+            variation = self._generate_single_variation(article, custom_rules, i)
             variations.append(variation)
         
         return variations
@@ -101,7 +87,12 @@ Generate the COMPLETE transformed article now:"""
         emphases = {
             1: "Clarity and directness - make it highly accessible",
             2: "Depth and detail - add more nuance and examples",
-            3: "Engagement and storytelling - make it more compelling"
+            3: "Engagement and storytelling - make it more compelling",
+            4: "Practical application - lead with concrete steps, checklists and how-to guidance",
+            5: "Evidence first - foreground data, research and measurable outcomes",
+            6: "Conversational voice - talk to the reader as a knowledgeable peer",
+            7: "Big picture - frame the topic within wider trends and their implications",
+            8: "Problem and solution - open with the reader's pain points and resolve each in turn"
         }
         return emphases.get(variation_num, "Balanced approach")
     
@@ -121,61 +112,99 @@ Generate the COMPLETE transformed article now:"""
         if not rules:
             raise ValueError("LLMON rules file is missing or empty")
         
-        # Check if using Gemini - if so, use sequential to avoid safety filter issues
-        from config import Config
-        if Config.AI_PROVIDER == 'gemini':
-            print("[INFO] Using sequential generation for Gemini (more reliable)")
-            return self._generate_variations_sequential(article, rules, differentiator)
-        
-        # Use ThreadPoolExecutor for parallel API calls (OpenAI only)
-        with concurrent.futures.ThreadPoolExecutor(max_workers=self.versions_count) as executor:
-            # Submit all variation generation tasks
-            futures = []
-            for i in range(1, self.versions_count + 1):
-                future = executor.submit(
-                    self._generate_single_variation,
-                    article, rules, i
-                )
-                futures.append(future)
-            
-            # Collect results
-            variations = []
-            for future in concurrent.futures.as_completed(futures):
-                try:
-                    variation = future.result()
-                    variations.append(variation)
-                except Exception as e:
-                    raise Exception(f"Parallel generation error: {str(e)}")
+        variation_nums = None
+        if self._batch_mode():
+            variations = self._generate_variations_batched(article, rules)
+        else:
+            variations, variation_nums = self._generate_variations_pooled(article, rules)
         
         # Validate differentiation if differentiator provided
-        if differentiator and Config.ENABLE_VARIATION_VALIDATION:
-            validation = differentiator.validate_variations(variations)
+        self.ensure_differentiation(article, rules, variations, differentiator, variation_nums)
+        
+        return variations
+    
+    def ensure_differentiation(self, article, rules, variations, differentiator, variation_nums=None):
+        """
+        Regenerate variations that are too similar to the others, in place.
+        
+        Args:
+            article: The article to transform
+            rules: Rules text
+            variations: Variation texts (modified in place)
+            differentiator: VariationDifferentiator instance, or None to skip
+            variation_nums: Variation (emphasis) number of each variation, e.g. the
+                            kept candidates' numbers after over-generation
+                            (default: 1 to len(variations))
+        
+        Returns:
+            Sorted 0-based indices of the variations that were regenerated
+        """
+        return run_sync(self.ensure_differentiation_async(article, rules, variations, differentiator, variation_nums))
+    
+    async def ensure_differentiation_async(self, article, rules, variations, differentiator, variation_nums=None):
+        """
+        Async counterpart of ensure_differentiation().
+        
+        Each round regenerates every variation in a below-threshold pair
+        concurrently, with its own emphasis made stronger. A
+        DifferentiatorSession keeps the document vectors and similarity
+        matrix between rounds, so only the rows of regenerated variations
+        are re-scored. Round count, regenerated variations and wall time are
+        kept in self.regeneration_stats.
+        """
+        self.regeneration_stats = None
+        if not differentiator or not Config.ENABLE_VARIATION_VALIDATION:
+            return []
+        
+        if variation_nums is None:
+            variation_nums = list(range(1, len(variations) + 1))
+        
+        session = differentiator.session(variations)
+        validation = session.validate()
+        if validation['valid']:
+            return []
             
-            # If variations are too similar, regenerate problematic ones
-            max_retries = 2
-            retry_count = 0
+        # If variations are too similar, regenerate every one in a failing pair
+        max_rounds = 2
+        rounds = 0
+        regenerated = set()
+        start = time.perf_counter()
             
-            while not validation['valid'] and retry_count < max_retries:
-                retry_count += 1
+        while not validation['valid'] and rounds < max_rounds:
+            rounds += 1
+            involved = sorted({
+                number - 1 for pair_info in validation['pairs_below_threshold'] for number in pair_info['pair']
+            })
+            replacements = await asyncio.gather(*self._variation_coroutines(
+                article, rules, [variation_nums[i] for i in involved], stronger_emphasis=True
+            ))
+            for i, variation in zip(involved, replacements):
+                variations[i] = variation
+                session.replace(i, variation)
+            regenerated.update(involved)
                 
-                # Identify which variation to regenerate
-                suggestion = differentiator.suggest_regeneration(variations)
-                if suggestion is not None:
-                    # Regenerate with stronger emphasis
-                    var_num = suggestion + 1
-                    variations[suggestion] = self._generate_single_variation(
-                        article, rules, var_num, stronger_emphasis=True
-                    )
+            # Re-validate; pairs between untouched variations keep their scores
+            validation = session.validate()
                     
-                    # Re-validate
-                    validation = differentiator.validate_variations(variations)
-        
-        return variations
+        elapsed = time.perf_counter() - start
+        self.regeneration_stats = {
+            'rounds': rounds,
+            'regenerated': sorted(regenerated),
+            'seconds': round(elapsed, 2),
+            'valid': validation['valid']
+        }
+        print(f"[INFO] Differentiation retry: regenerated {len(regenerated)} variation(s) in "
+              f"{rounds} concurrent round(s), {elapsed:.1f}s"
+              f"{'' if validation['valid'] else ' (still below threshold)'}")
+        return sorted(regenerated)
     
     def _generate_single_variation(self, article, rules, variation_num, stronger_emphasis=False):
         """
         Generate a single variation.
         
+        A safety-filter block is retried for this variation only, with a
+        rephrased prompt, up to Config.LLMON_SAFETY_RETRIES times.
+        
         Args:
             article: The article to transform
             rules: Rules text
@@ -185,18 +214,52 @@ Generate the COMPLETE transformed article now:"""
         Returns:
             Generated variation text
         """
+        for attempt in range(Config.LLMON_SAFETY_RETRIES + 1):
+            variation_prompt = self._build_variation_prompt(
+                article, rules, variation_num, stronger_emphasis, safety_retry=attempt > 0
+            )
+            try:
+                return self.client.generate_content(
+                    variation_prompt, self.temperature, task='variation', source_text=article
+                )
+            except SafetyBlockedError:
+                if attempt == Config.LLMON_SAFETY_RETRIES:
+                    raise
+                self._report_safety_retry(variation_num, attempt + 1)
+    
+    async def _generate_single_variation_async(self, article, rules, variation_num, stronger_emphasis=False):
+        """Async counterpart of _generate_single_variation()."""
+        for attempt in range(Config.LLMON_SAFETY_RETRIES + 1):
+            variation_prompt = self._build_variation_prompt(
+                article, rules, variation_num, stronger_emphasis, safety_retry=attempt > 0
+            )
+            try:
+                return await self.client.async_client.generate_content(
+                    variation_prompt, self.temperature, task='variation', source_text=article
+                )
+            except SafetyBlockedError:
+                if attempt == Config.LLMON_SAFETY_RETRIES:
+                    raise
+                self._report_safety_retry(variation_num, attempt + 1)
+    
+    def _report_safety_retry(self, variation_num, retry):
+        """Note that one variation was blocked and is being retried on its own."""
+        print(f"[INFO] Variation {variation_num} was blocked by safety filters; "
+              f"retrying it with neutral phrasing ({retry}/{Config.LLMON_SAFETY_RETRIES})")
+    
+    def _build_variation_prompt(self, article, rules, variation_num, stronger_emphasis=False, safety_retry=False):
+        """Build the transformation prompt for a single variation."""
         emphasis_instruction = self._get_variation_emphasis(variation_num)
         
         if stronger_emphasis:
             emphasis_instruction += " - IMPORTANT: Make this variation DISTINCTLY DIFFERENT from others, use unique phrasing, examples, and structure while keeping the same core information."
         
-        variation_prompt = f"""You are a content transformation specialist creating variation #{variation_num} of {self.versions_count}.
-
-# STYLISTIC RULES
-{rules}
-
-# ORIGINAL ARTICLE
-{article}
+        if safety_retry:
+            emphasis_instruction += " - Keep the wording neutral and factual; rephrase anything graphic, violent or sensitive in measured terms."
+        
+        # Rules and article are identical for every variation, so they lead the
+        # prompt and only the variation-specific task differs
+        task = f"""You are a content transformation specialist creating variation #{variation_num} of {self._candidate_count()}.
 
 # YOUR TASK FOR VARIATION {variation_num}
 Transform the article according to the stylistic rules while:
@@ -209,7 +272,282 @@ For variation {variation_num}, emphasize: {emphasis_instruction}
 
 Generate the COMPLETE transformed article now:"""
 
-        return self.client.generate_content(variation_prompt, self.temperature)
+        return build_prompt([("STYLISTIC RULES", rules)], [("ORIGINAL ARTICLE", article)], task)
+    
+    def _generate_variations_pooled(self, article, rules):
+        """
+        Generate one variation per request on the shared LLM worker pool.
+        
+        The pool lives for the whole process (see llm_scheduler), so no
+        threads are created per call, and the global in-flight cap applies
+        across every stage and session.
+        
+        Args:
+            article: The article to transform
+            rules: Rules text
+        
+        Returns:
+            (variations, their 1-based variation numbers); without over-generation
+            variations[i] is variation #i+1
+        """
+        try:
+            candidates = get_scheduler().map(
+                self._generate_single_variation,
+                [(article, rules, i) for i in range(1, self._candidate_count() + 1)],
+                max_parallel=self._max_parallel_variations()
+            )
+        except Exception as e:
+            raise Exception(f"Parallel generation error: {str(e)}")
+        return self._select_variations(candidates)
+    
+    async def _gather_variations_async(self, article, rules, variation_nums):
+        """
+        Generate individual variations concurrently on the event loop.
+        
+        Args:
+            article: The article to transform
+            rules: Rules text
+            variation_nums: Variation numbers to generate
+        
+        Returns:
+            List of variations in the order of variation_nums
+        """
+        return list(await asyncio.gather(*self._variation_coroutines(article, rules, variation_nums)))
+    
+    def _variation_coroutines(self, article, rules, variation_nums, stronger_emphasis=False):
+        """One coroutine per variation, sharing the provider's parallelism limit."""
+        variation_nums = list(variation_nums)
+        limit = asyncio.Semaphore(self._max_parallel_variations() or len(variation_nums) or 1)
+        
+        async def generate(variation_num):
+            async with limit:
+                return await self._generate_single_variation_async(
+                    article, rules, variation_num, stronger_emphasis
+                )
+        
+        return [generate(i) for i in variation_nums]
+    
+    def stream_variations(self, article, rules_path):
+        """
+        Start generating every variation and deliver each one as soon as it is ready.
+        
+        The requests run on the shared event loop while the caller reads the
+        variations that have already arrived. VariationStream.cancel() stops
+        the ones still in flight (for example when the user picks early).
+        Differentiation is not enforced here; call ensure_differentiation()
+        once every variation has arrived.
+        
+        Args:
+            article: The article to transform
+            rules_path: Path to the LLMON (or tool review) rules file
+        
+        Returns:
+            VariationStream yielding (index, variation) in completion order
+        """
+        rules = read_file(rules_path)
+        if not rules:
+            raise ValueError(f"LLMON rules file is missing or empty: {rules_path}")
+        
+        if self._batch_mode():
+            # One request holds every variation, so they all arrive together
+            future = run_async(self._generate_variations_batched_async(article, rules))
+            return VariationStream({future: list(range(self.versions_count))}, rules)
+        
+        coroutines = self._variation_coroutines(article, rules, range(1, self.versions_count + 1))
+        return VariationStream({run_async(coroutine): i for i, coroutine in enumerate(coroutines)}, rules)
+    
+    @property
+    def overgenerating(self):
+        """Whether each round generates more candidates than variations kept."""
+        return Config.LLMON_OVERGENERATE_COUNT > self.versions_count and not self._batch_mode()
+    
+    def _candidate_count(self):
+        """Variations to request per round (LLMON_OVERGENERATE_COUNT when over-generating)."""
+        return Config.LLMON_OVERGENERATE_COUNT if self.overgenerating else self.versions_count
+    
+    def _select_variations(self, candidates):
+        """
+        Keep the versions_count most mutually diverse candidates.
+        
+        Over-generation replaces serial regeneration rounds with one parallel
+        burst: candidates are compared locally and a max-min diverse subset
+        (optionally quality weighted) is kept.
+        
+        Args:
+            candidates: Generated candidates, in emphasis order
+        
+        Returns:
+            (selected variations in candidate order, their 1-based candidate numbers)
+        """
+        if len(candidates) <= self.versions_count:
+            return candidates, list(range(1, len(candidates) + 1))
+        
+        from variation_differentiator import VariationDifferentiator
+        quality_scores = None
+        if self.quality_analyzer:
+            quality_scores = [self.quality_analyzer.analyze(candidate)['overall_score'] for candidate in candidates]
+        
+        selected = VariationDifferentiator(Config.MIN_VARIATION_DIFFERENCE).select_diverse_subset(
+            candidates, self.versions_count, quality_scores, Config.LLMON_DIVERSITY_QUALITY_WEIGHT
+        )
+        numbers = [i + 1 for i in selected]
+        self.selection_stats = {'candidates': len(candidates), 'selected': numbers}
+        print(f"[INFO] Kept the {self.versions_count} most diverse of {len(candidates)} candidate variations "
+              f"(#{', #'.join(str(number) for number in numbers)})")
+        return [candidates[i] for i in selected], numbers
+    
+    def _max_parallel_variations(self):
+        """
+        Per-call concurrency limit for individual variation requests.
+        
+        Gemini's free tier allows few requests per minute, so its variations
+        run a few at a time (GEMINI_MAX_PARALLEL_VARIATIONS) instead of all at
+        once. Other providers have no extra limit.
+        
+        Returns:
+            Maximum concurrent variation requests, or None for no limit
+        """
+        if self.client.provider == 'gemini':
+            return max(1, Config.GEMINI_MAX_PARALLEL_VARIATIONS)
+        return None
+    
+    def _batch_mode(self):
+        """
+        Resolve Config.LLMON_BATCH_MODE for this client.
+        
+        Returns:
+            'n' (provider-side sampling), 'delimited' (one multi-output prompt)
+            or None (one request per variation)
+        """
+        mode = Config.LLMON_BATCH_MODE
+        if mode in ('auto', 'n'):
+            return 'n' if self.client.supports_samples else 'delimited'
+        return 'delimited' if mode == 'delimited' else None
+    
+    def _generate_variations_batched(self, article, rules):
+        """Generate every variation from one request (see _generate_variations_batched_async())."""
+        return run_sync(self._generate_variations_batched_async(article, rules))
+    
+    async def _generate_variations_batched_async(self, article, rules):
+        """
+        Generate every variation from one request, sending the article and rules once.
+        
+        Variations the response does not hold (provider rejected `n`, markers
+        missing, output cut off) are generated individually and concurrently.
+        
+        Args:
+            article: The article to transform
+            rules: Rules text
+        
+        Returns:
+            List of versions_count variations, in variation order
+        """
+        client = self.client.async_client
+        mode = self._batch_mode()
+        print(f"[INFO] Requesting all {self.versions_count} variations in one call "
+              f"({'provider sampling' if mode == 'n' else 'multi-output prompt'})")
+        try:
+            if mode == 'n':
+                samples = await client.generate_samples(
+                    self._build_sampled_prompt(article, rules), self.temperature, self.versions_count,
+                    task='variation', source_text=article
+                )
+                variations = [sample if _long_enough(sample, article) else None for sample in samples]
+            else:
+                response = await client.generate_content(
+                    self._build_batch_prompt(article, rules), self.temperature,
+                    task='variation_batch', source_text=article
+                )
+                variations = split_variations(response, self.versions_count, article)
+        except NonRetryableAPIError as e:
+            print(f"[INFO] Batched variation request failed ({e}); generating variations individually")
+            variations = [None] * self.versions_count
+        
+        variations += [None] * (self.versions_count - len(variations))
+        missing = [i for i, variation in enumerate(variations) if variation is None]
+        if missing:
+            print(f"[INFO] Generating {len(missing)} of {self.versions_count} variation(s) individually")
+            regenerated = await self._gather_variations_async(article, rules, [i + 1 for i in missing])
+            for i, variation in zip(missing, regenerated):
+                variations[i] = variation
+        
+        return variations
+    
+    def _build_batch_prompt(self, article, rules):
+        """Build one prompt asking for every variation, each after its marker line."""
+        emphases = "\n".join(
+            f"- Variation {i}: {self._get_variation_emphasis(i)}" for i in range(1, self.versions_count + 1)
+        )
+        markers = "\n".join(VARIATION_MARKER.format(i) for i in range(1, self.versions_count + 1))
+        task = f"""You are a content transformation specialist creating all {self.versions_count} variations of the article in one response.
+
+# YOUR TASK
+Transform the article {self.versions_count} times according to the stylistic rules. Every variation must:
+1. Maintain all key information and facts
+2. Apply the style guidelines distinctly
+3. Have a DIFFERENT feel/approach than the other variations
+4. Be a COMPLETE article of professional quality
+
+Emphasis for each variation:
+{emphases}
+
+# OUTPUT FORMAT
+Start each variation with its marker line, exactly as written below, and write nothing outside the variations:
+{markers}
+
+Generate all {self.versions_count} COMPLETE transformed articles now:"""
+        
+        return build_prompt([("STYLISTIC RULES", rules)], [("ORIGINAL ARTICLE", article)], task)
+    
+    def _build_sampled_prompt(self, article, rules):
+        """Build the prompt sampled n times; each sample picks its own emphasis."""
+        emphases = "\n".join(
+            f"- {self._get_variation_emphasis(i)}" for i in range(1, self.versions_count + 1)
+        )
+        task = f"""You are a content transformation specialist creating one of {self.versions_count} independent variations of the article.
+
+# YOUR TASK
+Transform the article according to the stylistic rules while:
+1. Maintaining all key information and facts
+2. Applying the style guidelines distinctly
+3. Creating a DIFFERENT feel/approach than other variations would have
+4. Ensuring professional quality
+
+Pick ONE of these emphases at random and commit to it fully:
+{emphases}
+
+Generate the COMPLETE transformed article now:"""
+        
+        return build_prompt([("STYLISTIC RULES", rules)], [("ORIGINAL ARTICLE", article)], task)
+    
+    async def generate_variations_async(self, article, rules_path, differentiator=None):
+        """
+        Generate variations concurrently on the event loop instead of worker threads.
+        
+        Args:
+            article: The article to transform
+            rules_path: Path to LLMON rules file
+            differentiator: Optional VariationDifferentiator instance for validation
+        
+        Returns:
+            List of article variations
+        """
+        rules = read_file(rules_path)
+        if not rules:
+            raise ValueError("LLMON rules file is missing or empty")
+        
+        variation_nums = None
+        if self._batch_mode():
+            variations = await self._generate_variations_batched_async(article, rules)
+        else:
+            variations, variation_nums = self._select_variations(await self._gather_variations_async(
+                article, rules, range(1, self._candidate_count() + 1)
+            ))
+        
+        # Validate differentiation if differentiator provided
+        await self.ensure_differentiation_async(article, rules, variations, differentiator, variation_nums)
+        
+        return variations
     
     def generate_variations_with_custom_rules_parallel(self, article, custom_rules, differentiator=None):
         """
@@ -223,54 +561,20 @@ Generate the COMPLETE transformed article now:"""
         Returns:
             List of article variations
         """
-        # Use ThreadPoolExecutor for parallel API calls
-        with concurrent.futures.ThreadPoolExecutor(max_workers=self.versions_count) as executor:
-            # Submit all variation generation tasks
-            futures = []
-            for i in range(1, self.versions_count + 1):
-                future = executor.submit(
-                    self._generate_single_variation,
-                    article, custom_rules, i
-                )
-                futures.append(future)
-            
-            # Collect results
-            variations = []
-            for future in concurrent.futures.as_completed(futures):
-                try:
-                    variation = future.result()
-                    variations.append(variation)
-                except Exception as e:
-                    raise Exception(f"Parallel generation error: {str(e)}")
+        variation_nums = None
+        if self._batch_mode():
+            variations = self._generate_variations_batched(article, custom_rules)
+        else:
+            variations, variation_nums = self._generate_variations_pooled(article, custom_rules)
         
         # Validate differentiation if differentiator provided
-        if differentiator and Config.ENABLE_VARIATION_VALIDATION:
-            validation = differentiator.validate_variations(variations)
-            
-            # If variations are too similar, regenerate problematic ones
-            max_retries = 2
-            retry_count = 0
-            
-            while not validation['valid'] and retry_count < max_retries:
-                retry_count += 1
-                
-                # Identify which variation to regenerate
-                suggestion = differentiator.suggest_regeneration(variations)
-                if suggestion is not None:
-                    # Regenerate with stronger emphasis
-                    var_num = suggestion + 1
-                    variations[suggestion] = self._generate_single_variation(
-                        article, custom_rules, var_num, stronger_emphasis=True
-                    )
-                    
-                    # Re-validate
-                    validation = differentiator.validate_variations(variations)
+        self.ensure_differentiation(article, custom_rules, variations, differentiator, variation_nums)
         
         return variations
     
     def _generate_variations_sequential(self, article, rules, differentiator=None):
         """
-        Generate variations sequentially (for Gemini compatibility).
+        Generate variations one at a time (ENABLE_PARALLEL_VARIATIONS off).
         
         Args:
             article: The article to transform
@@ -281,34 +585,17 @@ Generate the COMPLETE transformed article now:"""
             List of article variations
         """
         from config import Config
-        variations = []
+        if self._batch_mode():
+            variations = self._generate_variations_batched(article, rules)
+        else:
+            variations = []
         
-        for i in range(1, self.versions_count + 1):
-            variation = self._generate_single_variation(article, rules, i)
-            variations.append(variation)
+            for i in range(1, self.versions_count + 1):
+                variation = self._generate_single_variation(article, rules, i)
+                variations.append(variation)
         
         # Validate differentiation if differentiator provided
-        if differentiator and Config.ENABLE_VARIATION_VALIDATION:
-            validation = differentiator.validate_variations(variations)
-            
-            # If variations are too similar, regenerate problematic ones
-            max_retries = 2
-            retry_count = 0
-            
-            while not validation['valid'] and retry_count < max_retries:
-                retry_count += 1
-                
-                # Identify which variation to regenerate
-                suggestion = differentiator.suggest_regeneration(variations)
-                if suggestion is not None:
-                    # Regenerate with stronger emphasis
-                    var_num = suggestion + 1
-                    variations[suggestion] = self._generate_single_variation(
-                        article, rules, var_num, stronger_emphasis=True
-                    )
-                    
-                    # Re-validate
-                    validation = differentiator.validate_variations(variations)
+        self.ensure_differentiation(article, rules, variations, differentiator)
         
         return variations
     
@@ -332,58 +619,92 @@ Generate the COMPLETE transformed article now:"""
         if not rules:
             raise ValueError(f"Could not load tool review rules from {rules_path}")
         
-        # Check if using Gemini - if so, use sequential to avoid safety filter issues
-        if Config.AI_PROVIDER == 'gemini':
-            print("[INFO] Using sequential generation for Gemini (more reliable)")
-            return self._generate_variations_sequential(article, rules, differentiator)
-        
-        # Use parallel generation for OpenAI
         if Config.ENABLE_PARALLEL_VARIATIONS:
-            # Use ThreadPoolExecutor for parallel API calls
-            with concurrent.futures.ThreadPoolExecutor(max_workers=self.versions_count) as executor:
-                # Submit all variation generation tasks
-                futures = []
-                for i in range(1, self.versions_count + 1):
-                    future = executor.submit(
-                        self._generate_single_variation,
-                        article, rules, i
-                    )
-                    futures.append(future)
-                
-                # Collect results
-                variations = []
-                for future in concurrent.futures.as_completed(futures):
-                    try:
-                        variation = future.result()
-                        variations.append(variation)
-                    except Exception as e:
-                        raise Exception(f"Parallel generation error: {str(e)}")
+            variation_nums = None
+            if self._batch_mode():
+                variations = self._generate_variations_batched(article, rules)
+            else:
+                variations, variation_nums = self._generate_variations_pooled(article, rules)
             
             # Validate differentiation if differentiator provided
-            if differentiator and Config.ENABLE_VARIATION_VALIDATION:
-                validation = differentiator.validate_variations(variations)
-                
-                # If variations are too similar, regenerate problematic ones
-                max_retries = 2
-                retry_count = 0
-                
-                while not validation['valid'] and retry_count < max_retries:
-                    retry_count += 1
-                    
-                    # Identify which variation to regenerate
-                    suggestion = differentiator.suggest_regeneration(variations)
-                    if suggestion is not None:
-                        # Regenerate with stronger emphasis
-                        var_num = suggestion + 1
-                        variations[suggestion] = self._generate_single_variation(
-                            article, rules, var_num, stronger_emphasis=True
-                        )
-                        
-                        # Re-validate
-                        validation = differentiator.validate_variations(variations)
+            self.ensure_differentiation(article, rules, variations, differentiator, variation_nums)
             
             return variations
         else:
             return self._generate_variations_sequential(article, rules, differentiator)
 
 
+class VariationStream:
+    """Variations delivered as their requests finish, with early cancellation."""
+    
+    def __init__(self, futures, rules):
+        """
+        Initialize stream.
+        
+        Args:
+            futures: concurrent.futures.Future -> variation index, or list of
+                     indices for a batched request whose result is every variation
+            rules: Rules text the variations were generated with
+        """
+        self.futures = futures
+        self.rules = rules
+    
+    @property
+    def pending(self):
+        """Number of requests still in flight."""
+        return sum(1 for future in self.futures if not future.done())
+    
+    def __iter__(self):
+        """Yield (index, variation) pairs as each request completes; a failed request raises."""
+        for future in concurrent.futures.as_completed(self.futures):
+            indices = self.futures[future]
+            if isinstance(indices, list):
+                yield from zip(indices, future.result())
+            else:
+                yield indices, future.result()
+    
+    def cancel(self):
+        """
+        Cancel every request still in flight.
+        
+        Returns:
+            Number of requests cancelled
+        """
+        return sum(1 for future in self.futures if future.cancel())
+
+
+def split_variations(response, count, article=None):
+    """
+    Split a batched response into variations at their marker lines.
+    
+    Markers are matched loosely (any case, extra "=" or markdown emphasis),
+    code fences around a variation are dropped, and a repeated or
+    out-of-range marker is ignored.
+    
+    Args:
+        response: Model output with "=== VARIATION n ===" marker lines
+        count: Number of variations requested
+        article: Source article; a variation much shorter than it (cut off by
+                 the output budget) counts as missing
+    
+    Returns:
+        List of count variations, with None for each one the response lacks
+    """
+    variations = [None] * count
+    matches = list(VARIATION_MARKER_PATTERN.finditer(response or ''))
+    for match, following in zip(matches, matches[1:] + [None]):
+        number = int(match.group(1))
+        end = following.start() if following else len(response)
+        text = re.sub(r'^```[a-z]*\n|\n```$', '', response[match.end():end].strip()).strip()
+        if 1 <= number <= count and variations[number - 1] is None and _long_enough(text, article):
+            variations[number - 1] = text
+    return variations
+
+
+def _long_enough(text, article=None):
+    """Whether a variation is non-empty and at least LLMON_BATCH_MIN_LENGTH_RATIO of the article's words."""
+    if not text or not text.strip():
+        return False
+    if not article:
+        return True
+    return len(text.split()) >= len(article.split()) * Config.LLMON_BATCH_MIN_LENGTH_RATIO
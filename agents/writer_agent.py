@@ -2,6 +2,7 @@
 from api_client import APIClient
 from config import Config
 from utils import read_file
+from prompt_builder import build_prompt
 import os
 
 class WriterAgent:
@@ -10,7 +11,7 @@ class WriterAgent:
     def __init__(self):
         """Initialize Writer agent."""
         # Pass the specific model for Writer agent if using OpenAI
-        model = Config.OPENAI_WRITER_MODEL if Config.AI_PROVIDER == 'openai' else None
+        model = Config.OPENAI_WRITER_MODEL if Config.AI_PROVIDER in ('openai', 'auto') else None
         self.client = APIClient(model=model)
         self.temperature = Config.WRITER_TEMPERATURE
         self.last_outline = None  # Store outline for reference
@@ -29,7 +30,39 @@ class WriterAgent:
         Returns:
             Generated article draft as string
         """
-        # Load all input files
+        full_prompt = self._build_draft_prompt(manual_path, template_path, references_path, prompt_path)
+        
+        # Generate content
+        article = self.client.generate_content(
+            full_prompt, self.temperature, use_cache=True, task='draft', source_text=full_prompt
+        )
+        return article
+    
+    async def generate_draft_async(self, manual_path, template_path, references_path, prompt_path):
+        """
+        Generate initial article draft without blocking the event loop.
+        
+        Args:
+            manual_path: Path to manual.md (user-filled content brief)
+            template_path: Path to template.md (article structure)
+            references_path: Path to references.md (reference materials)
+            prompt_path: Path to prompt.md (writer instructions)
+        
+        Returns:
+            Generated article draft as string
+        """
+        full_prompt = self._build_draft_prompt(manual_path, template_path, references_path, prompt_path)
+        return await self.client.async_client.generate_content(
+            full_prompt, self.temperature, use_cache=True, task='draft', source_text=full_prompt
+        )
+    
+    def _article_context(self, manual_path, template_path, references_path, prompt_path):
+        """
+        Load the static inputs shared by every article outline and draft prompt.
+        
+        Returns:
+            List of (heading, text) prompt sections in cache-friendly order
+        """
         manual = read_file(manual_path)
         template = read_file(template_path)
         references = read_file(references_path)
@@ -38,19 +71,18 @@ class WriterAgent:
         if not all([manual, template, references, prompt_instructions]):
             raise ValueError("One or more required input files are missing or empty")
         
-        # Construct the prompt
-        full_prompt = f"""You are a professional content writer. Your task is to create a complete article draft.
-
-{prompt_instructions}
-
-# ARTICLE TEMPLATE STRUCTURE
-{template}
-
-# CONTENT BRIEF (from manual.md)
-{manual}
-
-# REFERENCE MATERIALS
-{references}
+        return [
+            ("WRITER INSTRUCTIONS", prompt_instructions),
+            ("ARTICLE TEMPLATE STRUCTURE", template),
+            ("CONTENT BRIEF (from manual.md)", manual),
+            ("REFERENCE MATERIALS", references)
+        ]
+    
+    def _build_draft_prompt(self, manual_path, template_path, references_path, prompt_path):
+        """Build the article draft prompt from the input files."""
+        context = self._article_context(manual_path, template_path, references_path, prompt_path)
+        
+        task = """You are a professional content writer. Your task is to create a complete article draft.
 
 # YOUR TASK
 Using the template structure, content brief, and reference materials provided:
@@ -62,9 +94,7 @@ Using the template structure, content brief, and reference materials provided:
 
 Generate the complete article now:"""
 
-        # Generate content
-        article = self.client.generate_content(full_prompt, self.temperature)
-        return article
+        return build_prompt(context, task=task)
     
     def revise_draft(self, original_draft, feedback):
         """
@@ -77,13 +107,7 @@ Generate the complete article now:"""
         Returns:
             Revised article draft
         """
-        revision_prompt = f"""You are a professional content writer revising an article based on feedback.
-
-# ORIGINAL ARTICLE DRAFT
-{original_draft}
-
-# REVISION FEEDBACK
-{feedback}
+        task = """You are a professional content writer revising an article based on feedback.
 
 # YOUR TASK
 Revise the article to address the feedback while maintaining:
@@ -105,7 +129,13 @@ Revise the article to address the feedback while maintaining:
 
 Generate the COMPLETE revised article now:"""
 
-        revised_article = self.client.generate_content(revision_prompt, self.temperature)
+        revision_prompt = build_prompt([], [
+            ("ORIGINAL ARTICLE DRAFT", original_draft),
+            ("REVISION FEEDBACK", feedback)
+        ], task)
+        revised_article = self.client.generate_content(
+            revision_prompt, self.temperature, task='revision', source_text=original_draft
+        )
         return revised_article
     
     def generate_outline(self, manual_path, template_path, references_path, prompt_path, historical_context=""):
@@ -122,36 +152,9 @@ Generate the COMPLETE revised article now:"""
         Returns:
             Generated outline as string
         """
-        # Load all input files
-        manual = read_file(manual_path)
-        template = read_file(template_path)
-        references = read_file(references_path)
-        prompt_instructions = read_file(prompt_path)
+        context = self._article_context(manual_path, template_path, references_path, prompt_path)
         
-        if not all([manual, template, references, prompt_instructions]):
-            raise ValueError("One or more required input files are missing or empty")
-        
-        # Construct outline generation prompt
-        outline_prompt = f"""You are a professional content strategist. Your task is to create a detailed article outline.
-
-{prompt_instructions}
-
-# ARTICLE TEMPLATE STRUCTURE
-{template}
-
-# CONTENT BRIEF (from manual.md)
-{manual}
-
-# REFERENCE MATERIALS
-{references}"""
-
-        if historical_context:
-            outline_prompt += f"""
-
-# HISTORICAL CONTEXT (User Preferences)
-{historical_context}"""
-
-        outline_prompt += """
+        task = """You are a professional content strategist. Your task is to create a detailed article outline.
 
 # YOUR TASK
 Create a comprehensive article outline that:
@@ -177,8 +180,13 @@ For every data point, quote, or reference you plan to cite:
 
 Generate the detailed outline now:"""
 
+        # Static inputs first so outline, draft and revisions share a cached prefix
+        outline_prompt = build_prompt(context, [
+            ("HISTORICAL CONTEXT (User Preferences)", historical_context)
+        ], task)
+        
         # Generate outline
-        outline = self.client.generate_content(outline_prompt, self.temperature)
+        outline = self.client.generate_content(outline_prompt, self.temperature, use_cache=True, task='outline')
         self.last_outline = outline
         return outline
     
@@ -193,13 +201,7 @@ Generate the detailed outline now:"""
         Returns:
             Revised outline
         """
-        revision_prompt = f"""You are a professional content strategist revising an article outline based on feedback.
-
-# ORIGINAL OUTLINE
-{original_outline}
-
-# REVISION FEEDBACK
-{feedback}
+        task = """You are a professional content strategist revising an article outline based on feedback.
 
 # YOUR TASK
 Revise the outline to address the feedback while maintaining:
@@ -210,7 +212,11 @@ Revise the outline to address the feedback while maintaining:
 
 Generate the COMPLETE revised outline now:"""
 
-        revised_outline = self.client.generate_content(revision_prompt, self.temperature)
+        revision_prompt = build_prompt([], [
+            ("ORIGINAL OUTLINE", original_outline),
+            ("REVISION FEEDBACK", feedback)
+        ], task)
+        revised_outline = self.client.generate_content(revision_prompt, self.temperature, task='outline')
         self.last_outline = revised_outline
         return revised_outline
     
@@ -228,28 +234,9 @@ Generate the COMPLETE revised outline now:"""
         Returns:
             Generated article draft
         """
-        # Load input files
-        manual = read_file(manual_path)
-        template = read_file(template_path)
-        references = read_file(references_path)
-        prompt_instructions = read_file(prompt_path)
+        context = self._article_context(manual_path, template_path, references_path, prompt_path)
         
-        # Construct writing prompt with outline
-        writing_prompt = f"""You are a professional content writer. Your task is to write a complete article based on an approved outline.
-
-{prompt_instructions}
-
-# APPROVED OUTLINE
-{outline}
-
-# ARTICLE TEMPLATE STRUCTURE
-{template}
-
-# CONTENT BRIEF (from manual.md)
-{manual}
-
-# REFERENCE MATERIALS
-{references}
+        task = """You are a professional content writer. Your task is to write a complete article based on an approved outline.
 
 # YOUR TASK
 Write a complete, engaging article that:
@@ -265,7 +252,7 @@ The outline is your roadmap - follow it closely while bringing it to life with c
 # CRITICAL CITATION REQUIREMENTS
 **EVERY source citation MUST be a properly hyperlinked markdown link:**
 - Convert ALL source mentions to format: [Source Name](exact_url)
-- Use ONLY the exact URLs from the REFERENCE MATERIALS section below
+- Use ONLY the exact URLs from the REFERENCE MATERIALS section above
 - NEVER invent, modify, guess, or hallucinate URLs
 - If the outline includes [LINK: url] tags, use those exact URLs
 - Before finishing, verify every "according to" or data citation has a clickable hyperlink
@@ -283,8 +270,12 @@ The outline is your roadmap - follow it closely while bringing it to life with c
 
 Generate the COMPLETE article now:"""
 
+        writing_prompt = build_prompt(context, [("APPROVED OUTLINE", outline)], task)
+        
         # Generate article
-        article = self.client.generate_content(writing_prompt, self.temperature)
+        article = self.client.generate_content(
+            writing_prompt, self.temperature, use_cache=True, task='draft', source_text=writing_prompt
+        )
         return article
     
     def _detect_content_mode(self, manual_path):
@@ -337,7 +328,37 @@ Generate the COMPLETE article now:"""
         Returns:
             Generated tool review as string
         """
-        # Load input files
+        full_prompt = self._build_draft_prompt_tool_review(manual_path, template_path, prompt_path)
+        
+        # Generate review
+        review = self.client.generate_content(full_prompt, self.temperature, use_cache=True, task='tool_review_draft')
+        return review
+    
+    async def generate_draft_tool_review_async(self, manual_path, template_path, references_path, prompt_path):
+        """
+        Generate tool review draft without blocking the event loop.
+        
+        Args:
+            manual_path: Path to tool_review_brief.md
+            template_path: Path to tool_review_structure.md
+            references_path: Path to references.md (not used for tool reviews)
+            prompt_path: Path to tool_review_writer_prompt.md
+        
+        Returns:
+            Generated tool review as string
+        """
+        full_prompt = self._build_draft_prompt_tool_review(manual_path, template_path, prompt_path)
+        return await self.client.async_client.generate_content(
+            full_prompt, self.temperature, use_cache=True, task='tool_review_draft'
+        )
+    
+    def _tool_review_context(self, manual_path, template_path, prompt_path):
+        """
+        Load the static inputs shared by every tool review outline and draft prompt.
+        
+        Returns:
+            List of (heading, text) prompt sections in cache-friendly order
+        """
         brief = read_file(manual_path)
         structure = read_file(template_path)
         prompt_instructions = read_file(prompt_path)
@@ -345,16 +366,17 @@ Generate the COMPLETE article now:"""
         if not all([brief, structure, prompt_instructions]):
             raise ValueError("One or more required tool review input files are missing or empty")
         
-        # Construct the prompt
-        full_prompt = f"""You are a professional tool review writer. Your task is to create a complete, story-driven tool review.
-
-{prompt_instructions}
-
-# TOOL REVIEW STRUCTURE TEMPLATE
-{structure}
-
-# TOOL REVIEW BRIEF (Your Source Material)
-{brief}
+        return [
+            ("WRITER INSTRUCTIONS", prompt_instructions),
+            ("TOOL REVIEW STRUCTURE TEMPLATE", structure),
+            ("TOOL REVIEW BRIEF (Your Source Material)", brief)
+        ]
+    
+    def _build_draft_prompt_tool_review(self, manual_path, template_path, prompt_path):
+        """Build the tool review draft prompt from the input files."""
+        context = self._tool_review_context(manual_path, template_path, prompt_path)
+        
+        task = """You are a professional tool review writer. Your task is to create a complete, story-driven tool review.
 
 # YOUR TASK
 Using the structure template and the brief provided:
@@ -378,9 +400,7 @@ Using the structure template and the brief provided:
 
 Generate the complete tool review now:"""
 
-        # Generate review
-        review = self.client.generate_content(full_prompt, self.temperature)
-        return review
+        return build_prompt(context, task=task)
     
     def generate_outline_tool_review(self, manual_path, template_path, references_path, prompt_path, historical_context=""):
         """
@@ -396,32 +416,9 @@ Generate the complete tool review now:"""
         Returns:
             Generated outline as string
         """
-        # Load input files
-        brief = read_file(manual_path)
-        structure = read_file(template_path)
-        prompt_instructions = read_file(prompt_path)
+        context = self._tool_review_context(manual_path, template_path, prompt_path)
         
-        if not all([brief, structure, prompt_instructions]):
-            raise ValueError("One or more required tool review input files are missing or empty")
-        
-        # Construct outline prompt
-        outline_prompt = f"""You are a professional tool review strategist. Your task is to create a detailed outline for a tool review.
-
-{prompt_instructions}
-
-# TOOL REVIEW STRUCTURE TEMPLATE
-{structure}
-
-# TOOL REVIEW BRIEF (Your Source Material)
-{brief}"""
-
-        if historical_context:
-            outline_prompt += f"""
-
-# HISTORICAL CONTEXT (User Preferences)
-{historical_context}"""
-
-        outline_prompt += """
+        task = """You are a professional tool review strategist. Your task is to create a detailed outline for a tool review.
 
 # YOUR TASK
 Create a comprehensive tool review outline that:
@@ -450,8 +447,13 @@ For each quote in the brief:
 
 Generate the detailed tool review outline now:"""
 
+        # Static inputs first so outline, draft and revisions share a cached prefix
+        outline_prompt = build_prompt(context, [
+            ("HISTORICAL CONTEXT (User Preferences)", historical_context)
+        ], task)
+        
         # Generate outline
-        outline = self.client.generate_content(outline_prompt, self.temperature)
+        outline = self.client.generate_content(outline_prompt, self.temperature, use_cache=True, task='outline')
         self.last_outline = outline
         self.content_mode = 'tool_review'
         return outline
@@ -467,13 +469,7 @@ Generate the detailed tool review outline now:"""
         Returns:
             Revised outline
         """
-        revision_prompt = f"""You are a professional tool review strategist revising an outline based on feedback.
-
-# ORIGINAL OUTLINE
-{original_outline}
-
-# REVISION FEEDBACK
-{feedback}
+        task = """You are a professional tool review strategist revising an outline based on feedback.
 
 # YOUR TASK
 Revise the outline to address the feedback while maintaining:
@@ -485,7 +481,11 @@ Revise the outline to address the feedback while maintaining:
 
 Generate the COMPLETE revised outline now:"""
 
-        revised_outline = self.client.generate_content(revision_prompt, self.temperature)
+        revision_prompt = build_prompt([], [
+            ("ORIGINAL OUTLINE", original_outline),
+            ("REVISION FEEDBACK", feedback)
+        ], task)
+        revised_outline = self.client.generate_content(revision_prompt, self.temperature, task='outline')
         self.last_outline = revised_outline
         return revised_outline
     
@@ -503,24 +503,9 @@ Generate the COMPLETE revised outline now:"""
         Returns:
             Generated tool review
         """
-        # Load input files
-        brief = read_file(manual_path)
-        structure = read_file(template_path)
-        prompt_instructions = read_file(prompt_path)
+        context = self._tool_review_context(manual_path, template_path, prompt_path)
         
-        # Construct writing prompt
-        writing_prompt = f"""You are a professional tool review writer. Your task is to write a complete tool review based on an approved outline.
-
-{prompt_instructions}
-
-# APPROVED OUTLINE
-{outline}
-
-# TOOL REVIEW STRUCTURE TEMPLATE
-{structure}
-
-# TOOL REVIEW BRIEF (Your Source Material)
-{brief}
+        task = """You are a professional tool review writer. Your task is to write a complete tool review based on an approved outline.
 
 # YOUR TASK
 Write a complete tool review that:
@@ -545,8 +530,12 @@ Write a complete tool review that:
 
 Generate the COMPLETE tool review now:"""
 
+        writing_prompt = build_prompt(context, [("APPROVED OUTLINE", outline)], task)
+        
         # Generate review
-        review = self.client.generate_content(writing_prompt, self.temperature)
+        review = self.client.generate_content(
+            writing_prompt, self.temperature, use_cache=True, task='tool_review_draft', source_text=writing_prompt
+        )
         return review
 
 
@@ -1,118 +1,1162 @@
-"""Unified API client for OpenAI and Google Gemini."""
+"""Unified API client for OpenAI, Google Gemini and the offline mock provider."""
+import asyncio
+import contextlib
+import json
+import re
+import random
+import threading
+from collections import deque
+import time
 from config import Config
+from response_cache import ResponseCache, get_shared_cache
+from rate_limiter import get_rate_limiter
+from token_budget import MAX_OUTPUT_TOKENS, estimate_tokens, output_budget, get_usage_log
+from session_cassette import SessionCassette, get_cassette
+from provider_router import get_provider_router
+from llm_scheduler import current_priority, get_scheduler, priority_for, priority_scope
+from utils import print_error
 
-class APIClient:
-    """Wrapper for AI API calls with multi-provider support."""
+SYSTEM_PROMPT = "You are a professional content writer and editor. Follow the instructions precisely and generate high-quality content."
+
+# Models that don't support temperature parameter
+# These models only support default temperature (1.0)
+MODELS_WITHOUT_TEMPERATURE = ['gpt-5', 'o1-preview', 'o1-mini', 'o1', 'o3-mini', 'o3']
+
+# Configure Gemini safety settings to most permissive (BLOCK_NONE)
+GEMINI_SAFETY_SETTINGS = [
+    {
+        "category": "HARM_CATEGORY_HARASSMENT",
+        "threshold": "BLOCK_NONE"
+    },
+    {
+        "category": "HARM_CATEGORY_HATE_SPEECH",
+        "threshold": "BLOCK_NONE"
+    },
+    {
+        "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
+        "threshold": "BLOCK_NONE"
+    },
+    {
+        "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
+        "threshold": "BLOCK_NONE"
+    }
+]
+
+# Gemini FinishReason / BlockReason values (the SDK sometimes returns bare ints)
+GEMINI_FINISH_REASONS = {
+    0: 'FINISH_REASON_UNSPECIFIED', 1: 'STOP', 2: 'MAX_TOKENS', 3: 'SAFETY', 4: 'RECITATION',
+    5: 'OTHER', 6: 'BLOCKLIST', 7: 'PROHIBITED_CONTENT', 8: 'SPII'
+}
+GEMINI_PROMPT_BLOCK_REASONS = {
+    0: 'BLOCK_REASON_UNSPECIFIED', 1: 'SAFETY', 2: 'OTHER', 3: 'BLOCKLIST', 4: 'PROHIBITED_CONTENT'
+}
+
+# Finish and prompt block reasons that mean the safety filters stopped the call
+GEMINI_BLOCK_REASONS = {'SAFETY', 'RECITATION', 'BLOCKLIST', 'PROHIBITED_CONTENT', 'SPII'}
+
+# Provider errors that mean "slow down": 429s and timeouts
+THROTTLE_ERROR_NAMES = (
+    'RateLimitError', 'ResourceExhausted', 'TooManyRequests',
+    'APITimeoutError', 'DeadlineExceeded', 'ReadTimeout', 'ConnectTimeout'
+)
+
+# Provider errors worth retrying: throttling, timeouts, dropped connections, 5xx
+RETRYABLE_STATUS_CODES = (408, 409, 429, 500, 502, 503, 504)
+RETRYABLE_ERROR_NAMES = THROTTLE_ERROR_NAMES + (
+    'APIConnectionError', 'InternalServerError', 'ServiceUnavailable',
+    'BadGateway', 'GatewayTimeout', 'ConnectError', 'RemoteProtocolError', 'ServerError'
+)
+
+
+class APIClientError(Exception):
+    """A provider request failed."""
     
-    def __init__(self, model=None):
-        """Initialize API client for the configured provider.
+    retryable = False
+
+
+class RetryableAPIError(APIClientError):
+    """Transient provider failure (429, 5xx, timeout, dropped connection)."""
+    
+    retryable = True
+
+
+class NonRetryableAPIError(APIClientError):
+    """Permanent provider failure (authentication, bad request, safety block)."""
+
+
+class SafetyBlockedError(NonRetryableAPIError):
+    """The provider's safety filters blocked the prompt or the response."""
+
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def get_event_loop():
+    """
+    Get the process-wide event loop that runs all provider requests.
+    
+    The loop lives on a daemon thread so synchronous callers (including
+    worker threads) can submit coroutines to it concurrently.
+    
+    Returns:
+        Running asyncio event loop
+    """
+    global _loop
+    
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            thread = threading.Thread(
+                target=_loop.run_forever, name="api-client-loop", daemon=True
+            )
+            thread.start()
+        return _loop
+
+
+def run_sync(coro):
+    """
+    Run a coroutine on the shared event loop and wait for its result.
+    
+    LLM calls made by the coroutine keep the caller thread's priority
+    (see llm_scheduler.priority_scope).
+    
+    Args:
+        coro: Coroutine to execute
+    
+    Returns:
+        The coroutine's return value
+    """
+    return run_async(coro).result()
+
+
+def run_async(coro):
+    """
+    Start a coroutine on the shared event loop without waiting for it.
+    
+    Cancelling the returned future cancels the coroutine, including any
+    provider request it has in flight.
+    
+    Args:
+        coro: Coroutine to execute
+    
+    Returns:
+        concurrent.futures.Future with the coroutine's result
+    """
+    return asyncio.run_coroutine_threadsafe(_at_priority(current_priority.get(), coro), get_event_loop())
+
+
+_provider_clients = {}
+_provider_clients_lock = threading.Lock()
+
+
+def get_provider_client(provider, api_key, base_url=None):
+    """
+    Get the process-wide SDK client for a provider, API key and endpoint.
+    
+    Every agent shares one client (and so one keep-alive connection pool)
+    per provider and key instead of paying TLS handshakes per agent.
+    
+    Args:
+        provider: 'openai', 'gemini' or 'mock'
+        api_key: API key for the provider (None for 'mock')
+        base_url: Optional OpenAI-compatible endpoint (OpenAI only)
+    
+    Returns:
+        AsyncOpenAI client for OpenAI, the configured genai module for Gemini,
+        or a MockProvider
+    """
+    registry_key = (provider, api_key, base_url)
+    
+    with _provider_clients_lock:
+        if registry_key not in _provider_clients:
+            if provider == 'openai':
+                _provider_clients[registry_key] = _create_openai_client(api_key, base_url)
+            elif provider == 'gemini':
+                import google.generativeai as genai
+                genai.configure(api_key=api_key)
+                _provider_clients[registry_key] = genai
+            elif provider == 'mock':
+                from mock_provider import MockProvider
+                _provider_clients[registry_key] = MockProvider()
+        return _provider_clients.get(registry_key)
+
+
+def _create_openai_client(api_key, base_url=None):
+    """Create an AsyncOpenAI client with a tuned keep-alive connection pool."""
+    from openai import AsyncOpenAI
+    
+    http_client = None
+    try:
+        import httpx
+        from openai import DefaultAsyncHttpxClient
+        http_client = DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=Config.HTTP_POOL_SIZE,
+                max_keepalive_connections=Config.HTTP_POOL_SIZE,
+                keepalive_expiry=Config.HTTP_KEEPALIVE_SECONDS
+            )
+        )
+    except ImportError:
+        # Older SDKs without httpx exports keep their default pool
+        pass
+    
+    # Retries are handled by AsyncAPIClient so they respect the call deadline
+    return AsyncOpenAI(
+        api_key=api_key or 'local',
+        base_url=base_url,
+        timeout=Config.API_TIMEOUT,
+        http_client=http_client,
+        max_retries=0
+    )
+
+
+def is_throttle_error(error):
+    """
+    Check whether a provider error is a rate limit (429) or timeout.
+    
+    Args:
+        error: Exception raised by a provider SDK
+    
+    Returns:
+        True if the request should count as throttled
+    """
+    if getattr(error, 'status_code', None) == 429 or getattr(error, 'code', None) == 429:
+        return True
+    return isinstance(error, (asyncio.TimeoutError, TimeoutError)) or type(error).__name__ in THROTTLE_ERROR_NAMES
+
+
+def is_retryable_error(error):
+    """
+    Check whether a provider error is transient and worth retrying.
+    
+    Args:
+        error: Exception raised by a provider SDK
+    
+    Returns:
+        True for throttling, timeouts, connection failures and 5xx responses
+    """
+    if isinstance(error, APIClientError):
+        return error.retryable
+    
+    status_code = getattr(error, 'status_code', None) or getattr(error, 'code', None)
+    if status_code in RETRYABLE_STATUS_CODES:
+        return True
+    return (
+        isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError))
+        or type(error).__name__ in RETRYABLE_ERROR_NAMES
+    )
+
+
+def classify_error(error, provider):
+    """
+    Wrap a provider error in RetryableAPIError or NonRetryableAPIError.
+    
+    Args:
+        error: Exception raised by a provider SDK
+        provider: Provider name for the message
+    
+    Returns:
+        APIClientError instance
+    """
+    if isinstance(error, APIClientError):
+        return error
+    
+    error_class = RetryableAPIError if is_retryable_error(error) else NonRetryableAPIError
+    return error_class(f"API Error ({provider}): {str(error)}")
+
+
+def backoff_delay(attempt, error=None):
+    """
+    Full-jitter exponential backoff, honoring a Retry-After header if present.
+    
+    Args:
+        attempt: 1-based retry number
+        error: Provider error that triggered the retry
+    
+    Returns:
+        Seconds to wait before the next attempt
+    """
+    ceiling = min(Config.API_RETRY_MAX_DELAY, Config.API_RETRY_BASE_DELAY * 2 ** (attempt - 1))
+    delay = random.uniform(0, ceiling)
+    
+    headers = getattr(getattr(error, 'response', None), 'headers', None)
+    try:
+        retry_after = float(headers.get('retry-after')) if headers else None
+    except (TypeError, ValueError):
+        retry_after = None
+    if retry_after:
+        delay = max(delay, min(retry_after, Config.API_RETRY_MAX_DELAY))
+    
+    return delay
+
+
+class SingleFlight:
+    """
+    Shares one upstream request among concurrent identical calls.
+    
+    The first call for a key (the leader) makes the request; calls that
+    arrive while it is in flight wait for its result instead of sending
+    their own. All methods must run on the shared API event loop.
+    """
+    
+    def __init__(self):
+        """Initialize with no requests in flight."""
+        self._in_flight = {}  # key -> Future resolved by the leader
+        self.leaders = 0
+        self.coalesced = 0
+    
+    async def run(self, key, request):
+        """
+        Run a request, or join an identical one already in flight.
+        
+        Args:
+            key: Request identity (the response cache key)
+            request: Zero-argument coroutine function making the upstream call
+        
+        Returns:
+            Tuple of (result, shared) where shared is True if another call's
+            result was reused
+        """
+        leader = self._in_flight.get(key)
+        if leader is not None:
+            try:
+                result = await asyncio.shield(leader)
+            except asyncio.CancelledError:
+                if not leader.cancelled():
+                    raise
+                # The leader was cancelled, not us: make the request ourselves
+            else:
+                self.coalesced += 1
+                return result, True
+        
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        self.leaders += 1
+        try:
+            result = await request()
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Followers re-raise it; don't warn when there are none
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+        
+        future.set_result(result)
+        return result, False
+    
+    def get_stats(self):
+        """
+        Get coalescing counters.
+        
+        Returns:
+            Dictionary with upstream (leader) requests, coalesced calls and
+            requests currently in flight
+        """
+        return {
+            'upstream_requests': self.leaders,
+            'coalesced_calls': self.coalesced,
+            'in_flight': len(self._in_flight)
+        }
+
+
+_single_flight = SingleFlight()
+
+
+def get_single_flight():
+    """Get the process-wide request coalescer shared by every client."""
+    return _single_flight
+
+
+class LatencyWindow:
+    """Rolling window of recent request latencies."""
+    
+    def __init__(self, size=100):
+        """
+        Initialize latency window.
+        
+        Args:
+            size: Number of most recent samples to keep
+        """
+        self.samples = deque(maxlen=size)
+    
+    def add(self, seconds):
+        """Record one latency sample."""
+        self.samples.append(seconds)
+    
+    def percentile(self, percent):
+        """
+        Get a latency percentile over the window.
+        
+        Args:
+            percent: Percentile to compute (0-100)
+        
+        Returns:
+            Latency in seconds, or None until Config.HEDGE_MIN_SAMPLES are recorded
+        """
+        if len(self.samples) < Config.HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(round(percent / 100.0 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+class AsyncAPIClient:
+    """Asyncio client for AI API calls with multi-provider support.
+    
+    Provider SDK clients bind to the event loop that first uses them, so
+    await this client only on the shared loop (see run_sync()).
+    """
+    
+    def __init__(self, model=None, provider=None):
+        """Initialize async API client for the configured provider.
         
         Args:
             model: Optional model override. For OpenAI, this should be the specific
-                   agent model. For Gemini, this parameter is ignored and the 
+                   agent model. For Gemini, this parameter is ignored and the
                    default model is used.
+            provider: Provider override; used for the per-provider backends of
+                      an AI_PROVIDER=auto client (defaults to Config.AI_PROVIDER)
         """
-        Config.validate()
+        if provider is None:
+            Config.validate()
         
-        self.provider = Config.AI_PROVIDER
+        self.provider = provider or Config.AI_PROVIDER
+        self.router = None
+        self.max_retries = None  # None = Config.API_MAX_RETRIES
         
-        if self.provider == 'openai':
-            from openai import OpenAI
-            self.client = OpenAI(api_key=Config.OPENAI_API_KEY)
+        if self.provider == 'auto':
+            # One backend client per routable provider; the router picks per call
+            self.router = get_provider_router()
+            self.backends = {name: AsyncAPIClient(model, provider=name) for name in self.router.order}
+            for backend in self.backends.values():
+                backend.cassette = None  # Recorded once, at this level
+                backend.max_retries = 0  # Fail over instead of retrying a struggling provider
+            self.model = model
+        elif self.provider == 'openai':
+            self.client = get_provider_client('openai', Config.OPENAI_API_KEY, Config.OPENAI_BASE_URL)
             self.model = model  # Use the passed model for OpenAI
         elif self.provider == 'gemini':
-            import google.generativeai as genai
-            genai.configure(api_key=Config.GEMINI_API_KEY)
-            self.genai = genai
+            self.genai = get_provider_client('gemini', Config.GEMINI_API_KEY)
             self.model = Config.MODEL_NAME  # Gemini uses single model
+            self._gemini_models = {}  # (model, temperature, max tokens) -> GenerativeModel
+        elif self.provider == 'mock':
+            self.client = get_provider_client('mock', None)
+            self.model = model or Config.MOCK_MODEL_NAME
+        
+        self.cache = get_shared_cache() if Config.ENABLE_RESPONSE_CACHE else None
+        self.rate_limiter = None
+        if Config.ENABLE_RATE_LIMITER and not self.router:
+            self.rate_limiter = get_rate_limiter(self.provider)
+        self.cassette = get_cassette()
+        self.single_flight = get_single_flight() if Config.ENABLE_REQUEST_COALESCING else None
+        self.scheduler = get_scheduler() if Config.ENABLE_LLM_SCHEDULER else None
+        
+        # Recent latencies drive hedging; counters are for reporting
+        self._latencies = LatencyWindow()
+        self._first_chunk_latencies = LatencyWindow()
+        self.retries = 0
+        self.hedged_requests = 0
+        self.upstream_requests = 0
+    
+    async def generate_content(self, prompt, temperature=0.7, use_cache=False, on_chunk=None, hedge=False,
+                               task=None, source_text=None):
+        """
+        Generate content using the configured AI provider.
+        
+        Transient failures (429, 5xx, timeouts) are retried with jittered
+        exponential backoff until Config.API_CALL_DEADLINE. With
+        Config.CASSETTE_MODE set, calls are recorded to or replayed from the
+        session cassette (see session_cassette).
+        
+        Args:
+            prompt: Full prompt text
+            temperature: Sampling temperature
+            use_cache: If True, serve identical earlier requests from the
+                       response cache and share one upstream request among
+                       identical concurrent calls. Leave False for sampled variations.
+            on_chunk: Optional callable receiving text chunks as they arrive,
+                      then None once complete. When set, the request streams.
+            hedge: If True (and Config.ENABLE_HEDGED_REQUESTS), send a duplicate
+                   request when the first is slower than the recent p95 and use
+                   whichever answers first.
+            task: Optional task name ('outline', 'draft', 'revision', 'variation',
+                  'edit_pass', ...) used to size the output budget and label the call log
+            source_text: Text the output is derived from (see token_budget.output_budget)
+        
+        Returns:
+            Generated text
+        
+        Raises:
+            RetryableAPIError: Transient failure that persisted past the retry budget
+            NonRetryableAPIError: Permanent failure (auth, bad request, safety block)
+            CassetteMissError: Replaying a request that was never recorded
+        """
+        if not self.cassette:
+            return await self._generate_content(prompt, temperature, use_cache, on_chunk, hedge, task, source_text)
+        
+        key = SessionCassette.make_key(prompt, temperature, task)
+        if self.cassette.mode == 'replay':
+            return await self._replay(key, on_chunk)
+        
+        start = time.monotonic()
+        first_chunk_at = []
+        timed_on_chunk = None
+        if on_chunk:
+            def timed_on_chunk(chunk):
+                if not first_chunk_at:
+                    first_chunk_at.append(time.monotonic())
+                on_chunk(chunk)
+        
+        try:
+            content = await self._generate_content(
+                prompt, temperature, use_cache, timed_on_chunk, hedge, task, source_text
+            )
+        except APIClientError as e:
+            self.cassette.record_response(key, task, None, time.monotonic() - start, error=e)
+            raise
+        
+        first_chunk_latency = first_chunk_at[0] - start if first_chunk_at else None
+        self.cassette.record_response(key, task, content, time.monotonic() - start, first_chunk_latency)
+        return content
+    
+    @property
+    def supports_samples(self):
+        """Whether one request can return several completions (OpenAI `n`, mock)."""
+        return self.provider in ('openai', 'mock')
+    
+    async def generate_samples(self, prompt, temperature, n, task=None, source_text=None):
+        """
+        Sample several completions of one prompt in a single request.
+        
+        The prompt is sent (and billed) once; each completion gets the task's
+        full output budget. Only providers with supports_samples can do this.
+        
+        Args:
+            prompt: Full prompt text
+            temperature: Sampling temperature
+            n: Number of completions
+            task: Optional task name used to size the output budget (per completion)
+            source_text: Text the output is derived from
+        
+        Returns:
+            List of n generated texts
+        
+        Raises:
+            NonRetryableAPIError: If the provider cannot sample (or rejects `n`)
+            RetryableAPIError: Transient failure that persisted past the retry budget
+        """
+        if not self.supports_samples:
+            raise NonRetryableAPIError(f"API Error ({self.provider}): multi-sample requests are not supported")
+        
+        key = SessionCassette.make_key(prompt, temperature, f"{task}[n={n}]") if self.cassette else None
+        if self.cassette and self.cassette.mode == 'replay':
+            return json.loads(await self._replay(key, None))
+        
+        max_tokens = output_budget(task, source_text, self.model)
+        start = time.monotonic()
+        try:
+            samples = await self._with_retries(prompt, temperature, max_tokens, task, None, False, n=n)
+        except APIClientError as e:
+            if self.cassette:
+                self.cassette.record_response(key, task, None, time.monotonic() - start, error=e)
+            raise
+        
+        if self.cassette:
+            self.cassette.record_response(key, task, json.dumps(samples), time.monotonic() - start)
+        return samples
+    
+    async def _generate_content(self, prompt, temperature, use_cache, on_chunk, hedge, task, source_text):
+        """Serve one generate_content call from the response cache, an in-flight twin or the provider."""
+        if self.router:
+            return await self._route(prompt, temperature, use_cache, on_chunk, hedge, task, source_text)
+        
+        max_tokens = output_budget(task, source_text, self.model)
+        
+        cache_key = None
+        if use_cache:
+            cache_key = ResponseCache.make_key(
+                self.provider, self.model, temperature, max_tokens, prompt
+            )
+        
+        if cache_key and self.cache:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                self._record_call(task, max_tokens, prompt, {}, 0.0, cache_hit=True)
+                if on_chunk:
+                    on_chunk(cached)
+                    on_chunk(None)
+                return cached
+        
+        hedge = hedge and Config.ENABLE_HEDGED_REQUESTS
+        flags = {}
+        
+        # Streamed text is already on screen, so a cut-off reply cannot be
+        # requested again; streams get the full budget up front. The cache key
+        # keeps the task budget, so streamed and non-streamed twins still share.
+        request_tokens = MAX_OUTPUT_TOKENS if on_chunk else max_tokens
+        
+        def request():
+            return self._with_retries(prompt, temperature, request_tokens, task, on_chunk, hedge, flags=flags)
+        
+        if not (cache_key and self.single_flight):
+            content = await request()
+        else:
+            start = time.monotonic()
+            content, shared = await self.single_flight.run(cache_key, request)
+            if shared:
+                self._record_call(task, max_tokens, prompt, {}, time.monotonic() - start, coalesced=True)
+                if on_chunk:
+                    on_chunk(content)
+                    on_chunk(None)
+                return content
+        
+        # A reply still cut off at the full budget must not be replayed from the cache
+        if cache_key and self.cache and content and not flags.get('truncated'):
+            try:
+                # File write off the event loop; a full or read-only disk must not fail the call
+                await asyncio.to_thread(
+                    self.cache.put, cache_key, content, {'provider': self.provider, 'model': self.model}
+                )
+            except OSError as e:
+                print_error(f"Could not write response cache entry: {str(e)}")
+        
+        return content
+    
+    async def _route(self, prompt, temperature, use_cache, on_chunk, hedge, task, source_text):
+        """
+        Send a call to the best provider, failing over to the next on error.
+        
+        Each backend makes a single attempt; when every provider has failed
+        with a transient error, the round is retried with backoff. Streamed
+        calls fail over only if no text has been emitted yet.
+        """
+        emitted = []
+        tracking_on_chunk = None
+        if on_chunk:
+            def tracking_on_chunk(chunk):
+                emitted.append(chunk)
+                on_chunk(chunk)
+        
+        attempts = []
+        candidates = self.router.choose(task)
+        attempt = 0
+        while True:
+            error = None
+            for name in candidates:
+                if not self.router.begin(name):
+                    continue
+                
+                backend = self.backends[name]
+                upstream_before = backend.upstream_requests
+                start = time.monotonic()
+                try:
+                    content = await backend._generate_content(
+                        prompt, temperature, use_cache, tracking_on_chunk, hedge, task, source_text
+                    )
+                except APIClientError as e:
+                    latency = time.monotonic() - start
+                    self.router.record_failure(name, task, latency)
+                    attempts.append({'provider': name, 'outcome': 'failed', 'latency': round(latency, 3), 'error': str(e)})
+                    if emitted:
+                        self.router.log_decision(task, attempts, candidates)
+                        raise
+                    error = e
+                    continue
+                except BaseException:
+                    self.router.release(name)
+                    raise
+                
+                latency = time.monotonic() - start
+                upstream = backend.upstream_requests != upstream_before
+                self.router.record_success(name, task, latency if upstream else None)
+                attempts.append({'provider': name, 'outcome': 'success', 'latency': round(latency, 3), 'error': None})
+                self.router.log_decision(task, attempts, candidates)
+                return content
+            
+            attempt += 1
+            if error is None:
+                error = RetryableAPIError("API Error (auto): no provider available")
+            if not error.retryable or attempt > self._max_retries():
+                self.router.log_decision(task, attempts, candidates)
+                raise error
+            
+            self.retries += 1
+            await asyncio.sleep(backoff_delay(attempt, error))
+            candidates = self.router.choose(task)
+    
+    async def _route_stream(self, prompt, temperature, task, source_text):
+        """Stream from the best provider, failing over only before the first chunk."""
+        candidates = self.router.choose(task)
+        attempts = []
+        error = None
+        for name in candidates:
+            if not self.router.begin(name):
+                continue
+            
+            start = time.monotonic()
+            received = False
+            try:
+                async for chunk in self.backends[name].generate_content_stream(prompt, temperature, task, source_text):
+                    received = True
+                    yield chunk
+            except APIClientError as e:
+                latency = time.monotonic() - start
+                self.router.record_failure(name, task, latency)
+                attempts.append({'provider': name, 'outcome': 'failed', 'latency': round(latency, 3), 'error': str(e)})
+                if received:
+                    self.router.log_decision(task, attempts, candidates)
+                    raise
+                error = e
+                continue
+            except BaseException:
+                self.router.release(name)
+                raise
+            
+            latency = time.monotonic() - start
+            self.router.record_success(name, task, latency)
+            attempts.append({'provider': name, 'outcome': 'success', 'latency': round(latency, 3), 'error': None})
+            self.router.log_decision(task, attempts, candidates)
+            return
+        
+        self.router.log_decision(task, attempts, candidates)
+        raise error or RetryableAPIError("API Error (auto): no provider available")
+    
+    async def _replay(self, key, on_chunk):
+        """
+        Serve a call from the session cassette with its recorded (scaled) timing.
+        
+        Streamed calls wait for the recorded time to first chunk, then spread
+        the rest of the text over the remaining recorded latency.
+        """
+        entry = self.cassette.next_response(key)
+        latency = self.cassette.scaled(entry['latency'])
+        
+        if 'error' in entry:
+            await asyncio.sleep(latency)
+            if entry.get('error_type') == 'SafetyBlockedError':
+                raise SafetyBlockedError(entry['error'])
+            error_class = RetryableAPIError if entry['retryable'] else NonRetryableAPIError
+            raise error_class(entry['error'])
+        
+        content = entry['content']
+        if not on_chunk:
+            await asyncio.sleep(latency)
+            return content
+        
+        first_chunk = self.cassette.scaled(entry['first_chunk_latency']) if entry['first_chunk_latency'] is not None else latency
+        await asyncio.sleep(first_chunk)
+        
+        chunks = _replay_chunks(content)
+        interval = max(latency - first_chunk, 0) / len(chunks)
+        for index, chunk in enumerate(chunks):
+            if index and interval:
+                await asyncio.sleep(interval)
+            on_chunk(chunk)
+        on_chunk(None)
+        return content
+    
+    async def generate_content_stream(self, prompt, temperature=0.7, task=None, source_text=None):
+        """
+        Generate content incrementally using the configured AI provider.
+        
+        Args:
+            prompt: Full prompt text
+            temperature: Sampling temperature
+            task: Optional task name used to size the output budget
+            source_text: Text the output is derived from
+        
+        Yields:
+            Text chunks in the order the provider produces them
+        """
+        if self.router:
+            async for chunk in self._route_stream(prompt, temperature, task, source_text):
+                yield chunk
+            return
         
-    def generate_content(self, prompt, temperature=0.7):
-        """Generate content using the configured AI provider."""
         try:
+            async for chunk in self._stream_request(prompt, temperature, MAX_OUTPUT_TOKENS, task):
+                yield chunk
+        except Exception as e:
+            raise classify_error(e, self.provider) from e
+    
+    async def _with_retries(self, prompt, temperature, max_tokens, task, on_chunk, hedge, n=1, flags=None):
+        """
+        Run one logical request, retrying transient failures within the deadline.
+        
+        Streamed requests are only retried if no chunk has reached on_chunk yet.
+        If given, flags['truncated'] is set when the reply was cut off by its
+        output budget.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + Config.API_CALL_DEADLINE
+        emitted = []
+        attempt = 0
+        
+        while True:
+            try:
+                return await asyncio.wait_for(
+                    self._attempt(prompt, temperature, max_tokens, task, on_chunk, hedge, emitted, n, flags),
+                    timeout=max(deadline - loop.time(), 0)
+                )
+            except Exception as e:
+                if isinstance(e, asyncio.TimeoutError) and loop.time() >= deadline:
+                    e = RetryableAPIError(
+                        f"API Error ({self.provider}): no response within {Config.API_CALL_DEADLINE}s deadline"
+                    )
+                error = classify_error(e, self.provider)
+                attempt += 1
+                
+                if not error.retryable or emitted or attempt > self._max_retries():
+                    raise error from e
+                
+                delay = backoff_delay(attempt, e)
+                if loop.time() + delay >= deadline:
+                    raise error from e
+                
+                self.retries += 1
+                await asyncio.sleep(delay)
+    
+    def _max_retries(self):
+        """Retries allowed per call (routed backends fail over instead of retrying)."""
+        return Config.API_MAX_RETRIES if self.max_retries is None else self.max_retries
+    
+    async def _attempt(self, prompt, temperature, max_tokens, task, on_chunk, hedge, emitted, n=1, flags=None):
+        """Make a single (possibly hedged) request attempt."""
+        if on_chunk:
+            async for chunk in self._stream_request(prompt, temperature, max_tokens, task, hedge, flags):
+                emitted.append(chunk)
+                on_chunk(chunk)
+            on_chunk(None)
+            return ''.join(emitted)
+        
+        threshold = self._latencies.percentile(Config.HEDGE_LATENCY_PERCENTILE) if hedge else None
+        if threshold is None:
+            return await self._request(prompt, temperature, max_tokens, task, n, flags)
+        
+        requests = [asyncio.ensure_future(self._request(prompt, temperature, max_tokens, task, n, flags))]
+        try:
+            done, _ = await asyncio.wait(requests, timeout=threshold)
+            if not done:
+                self.hedged_requests += 1
+                requests.append(asyncio.ensure_future(self._request(prompt, temperature, max_tokens, task, n, flags)))
+            
+            winner = await _first_successful(requests)
+            return winner.result()
+        finally:
+            for pending in requests:
+                pending.cancel()
+    
+    async def _request(self, prompt, temperature, max_tokens, task, n=1, flags=None):
+        """
+        Send one non-streaming provider request, recording latency and usage.
+        
+        A response cut off by a reduced output budget is requested again
+        with the full MAX_OUTPUT_TOKENS; one still cut off sets
+        flags['truncated']. With n > 1 (see generate_samples) the result is
+        a list of n completions.
+        """
+        usage = {}
+        start = time.monotonic()
+        self.upstream_requests += 1
+        async with self._rate_limited(prompt, max_tokens * n, task):
             if self.provider == 'openai':
-                return self._generate_openai(prompt, temperature)
+                content = await self._generate_openai(prompt, temperature, max_tokens, usage, n)
             elif self.provider == 'gemini':
-                return self._generate_gemini(prompt, temperature)
-        except Exception as e:
-            raise Exception(f"API Error ({self.provider}): {str(e)}")
+                content = await self._generate_gemini(prompt, temperature, max_tokens, usage)
+            elif self.provider == 'mock':
+                content = await self.client.generate(prompt, temperature, max_tokens, usage, n)
+        
+        latency = time.monotonic() - start
+        if n == 1:
+            self._latencies.add(latency)  # Multi-sample latency would skew hedging
+        self._record_call(task, max_tokens, prompt, usage, latency, samples=n)
+        
+        if usage.get('truncated') and max_tokens < MAX_OUTPUT_TOKENS:
+            return await self._request(prompt, temperature, MAX_OUTPUT_TOKENS, task, n, flags)
+        if flags is not None:
+            flags['truncated'] = bool(usage.get('truncated'))
+        return content
+    
+    async def _stream_request(self, prompt, temperature, max_tokens=MAX_OUTPUT_TOKENS, task=None, hedge=False,
+                              flags=None):
+        """
+        Stream one provider request, optionally hedged on time to first chunk.
+        
+        When hedging, a second stream is opened if the first chunk takes longer
+        than the recent p95; the stream that produces output first is kept and
+        the other is closed. flags['truncated'] is set from the stream that
+        finishes.
+        """
+        threshold = None
+        if hedge:
+            threshold = self._first_chunk_latencies.percentile(Config.HEDGE_LATENCY_PERCENTILE)
+        
+        start = time.monotonic()
+        streams = {}
+        winner = None
+        try:
+            stream = self._provider_stream(prompt, temperature, max_tokens, task, flags)
+            streams[asyncio.ensure_future(_next_chunk(stream))] = stream
+            
+            if threshold is not None:
+                done, _ = await asyncio.wait(list(streams), timeout=threshold)
+                if not done:
+                    self.hedged_requests += 1
+                    stream = self._provider_stream(prompt, temperature, max_tokens, task, flags)
+                    streams[asyncio.ensure_future(_next_chunk(stream))] = stream
+            
+            try:
+                winner = await _first_successful(list(streams))
+            except StopAsyncIteration:
+                return
+        finally:
+            for pending, stream in streams.items():
+                if pending is not winner:
+                    pending.cancel()
+                    await asyncio.gather(pending, return_exceptions=True)
+                    await stream.aclose()
+        
+        self._first_chunk_latencies.add(time.monotonic() - start)
+        stream = streams[winner]
+        try:
+            yield winner.result()
+            async for chunk in stream:
+                yield chunk
+        finally:
+            await stream.aclose()
+    
+    async def _provider_stream(self, prompt, temperature, max_tokens, task, flags=None):
+        """Stream text chunks from the provider under the rate limiter, recording usage and truncation."""
+        usage = {}
+        start = time.monotonic()
+        self.upstream_requests += 1
+        async with self._rate_limited(prompt, max_tokens, task):
+            if self.provider == 'openai':
+                async for chunk in self._stream_openai(prompt, temperature, max_tokens, usage):
+                    yield chunk
+            elif self.provider == 'gemini':
+                async for chunk in self._stream_gemini(prompt, temperature, max_tokens, usage):
+                    yield chunk
+            elif self.provider == 'mock':
+                async for chunk in self.client.stream(prompt, temperature, max_tokens, usage):
+                    yield chunk
+    
+        self._record_call(task, max_tokens, prompt, usage, time.monotonic() - start, streamed=True)
+        if flags is not None:
+            flags['truncated'] = bool(usage.get('truncated'))
     
-    def _generate_openai(self, prompt, temperature):
-        """Generate content using OpenAI API."""
-        # Models that don't support temperature parameter
-        # These models only support default temperature (1.0)
-        models_without_temperature = ['gpt-5', 'o1-preview', 'o1-mini', 'o1', 'o3-mini', 'o3']
+    def _record_call(self, task, max_tokens, prompt, usage, latency, streamed=False, cache_hit=False,
+                     coalesced=False, samples=1):
+        """Append one entry to the API call log."""
+        if not Config.ENABLE_API_CALL_LOG:
+            return
         
+        get_usage_log().record({
+            'provider': self.provider,
+            'model': self.model,
+            'task': task,
+            'max_tokens': max_tokens,
+            'estimated_prompt_tokens': estimate_tokens(prompt),
+            'prompt_tokens': usage.get('prompt_tokens'),
+            'cached_tokens': usage.get('cached_tokens'),
+            'completion_tokens': usage.get('completion_tokens'),
+            'reasoning_tokens': usage.get('reasoning_tokens'),
+            'truncated': usage.get('truncated', False),
+            'latency': round(latency, 3),
+            'streamed': streamed,
+            'cache_hit': cache_hit,
+            'coalesced': coalesced,
+            'samples': samples
+        })
+    
+    @contextlib.asynccontextmanager
+    async def _rate_limited(self, prompt, max_tokens=MAX_OUTPUT_TOKENS, task=None):
+        """
+        Hold a global scheduler slot and a rate limiter slot for one provider request.
+        
+        The scheduler caps in-flight calls across every client and admits
+        them by priority (see llm_scheduler). Queueing time is tracked
+        separately from model latency, and 429s or timeouts shrink the
+        provider's allowed concurrency.
+        
+        Args:
+            prompt: Prompt text (used to estimate token usage)
+            max_tokens: Requested output budget
+            task: Task name (sets the default priority class)
+        """
+        slot = self.scheduler.slot(priority_for(task)) if self.scheduler else contextlib.nullcontext()
+        async with slot:
+            if not self.rate_limiter:
+                yield
+                return
+        
+            # Providers count the requested output budget against TPM up front
+            estimated_tokens = estimate_tokens(prompt) + max_tokens
+            await self.rate_limiter.acquire(estimated_tokens)
+        
+            start = time.monotonic()
+            try:
+                yield
+            except Exception as e:
+                outcome = 'throttled' if is_throttle_error(e) else 'failed'
+                await self.rate_limiter.release(time.monotonic() - start, outcome)
+                raise
+            except BaseException:
+                await self.rate_limiter.release(time.monotonic() - start, 'cancelled')
+                raise
+            await self.rate_limiter.release(time.monotonic() - start)
+    
+    async def prewarm(self):
+        """
+        Open a pooled connection ahead of the next request.
+        
+        Sends a lightweight request so the TLS handshake happens while the
+        user is reading, not when they approve. Failures are ignored.
+        """
+        if self.router:
+            await asyncio.gather(*(backend.prewarm() for backend in self.backends.values()))
+            return
+        
+        try:
+            if self.provider == 'openai':
+                await self.client.models.list()
+        except Exception:
+            pass
+    
+    def _openai_request_args(self, prompt, temperature, max_tokens=MAX_OUTPUT_TOKENS):
+        """Build chat completion arguments for the current model."""
         # Check if current model doesn't support temperature
         supports_temperature = not any(
-            self.model.startswith(model) for model in models_without_temperature
+            self.model.startswith(model) for model in MODELS_WITHOUT_TEMPERATURE
         )
         
+        request_args = {
+            'model': self.model,
+            'messages': [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            'max_completion_tokens': max_tokens
+        }
+        
+        # Models that don't support temperature - use only required parameters
         if supports_temperature:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are a professional content writer and editor. Follow the instructions precisely and generate high-quality content."},
-                    {"role": "user", "content": prompt}
-                ],
+            request_args['temperature'] = temperature
+        
+        return request_args
+    
+    async def _generate_openai(self, prompt, temperature, max_tokens=MAX_OUTPUT_TOKENS, usage=None, n=1):
+        """Generate content using OpenAI API (a list of n completions when n > 1)."""
+        request_args = self._openai_request_args(prompt, temperature, max_tokens)
+        if n > 1:
+            request_args['n'] = n
+        response = await self.client.chat.completions.create(**request_args)
+        if usage is not None:
+            _openai_usage(response, usage)
+            usage['truncated'] = any(choice.finish_reason == 'length' for choice in response.choices)
+        if n > 1:
+            return [choice.message.content for choice in sorted(response.choices, key=lambda choice: choice.index)]
+        return response.choices[0].message.content
+    
+    async def _stream_openai(self, prompt, temperature, max_tokens=MAX_OUTPUT_TOKENS, usage=None):
+        """Stream content using OpenAI API."""
+        stream = await self.client.chat.completions.create(
+            **self._openai_request_args(prompt, temperature, max_tokens),
+            stream=True,
+            stream_options={'include_usage': True}
+        )
+        async for chunk in stream:
+            if usage is not None:
+                # Usage arrives on a final chunk without choices
+                _openai_usage(chunk, usage)
+                if chunk.choices and getattr(chunk.choices[0], 'finish_reason', None) == 'length':
+                    usage['truncated'] = True
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    
+    def _gemini_model(self, temperature, max_tokens=MAX_OUTPUT_TOKENS):
+        """
+        Get a GenerativeModel with generation config and safety settings applied.
+        
+        Models are built once per (model, temperature, max tokens) and reused,
+        so back-to-back calls such as the editor passes skip the setup cost.
+        
+        Args:
+            temperature: Sampling temperature
+            max_tokens: Output token budget
+        
+        Returns:
+            Cached GenerativeModel instance
+        """
+        model_key = (self.model, temperature, max_tokens)
+        model = self._gemini_models.get(model_key)
+        
+        if model is None:
+            generation_config = self.genai.types.GenerationConfig(
                 temperature=temperature,
-                max_completion_tokens=16384
+                max_output_tokens=max_tokens
             )
-        else:
-            # Models that don't support temperature - use only required parameters
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are a professional content writer and editor. Follow the instructions precisely and generate high-quality content."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_completion_tokens=16384
+            model = self.genai.GenerativeModel(
+                self.model,
+                safety_settings=GEMINI_SAFETY_SETTINGS,
+                generation_config=generation_config
             )
-        return response.choices[0].message.content
+            self._gemini_models[model_key] = model
+        
+        return model
     
-    def _generate_gemini(self, prompt, temperature):
+    async def _generate_gemini(self, prompt, temperature, max_tokens=MAX_OUTPUT_TOKENS, usage=None):
         """Generate content using Google Gemini API."""
-        model = self.genai.GenerativeModel(self.model)
-        
-        # Configure safety settings to most permissive (BLOCK_NONE)
-        safety_settings = [
-            {
-                "category": "HARM_CATEGORY_HARASSMENT",
-                "threshold": "BLOCK_NONE"
-            },
-            {
-                "category": "HARM_CATEGORY_HATE_SPEECH",
-                "threshold": "BLOCK_NONE"
-            },
-            {
-                "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
-                "threshold": "BLOCK_NONE"
-            },
-            {
-                "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
-                "threshold": "BLOCK_NONE"
-            }
-        ]
-        
-        generation_config = self.genai.types.GenerationConfig(
-            temperature=temperature,
-            max_output_tokens=16384
-        )
+        response = await self._gemini_model(temperature, max_tokens).generate_content_async(prompt)
         
-        response = model.generate_content(
-            prompt,
-            generation_config=generation_config,
-            safety_settings=safety_settings
-        )
+        if usage is not None:
+            _gemini_usage(response, usage)
+            if usage['truncated'] and max_tokens < MAX_OUTPUT_TOKENS:
+                # Budget (or hidden reasoning) ran out; the caller retries with the full budget
+                return response.text if response.candidates[0].content.parts else ''
+        
+        self._check_gemini_response(response)
+        return response.text
+    
+    async def _stream_gemini(self, prompt, temperature, max_tokens=MAX_OUTPUT_TOKENS, usage=None):
+        """Stream content using Google Gemini API."""
+        response = await self._gemini_model(temperature, max_tokens).generate_content_async(prompt, stream=True)
+        
+        received_text = False
+        async for chunk in response:
+            if usage is not None:
+                _gemini_usage(chunk, usage)
+            if chunk.candidates and chunk.candidates[0].content.parts:
+                received_text = True
+                yield chunk.text
+            elif not received_text:
+                self._check_gemini_response(chunk)
         
+        if not received_text:
+            self._check_gemini_response(response)
+    
+    def _check_gemini_response(self, response):
+        """Raise a helpful error if a Gemini response carries no content."""
         # Check if response was blocked by safety filters
         if not response.candidates or not response.candidates[0].content.parts:
-            # Get the finish reason
-            finish_reason = response.candidates[0].finish_reason if response.candidates else "UNKNOWN"
+            # Get the finish reason (or the prompt block reason when there is no candidate)
+            if response.candidates:
+                finish_reason = _gemini_reason_name(response.candidates[0].finish_reason)
+            else:
+                feedback = getattr(response, 'prompt_feedback', None)
+                finish_reason = _gemini_reason_name(
+                    getattr(feedback, 'block_reason', None), GEMINI_PROMPT_BLOCK_REASONS
+                ) or "UNKNOWN"
             
             # Provide helpful error message
-            if finish_reason == 2:  # SAFETY
-                raise Exception(
-                    "Content was blocked by Gemini's safety filters. "
+            if finish_reason in GEMINI_BLOCK_REASONS:
+                raise SafetyBlockedError(
+                    f"API Error (gemini): Content was blocked by Gemini's safety filters ({finish_reason}). "
                     "This usually happens with certain topics or phrasing. "
                     "Try: 1) Revising your input content, 2) Adjusting safety_settings, "
                     "or 3) Using OpenAI instead (set AI_PROVIDER=openai in .env)"
@@ -120,6 +1164,196 @@ class APIClient:
             else:
                 raise Exception(f"No content returned. Finish reason: {finish_reason}")
         
-        return response.text
 
+class APIClient:
+    """Wrapper for AI API calls with multi-provider support.
+    
+    Thin synchronous facade over AsyncAPIClient: every call runs on the
+    shared event loop, so it is safe to use from worker threads.
+    """
+    
+    def __init__(self, model=None):
+        """Initialize API client for the configured provider.
+        
+        Args:
+            model: Optional model override. For OpenAI, this should be the specific
+                   agent model. For Gemini, this parameter is ignored and the
+                   default model is used.
+        """
+        self.async_client = AsyncAPIClient(model)
+        
+        # Optional callable receiving text chunks as they arrive, then None
+        # once the response is complete. When set, generate_content streams.
+        self.stream_handler = None
+    
+    @property
+    def provider(self):
+        """Configured AI provider name."""
+        return self.async_client.provider
+    
+    @property
+    def model(self):
+        """Model used for requests."""
+        return self.async_client.model
+    
+    @property
+    def cache(self):
+        """Shared response cache, or None when caching is disabled."""
+        return self.async_client.cache
+    
+    @property
+    def rate_limiter(self):
+        """Shared provider rate limiter, or None when rate limiting is disabled."""
+        return self.async_client.rate_limiter
+    
+    def generate_content(self, prompt, temperature=0.7, use_cache=False, hedge=False, task=None, source_text=None):
+        """
+        Generate content using the configured AI provider.
+        
+        Args:
+            prompt: Full prompt text
+            temperature: Sampling temperature
+            use_cache: If True, serve identical earlier requests from the
+                       response cache. Leave False for sampled variations.
+            hedge: If True, duplicate requests slower than the recent p95
+                   (see AsyncAPIClient.generate_content)
+            task: Optional task name used to size the output budget
+            source_text: Text the output is derived from
+        
+        Returns:
+            Generated text
+        """
+        return run_sync(self.async_client.generate_content(
+            prompt, temperature, use_cache=use_cache, on_chunk=self.stream_handler, hedge=hedge,
+            task=task, source_text=source_text
+        ))
+    
+    @property
+    def supports_samples(self):
+        """Whether generate_samples() can return several completions from one request."""
+        return self.async_client.supports_samples
+    
+    def generate_samples(self, prompt, temperature, n, task=None, source_text=None):
+        """
+        Sample several completions of one prompt in a single request.
+        
+        Args:
+            prompt: Full prompt text
+            temperature: Sampling temperature
+            n: Number of completions
+            task: Optional task name used to size the output budget (per completion)
+            source_text: Text the output is derived from
+        
+        Returns:
+            List of n generated texts (see AsyncAPIClient.generate_samples)
+        """
+        return run_sync(self.async_client.generate_samples(prompt, temperature, n, task, source_text))
+    
+    def prewarm(self):
+        """Start warming the shared connection pool in the background."""
+        asyncio.run_coroutine_threadsafe(self.async_client.prewarm(), get_event_loop())
+    
+    def generate_content_stream(self, prompt, temperature=0.7, task=None, source_text=None):
+        """
+        Generate content incrementally using the configured AI provider.
+        
+        Args:
+            prompt: Full prompt text
+            temperature: Sampling temperature
+            task: Optional task name used to size the output budget
+            source_text: Text the output is derived from
+        
+        Yields:
+            Text chunks in the order the provider produces them
+        """
+        stream = self.async_client.generate_content_stream(prompt, temperature, task, source_text)
+        try:
+            while True:
+                try:
+                    yield run_sync(_next_chunk(stream))
+                except StopAsyncIteration:
+                    break
+        finally:
+            run_sync(stream.aclose())
+
+
+async def _at_priority(priority, coro):
+    """Await a coroutine inside priority_scope(priority), carrying a caller thread's priority onto the loop."""
+    with priority_scope(priority):
+        return await coro
+
+
+def _replay_chunks(content, count=50):
+    """Split recorded text into about `count` word-aligned chunks for replayed streaming."""
+    words = re.findall(r"\S+\s*", content) or [content]
+    size = max(1, -(-len(words) // count))
+    return [''.join(words[i:i + size]) for i in range(0, len(words), size)]
+
+
+async def _next_chunk(stream):
+    """Await the next item of an async generator."""
+    return await stream.__anext__()
+
+
+def _openai_usage(response, usage):
+    """Copy token counts from an OpenAI response or final stream chunk."""
+    counts = getattr(response, 'usage', None)
+    if not counts:
+        return
+    
+    usage['prompt_tokens'] = counts.prompt_tokens
+    usage['completion_tokens'] = counts.completion_tokens
+    details = getattr(counts, 'completion_tokens_details', None)
+    usage['reasoning_tokens'] = getattr(details, 'reasoning_tokens', None) or 0
+    prompt_details = getattr(counts, 'prompt_tokens_details', None)
+    usage['cached_tokens'] = getattr(prompt_details, 'cached_tokens', None) or 0
 
+
+def _gemini_reason_name(reason, names=GEMINI_FINISH_REASONS):
+    """Name of a Gemini finish or block reason, whether the SDK returns an enum or a bare int."""
+    if reason is None:
+        return None
+    name = getattr(reason, 'name', None)
+    if name:
+        return name
+    return names.get(reason, str(reason))
+
+
+def _gemini_usage(response, usage):
+    """Copy token counts and truncation from a Gemini response or stream chunk."""
+    counts = getattr(response, 'usage_metadata', None)
+    if counts:
+        usage['prompt_tokens'] = counts.prompt_token_count
+        usage['completion_tokens'] = counts.candidates_token_count
+        usage['reasoning_tokens'] = getattr(counts, 'thoughts_token_count', 0) or 0
+        usage['cached_tokens'] = getattr(counts, 'cached_content_token_count', 0) or 0
+    
+    if response.candidates:
+        finish_reason = response.candidates[0].finish_reason
+        usage['truncated'] = _gemini_reason_name(finish_reason) == 'MAX_TOKENS'
+    else:
+        usage.setdefault('truncated', False)
+
+
+async def _first_successful(tasks):
+    """
+    Wait for the first task that finishes without an error.
+    
+    Args:
+        tasks: Futures racing for the same result
+    
+    Returns:
+        The winning task
+    
+    Raises:
+        The first error seen if every task fails
+    """
+    pending = set(tasks)
+    error = None
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if task.exception() is None:
+                return task
+            error = error or task.exception()
+    raise error
@@ -0,0 +1,180 @@
+"""Async Pipeline - Unattended WRITER -> LLMON -> EDITOR runs for many briefs at once."""
+import os
+import sys
+import asyncio
+import argparse
+from agents import WriterAgent, LLMONAgent, EditorAgent
+from api_client import run_sync
+from config import Config
+from llm_scheduler import BACKGROUND, priority_scope
+from utils import read_file, ensure_dir, write_file, get_timestamp, print_header, print_info, print_success, print_error
+
+
+class AsyncContentPipeline:
+    """Runs the 3-agent pipeline for many briefs concurrently on one event loop."""
+    
+    def __init__(self, content_mode=None):
+        """
+        Initialize pipeline with agents.
+        
+        Args:
+            content_mode: 'article' or 'tool_review' (defaults to Config.CONTENT_MODE)
+        """
+        self.content_mode = content_mode or Config.CONTENT_MODE
+        self.writer = WriterAgent()
+        self.llmon = LLMONAgent()
+        self.editor = EditorAgent()
+        
+        self.quality_analyzer = None
+        if Config.ENABLE_QUALITY_SCORING:
+            from quality_analyzer import QualityAnalyzer
+            self.quality_analyzer = QualityAnalyzer()
+        
+        self.differentiator = None
+        if Config.ENABLE_VARIATION_VALIDATION:
+            from variation_differentiator import VariationDifferentiator
+            self.differentiator = VariationDifferentiator(Config.MIN_VARIATION_DIFFERENCE)
+    
+    def get_input_paths(self):
+        """
+        Get template, prompt and rules paths for the content mode.
+        
+        Returns:
+            Dictionary of input file paths
+        """
+        if self.content_mode == 'tool_review':
+            return {
+                'template': os.path.join(Config.TEMPLATES_DIR, "tool_review_structure.md"),
+                'references': os.path.join(Config.TEMPLATES_DIR, "references.md"),
+                'prompt': os.path.join(Config.TEMPLATES_DIR, "tool_review_writer_prompt.md"),
+                'llmon_rules': os.path.join(Config.RULES_DIR, "llmon_tool_review_rules.md"),
+                'editor_rules': os.path.join(Config.RULES_DIR, "editor_tool_review_rules.md")
+            }
+        
+        return {
+            'template': os.path.join(Config.TEMPLATES_DIR, "template.md"),
+            'references': os.path.join(Config.TEMPLATES_DIR, "references.md"),
+            'prompt': os.path.join(Config.TEMPLATES_DIR, "writer_prompt.md"),
+            'llmon_rules': os.path.join(Config.RULES_DIR, "llmon_rules.md"),
+            'editor_rules': os.path.join(Config.RULES_DIR, "editor_rules.md")
+        }
+    
+    async def run_article(self, manual_path, output_dir):
+        """
+        Run all three stages for a single brief.
+        
+        Args:
+            manual_path: Path to the content brief (manual.md or tool_review_brief.md)
+            output_dir: Directory for this article's outputs
+        
+        Returns:
+            Path to the saved final article
+        """
+        paths = self.get_input_paths()
+        
+        # Stage 1: Writer
+        if self.content_mode == 'tool_review':
+            draft = await self.writer.generate_draft_tool_review_async(
+                manual_path, paths['template'], paths['references'], paths['prompt']
+            )
+        else:
+            draft = await self.writer.generate_draft_async(
+                manual_path, paths['template'], paths['references'], paths['prompt']
+            )
+        write_file(os.path.join(output_dir, "01_writer_draft.md"), draft)
+        
+        # Stage 2: LLMON
+        variations = await self.llmon.generate_variations_async(
+            draft, paths['llmon_rules'], self.differentiator
+        )
+        for i, variation in enumerate(variations, 1):
+            write_file(os.path.join(output_dir, f"02_llmon_variation{i}.md"), variation)
+        
+        selected = self._select_variation(variations)
+        
+        # Stage 3: Editor
+        if self.content_mode == 'tool_review':
+            final_article = await self.editor.polish_article_tool_review_async(selected, paths['editor_rules'])
+        elif Config.ENABLE_MULTIPASS_EDITING:
+            final_article = await self.editor.polish_article_multipass_async(selected, paths['editor_rules'])
+        else:
+            final_article = await self.editor.polish_article_async(selected, paths['editor_rules'])
+        
+        final_path = os.path.join(output_dir, "FINAL_ARTICLE.md")
+        write_file(final_path, final_article)
+        return final_path
+    
+    async def run_many(self, manual_paths, batch_dir=None):
+        """
+        Run the pipeline for every brief concurrently.
+        
+        Args:
+            manual_paths: List of content brief paths
+            batch_dir: Optional output directory (defaults to outputs/batch_<timestamp>)
+        
+        Returns:
+            List of (manual_path, final_path or Exception) tuples in input order
+        """
+        batch_dir = batch_dir or os.path.join(Config.OUTPUTS_DIR, f"batch_{get_timestamp()}")
+        ensure_dir(batch_dir)
+        
+        # Unattended batch work: interactive calls are admitted ahead of it
+        with priority_scope(BACKGROUND):
+            jobs = []
+            for i, manual_path in enumerate(manual_paths, 1):
+                name = os.path.splitext(os.path.basename(manual_path))[0]
+                output_dir = os.path.join(batch_dir, f"{i:03d}_{name}")
+                jobs.append(self.run_article(manual_path, output_dir))
+        
+            results = await asyncio.gather(*jobs, return_exceptions=True)
+        return list(zip(manual_paths, results))
+    
+    def _select_variation(self, variations):
+        """Pick the highest quality variation (or the first without scoring)."""
+        if not self.quality_analyzer:
+            return variations[0]
+        
+        paths = self.get_input_paths()
+        template = read_file(paths['template'])
+        
+        return max(
+            variations,
+            key=lambda variation: self.quality_analyzer.analyze(variation, template)['overall_score']
+        )
+
+
+def main():
+    """Run the unattended pipeline for the briefs given on the command line."""
+    parser = argparse.ArgumentParser(description="Run WRITER -> LLMON -> EDITOR for many briefs concurrently.")
+    parser.add_argument('briefs', nargs='+', help="Paths to content brief files")
+    parser.add_argument('--mode', choices=['article', 'tool_review'], default=None,
+                        help="Content mode (defaults to CONTENT_MODE)")
+    args = parser.parse_args()
+    
+    print_header("AI-Content-Studio BATCH PIPELINE")
+    print_info(f"Running {len(args.briefs)} brief(s) concurrently...")
+    
+    pipeline = AsyncContentPipeline(args.mode)
+    results = run_sync(pipeline.run_many(args.briefs))
+    
+    failures = 0
+    for manual_path, result in results:
+        if isinstance(result, Exception):
+            failures += 1
+            print_error(f"{manual_path}: {str(result)}")
+        else:
+            print_success(f"{manual_path} -> {result}")
+    
+    limiter = pipeline.writer.client.rate_limiter
+    if limiter:
+        stats = limiter.get_stats()
+        print_info(
+            f"{stats['total_requests']} API request(s), {stats['throttled_requests']} throttled | "
+            f"queueing {stats['total_queue_delay']:.1f}s vs model latency {stats['total_model_latency']:.1f}s"
+        )
+    
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
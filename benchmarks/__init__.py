@@ -0,0 +1 @@
+"""Micro-benchmarks for AI-Content-Studio (run with `python -m benchmarks.<name>`)."""
@@ -0,0 +1,78 @@
+"""Compare pairwise vs vectorized similarity in VariationDifferentiator.
+
+For N = 3 to 200 mock articles, times the old approach (one TF-IDF fit per
+pair, O(N^2) fits) against one fit and one sparse matrix product, plus a
+full validate / report / suggest / least-different-pair sequence that now
+shares one cached matrix. The pairwise baseline is skipped above a size
+limit because it takes minutes at N = 200.
+
+Usage:
+    python -m benchmarks.bench_differentiator [max_pairwise_n] [words_per_article]
+"""
+import sys
+import time
+from unittest import mock
+from config import Config
+
+SIZES = (3, 5, 10, 25, 50, 100, 200)
+
+
+def _pairwise_matrix(differentiator, texts):
+    """Baseline: a fresh two-document TF-IDF fit for every pair."""
+    n = len(texts)
+    matrix = [[1.0] * n for _ in range(n)]
+    for i in range(n):
+        for j in range(i + 1, n):
+            pair = differentiator._vectorize([texts[i], texts[j]])
+            matrix[i][j] = matrix[j][i] = float((pair[0] @ pair[1].T).toarray()[0, 0])
+    return matrix
+
+
+def _timed(fn, *args):
+    """Run fn once; return (seconds, result)."""
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    """Run the benchmark and print a summary."""
+    max_pairwise = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    words = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    
+    from mock_provider import MockProvider
+    from variation_differentiator import VariationDifferentiator
+    
+    with mock.patch.multiple(Config, MOCK_OUTPUT_WORDS=words):
+        provider = MockProvider()
+        texts = [provider.complete(f"Write article {i} about remote team rituals.", 0.7, 16384)[0]
+                 for i in range(max(SIZES))]
+    
+    print(f"VariationDifferentiator similarity, {words}-word mock articles "
+          f"(pairwise baseline up to N={max_pairwise})")
+    print(f"  {'N':>4}  {'pairs':>6}  {'pairwise':>10}  {'vectorized':>10}  {'speedup':>8}  {'report+suggest':>15}")
+    for n in SIZES:
+        subset = texts[:n]
+        vectorized, _ = _timed(VariationDifferentiator()._compute_matrix, subset)
+        
+        if n <= max_pairwise:
+            pairwise, _ = _timed(_pairwise_matrix, VariationDifferentiator(), subset)
+            speedup = f"{pairwise / vectorized:7.1f}x"
+            pairwise_text = f"{pairwise * 1000:8.1f}ms"
+        else:
+            pairwise_text, speedup = f"{'skipped':>10}", f"{'-':>8}"
+        
+        differentiator = VariationDifferentiator()
+        start = time.perf_counter()
+        differentiator.validate_variations(subset)
+        differentiator.get_differentiation_report(subset)
+        differentiator.suggest_regeneration(subset)
+        differentiator.identify_least_different_pair(subset)
+        combined = time.perf_counter() - start
+        
+        print(f"  {n:>4}  {n * (n - 1) // 2:>6}  {pairwise_text:>10}  {vectorized * 1000:8.1f}ms  {speedup:>8}  "
+              f"{combined * 1000:13.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
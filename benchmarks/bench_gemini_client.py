@@ -0,0 +1,92 @@
+"""Benchmark per-call Gemini client overhead with a stubbed transport.
+
+Compares the previous behaviour (rebuild GenerativeModel, GenerationConfig and
+safety settings on every call) against the cached models in AsyncAPIClient.
+No network access or real API key is needed.
+
+Usage:
+    python -m benchmarks.bench_gemini_client [calls]
+"""
+import sys
+import time
+from unittest import mock
+from config import Config
+
+
+class _StubTransport:
+    """Stands in for the Gemini async gRPC client and answers instantly."""
+    
+    def __init__(self, protos):
+        self.protos = protos
+    
+    async def generate_content(self, request, **kwargs):
+        protos = self.protos
+        return protos.GenerateContentResponse(candidates=[
+            protos.Candidate(
+                content=protos.Content(parts=[protos.Part(text="ok")], role="model"),
+                finish_reason=1
+            )
+        ])
+
+
+async def _legacy_call(genai, prompt, temperature):
+    """Previous _generate_gemini setup: everything rebuilt per call."""
+    from api_client import GEMINI_SAFETY_SETTINGS, MAX_OUTPUT_TOKENS
+    model = genai.GenerativeModel(Config.MODEL_NAME)
+    safety_settings = [dict(setting) for setting in GEMINI_SAFETY_SETTINGS]
+    generation_config = genai.types.GenerationConfig(
+        temperature=temperature,
+        max_output_tokens=MAX_OUTPUT_TOKENS
+    )
+    response = await model.generate_content_async(
+        prompt,
+        generation_config=generation_config,
+        safety_settings=safety_settings
+    )
+    return response.text
+
+
+async def _run(calls):
+    """Time both paths and return microseconds per call."""
+    import google.generativeai as genai
+    from google.generativeai import generative_models
+    from api_client import AsyncAPIClient
+    
+    stub = _StubTransport(genai.protos)
+    with mock.patch.object(generative_models.client, 'get_default_generative_async_client', return_value=stub):
+        client = AsyncAPIClient()
+        temperatures = [0.4, 0.5, 0.4, 0.4]  # editor tool review pass chain
+        
+        # Warm up both paths
+        await _legacy_call(genai, "warm up", 0.4)
+        await client._generate_gemini("warm up", 0.4)
+        
+        start = time.perf_counter()
+        for i in range(calls):
+            await _legacy_call(genai, "prompt", temperatures[i % 4])
+        legacy = (time.perf_counter() - start) / calls * 1e6
+        
+        start = time.perf_counter()
+        for i in range(calls):
+            await client._generate_gemini("prompt", temperatures[i % 4])
+        cached = (time.perf_counter() - start) / calls * 1e6
+    
+    return legacy, cached
+
+
+def main():
+    """Run the benchmark and print a summary."""
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    
+    with mock.patch.multiple(Config, AI_PROVIDER='gemini', GEMINI_API_KEY='bench-key'):
+        from api_client import run_sync
+        legacy, cached = run_sync(_run(calls))
+    
+    print(f"Gemini per-call client overhead ({calls} calls, stubbed transport)")
+    print(f"  Rebuild per call: {legacy:8.1f} us/call")
+    print(f"  Cached model:     {cached:8.1f} us/call")
+    print(f"  Saved:            {legacy - cached:8.1f} us/call ({(1 - cached / legacy) * 100:.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
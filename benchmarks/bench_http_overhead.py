@@ -0,0 +1,84 @@
+"""Measure end-to-end HTTP overhead and connection pool reuse.
+
+Sends the same requests through AsyncAPIClient twice: once to the in-process
+mock provider and once over HTTP to local_openai_server.py (both with zero
+model latency), so the difference is the cost of the OpenAI SDK, JSON and
+HTTP round trips. Also reports how many TCP connections the pool opened.
+
+Usage:
+    python -m benchmarks.bench_http_overhead [requests] [concurrency] [stream]
+"""
+import sys
+import time
+import asyncio
+from unittest import mock
+from config import Config
+
+
+async def _run(client, requests, concurrency, stream):
+    """Send `requests` calls with at most `concurrency` in flight; return seconds."""
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def one(i):
+        async with semaphore:
+            if stream:
+                return await client.generate_content(f"Request {i}", 0.5, on_chunk=lambda chunk: None)
+            return await client.generate_content(f"Request {i}", 0.5)
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return time.perf_counter() - start
+
+
+def _measure(provider, requests, concurrency, stream):
+    """Time one batch against a provider with fresh shared clients."""
+    import api_client
+    with mock.patch.object(Config, 'AI_PROVIDER', provider), \
+         mock.patch.object(api_client, '_provider_clients', {}):
+        client = api_client.AsyncAPIClient(model='gpt-local')
+        api_client.run_sync(_run(client, 2, 1, stream))  # open the pool and warm up
+        return api_client.run_sync(_run(client, requests, concurrency, stream))
+
+
+def main():
+    """Run the benchmark and print a summary."""
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    stream = len(sys.argv) > 3 and sys.argv[3] == 'stream'
+    
+    from local_openai_server import start_server
+    server = start_server()
+    try:
+        with mock.patch.multiple(
+            Config,
+            OPENAI_API_KEY='sk-local',
+            OPENAI_WRITER_MODEL='gpt-local',
+            OPENAI_LLMON_MODEL='gpt-local',
+            OPENAI_EDITOR_MODEL='gpt-local',
+            OPENAI_BASE_URL=server.base_url,
+            MOCK_LATENCY_SECONDS=0,
+            MOCK_TOKENS_PER_SECOND=0,
+            MOCK_OUTPUT_WORDS=300,
+            ENABLE_RESPONSE_CACHE=False,
+            ENABLE_RATE_LIMITER=False,
+            ENABLE_API_CALL_LOG=False
+        ):
+            in_process = _measure('mock', requests, concurrency, stream)
+            before = server.get_stats()
+            over_http = _measure('openai', requests, concurrency, stream)
+            after = server.get_stats()
+    finally:
+        server.shutdown()
+        server.server_close()
+    
+    mode = "streamed" if stream else "non-streamed"
+    connections = after['connections'] - before['connections']
+    print(f"End-to-end overhead, {requests} {mode} requests at concurrency {concurrency}")
+    print(f"  In-process mock:    {in_process / requests * 1000:7.2f} ms/request ({requests / in_process:7.1f} req/s)")
+    print(f"  HTTP stand-in:      {over_http / requests * 1000:7.2f} ms/request ({requests / over_http:7.1f} req/s)")
+    print(f"  HTTP overhead:      {(over_http - in_process) / requests * 1000:7.2f} ms/request")
+    print(f"  TCP connections:    {connections} for {after['requests'] - before['requests']} HTTP requests")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Compare LLMON variation generation: one request per variation vs one batched request.
+
+Generates LLMON_VERSIONS_COUNT variations of the same article against the
+offline mock provider in each LLMON_BATCH_MODE ('off' = the thread-pool path
+with one request per variation, 'n' = provider-side sampling, 'delimited' =
+one multi-output prompt) and reports wall time, requests and prompt /
+completion tokens from the API call log.
+
+Usage:
+    python -m benchmarks.bench_llmon_batch [runs] [latency_seconds] [tokens_per_second]
+"""
+import io
+import os
+import sys
+import time
+import shutil
+import tempfile
+import contextlib
+from unittest import mock
+from config import Config
+
+MODES = ('off', 'n', 'delimited')
+
+
+def _run_once(mode, article, rules_path):
+    """Generate one set of variations; return wall time, variation count and usage totals."""
+    import api_client
+    import token_budget
+    from agents import LLMONAgent
+    
+    with mock.patch.object(Config, 'LLMON_BATCH_MODE', mode), \
+         mock.patch.object(api_client, '_provider_clients', {}), \
+         mock.patch.object(token_budget, '_usage_log', None), \
+         contextlib.redirect_stdout(io.StringIO()):
+        llmon = LLMONAgent()
+        start = time.perf_counter()
+        variations = llmon.generate_variations_parallel(article, rules_path)
+        elapsed = time.perf_counter() - start
+        totals = token_budget.get_usage_log().get_totals()
+    
+    return elapsed, len(variations), totals
+
+
+def main():
+    """Run the benchmark and print a summary."""
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
+    tokens_per_second = float(sys.argv[3]) if len(sys.argv) > 3 else 500
+    
+    temp_dir = tempfile.mkdtemp()
+    try:
+        with mock.patch.multiple(
+            Config,
+            AI_PROVIDER='mock',
+            MOCK_LATENCY_DISTRIBUTION='fixed',
+            MOCK_LATENCY_SECONDS=latency,
+            MOCK_TOKENS_PER_SECOND=tokens_per_second,
+            MOCK_OUTPUT_WORDS=800,
+            ENABLE_RESPONSE_CACHE=False,
+            ENABLE_RATE_LIMITER=False,
+            API_CALL_LOG_PATH=os.path.join(temp_dir, 'logs', 'api_calls.jsonl')
+        ):
+            from mock_provider import MockProvider
+            article, _ = MockProvider().complete("Write an article about remote team rituals.", 0.7, 16384)
+            rules_path = os.path.join(Config.RULES_DIR, 'llmon_rules.md')
+            
+            print(f"LLMON variations, mock provider ({Config.LLMON_VERSIONS_COUNT} variations, {runs} runs, "
+                  f"{latency}s latency, {tokens_per_second or 'instant'} tokens/s, {len(article.split())}-word article)")
+            
+            results = {}
+            for mode in MODES:
+                timings = []
+                for _ in range(runs):
+                    elapsed, count, totals = _run_once(mode, article, rules_path)
+                    timings.append(elapsed)
+                timings.sort()
+                results[mode] = (timings[len(timings) // 2], count, totals)
+            
+            baseline_time, _, baseline = results['off']
+            for mode, (elapsed, count, totals) in results.items():
+                print(f"  {mode:<10} {elapsed:6.2f}s median ({elapsed - baseline_time:+.2f}s)  "
+                      f"{totals['calls']} request(s), {count} variations  "
+                      f"prompt {totals['prompt_tokens']:>6,} tokens "
+                      f"({totals['prompt_tokens'] - baseline['prompt_tokens']:+,}), "
+                      f"completion {totals['completion_tokens']:>6,}")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
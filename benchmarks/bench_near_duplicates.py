@@ -0,0 +1,86 @@
+"""Compare MinHash/LSH near-duplicate lookup against a full TF-IDF scan.
+
+Builds a corpus of N synthetic articles (Zipf-distributed words from a
+fixed vocabulary, so unrelated articles share common words but few
+phrases). Every tenth article has a lightly edited copy added. It then
+times one lookup of an edited article in the MinHash index against
+re-fitting TF-IDF over the corpus plus the query. It also reports how many
+stored articles the index actually scored, and whether the planted copy
+was found.
+
+Usage:
+    python -m benchmarks.bench_near_duplicates [max_n] [words_per_article]
+"""
+import sys
+import time
+import numpy as np
+
+SIZES = (100, 1000, 5000, 20000)
+VOCABULARY_SIZE = 20000
+
+
+def _corpus(n, words, rng):
+    """n synthetic articles plus a lightly edited copy of every tenth one."""
+    vocabulary = np.array([f"w{i}" for i in range(VOCABULARY_SIZE)])
+    ranks = np.minimum(rng.zipf(1.2, size=(n, words)), VOCABULARY_SIZE) - 1
+    articles = [' '.join(vocabulary[row]) for row in ranks]
+    copies = {}
+    for i in range(0, n, 10):
+        edited = articles[i].split()
+        for position in rng.choice(words, size=words // 20, replace=False):
+            edited[position] = vocabulary[rng.randint(VOCABULARY_SIZE)]
+        copies[i] = ' '.join(edited)
+    return articles, copies
+
+
+def _tfidf_scan(articles, query):
+    """Baseline: fit TF-IDF over the corpus and the query, score the query against all."""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    tfidf = TfidfVectorizer(ngram_range=(1, 2)).fit_transform(articles + [query])
+    scores = (tfidf[:-1] @ tfidf[-1].T).toarray().ravel()
+    return int(np.argmax(scores))
+
+
+def main():
+    """Run the benchmark and print a summary."""
+    max_n = int(sys.argv[1]) if len(sys.argv) > 1 else max(SIZES)
+    words = int(sys.argv[2]) if len(sys.argv) > 2 else 800
+    
+    from near_duplicate_index import create_index
+    
+    rng = np.random.RandomState(7)
+    articles, copies = _corpus(max_n, words, rng)
+    
+    print(f"Near-duplicate lookup, {words}-word synthetic articles")
+    print(f"  {'N':>6}  {'index build':>11}  {'lookup':>9}  {'scored':>7}  {'found':>5}  {'tfidf scan':>10}")
+    for n in SIZES:
+        if n > max_n:
+            break
+        subset = articles[:n]
+        query = copies[max(i for i in copies if i < n)]
+        expected = max(i for i in copies if i < n)
+        
+        index = create_index()
+        start = time.perf_counter()
+        for i, article in enumerate(subset):
+            index.add(str(i), article)
+        build = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        matches = index.query(query, limit=1)
+        lookup = time.perf_counter() - start
+        found = bool(matches) and matches[0][0] == str(expected)
+        
+        if n <= 5000:
+            start = time.perf_counter()
+            _tfidf_scan(subset, query)
+            scan_text = f"{(time.perf_counter() - start) * 1000:8.1f}ms"
+        else:
+            scan_text = f"{'skipped':>10}"
+        
+        print(f"  {n:>6}  {build:10.2f}s  {lookup * 1000:7.2f}ms  {index.last_candidates:>7}  "
+              f"{'yes' if found else 'no':>5}  {scan_text:>10}")
+
+
+if __name__ == "__main__":
+    main()
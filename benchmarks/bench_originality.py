@@ -0,0 +1,76 @@
+"""Measure the originality index at thousands of past articles.
+
+For each corpus size, indexes N synthetic articles (see
+bench_near_duplicates) and merges them into the memory-mapped main
+segment. It then times a cold open of the index from disk, one originality
+lookup of an edited copy of a stored article, and an incremental save of
+one new article. It also reports how many stored articles the lookup
+scored.
+
+Usage:
+    python -m benchmarks.bench_originality [max_n] [words_per_article] [lookups]
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import numpy as np
+from benchmarks.bench_near_duplicates import _corpus
+
+SIZES = (1000, 5000, 20000)
+
+
+def main():
+    """Run the benchmark and print a summary."""
+    max_n = int(sys.argv[1]) if len(sys.argv) > 1 else max(SIZES)
+    words = int(sys.argv[2]) if len(sys.argv) > 2 else 400
+    lookups = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+    
+    from originality_index import OriginalityIndex
+    
+    rng = np.random.RandomState(7)
+    articles, copies = _corpus(max_n, words, rng)
+    
+    print(f"Originality index, {words}-word synthetic articles (median of {lookups} lookups)")
+    print(f"  {'N':>6}  {'build+merge':>11}  {'cold open':>9}  {'lookup':>8}  {'scored':>6}  {'score':>5}  {'save 1 new':>10}")
+    for n in SIZES:
+        if n > max_n:
+            break
+        temp_dir = tempfile.mkdtemp()
+        try:
+            outputs_dir = os.path.join(temp_dir, 'outputs')
+            index_dir = os.path.join(outputs_dir, '.originality_index')
+            
+            start = time.perf_counter()
+            index = OriginalityIndex(index_dir, outputs_dir)
+            for i, article in enumerate(articles[:n]):
+                index.add(f"session{i}/FINAL_ARTICLE.md", article)
+            index.merge()
+            build = time.perf_counter() - start
+            
+            start = time.perf_counter()
+            index = OriginalityIndex(index_dir, outputs_dir)
+            cold_open = time.perf_counter() - start
+            
+            target = max(i for i in copies if i < n)
+            timings = []
+            for _ in range(lookups):
+                start = time.perf_counter()
+                result = index.originality(copies[target])
+                timings.append(time.perf_counter() - start)
+            lookup = sorted(timings)[len(timings) // 2]
+            
+            start = time.perf_counter()
+            index.add("new_session/FINAL_ARTICLE.md", articles[0][::-1])
+            index.save()
+            save = time.perf_counter() - start
+            
+            print(f"  {n:>6}  {build:10.2f}s  {cold_open * 1000:7.1f}ms  {lookup * 1000:6.2f}ms  "
+                  f"{result['candidates']:>6}  {result['score']:5.1f}  {save * 1000:8.1f}ms")
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Replay a recorded session through the full workflow as a perf regression test.
+
+Replays AIContentStudioWorkflow.run() from a session cassette (recorded with
+CASSETTE_MODE=record), so only the orchestration code is timed: API calls and
+user answers come from the cassette, with the recorded latencies scaled by
+the given factor. Without a cassette argument, a session is first recorded
+against the offline mock provider.
+
+Prompts include workflow memory, so every run starts from a copy of the
+memory directory as it was when the session was recorded (Config.MEMORY_DIR
+for a given cassette, empty for the mock recording).
+
+Usage:
+    python -m benchmarks.bench_replay_workflow [cassette] [latency_scale] [runs]
+"""
+import io
+import os
+import sys
+import time
+import shutil
+import tempfile
+import contextlib
+from unittest import mock
+from config import Config
+
+
+@contextlib.contextmanager
+def _fresh_session(mode, path, memory_snapshot, latency_scale=1.0):
+    """Reset the shared provider, limiter, usage log, cassette and memory for one run."""
+    import api_client
+    import rate_limiter
+    import token_budget
+    import session_cassette
+    
+    memory_dir = tempfile.mkdtemp()
+    shutil.rmtree(memory_dir)
+    shutil.copytree(memory_snapshot, memory_dir)
+    
+    with mock.patch.multiple(Config, CASSETTE_MODE=mode, CASSETTE_PATH=path, CASSETTE_LATENCY_SCALE=latency_scale,
+                             MEMORY_DIR=memory_dir), \
+         mock.patch.object(api_client, '_provider_clients', {}), \
+         mock.patch.object(rate_limiter, '_limiters', {}), \
+         mock.patch.object(token_budget, '_usage_log', None), \
+         mock.patch.object(session_cassette, '_cassette', None), \
+         contextlib.redirect_stdout(io.StringIO()):
+        try:
+            yield session_cassette
+        finally:
+            shutil.rmtree(memory_dir, ignore_errors=True)
+
+
+def _record_mock_session(workflow_module, path, memory_snapshot):
+    """Record an auto-approved workflow run against the mock provider."""
+    with _fresh_session('record', path, memory_snapshot) as session_cassette:
+        approve = session_cassette.interactive(lambda *args: 1, 'choice')
+        with mock.patch.object(workflow_module, 'get_user_choice', approve):
+            workflow_module.AIContentStudioWorkflow().run()
+        return session_cassette.get_cassette().get_stats()
+
+
+def _replay(workflow_module, path, memory_snapshot, latency_scale):
+    """Replay a cassette through the workflow; return wall time and cassette stats."""
+    with _fresh_session('replay', path, memory_snapshot, latency_scale) as session_cassette:
+        start = time.perf_counter()
+        workflow_module.AIContentStudioWorkflow().run()
+        elapsed = time.perf_counter() - start
+        return elapsed, session_cassette.get_cassette().get_stats()
+
+
+def main():
+    """Run the benchmark and print a summary."""
+    cassette = sys.argv[1] if len(sys.argv) > 1 and sys.argv[1] != '-' else None
+    latency_scale = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+    runs = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+    
+    temp_dir = tempfile.mkdtemp()
+    memory_snapshot = os.path.join(temp_dir, 'memory')
+    if cassette and os.path.isdir(Config.MEMORY_DIR):
+        shutil.copytree(Config.MEMORY_DIR, memory_snapshot)
+    else:
+        os.makedirs(memory_snapshot)
+    
+    try:
+        with mock.patch.multiple(
+            Config,
+            AI_PROVIDER='mock',
+            MOCK_LATENCY_SECONDS=0.2,
+            ENABLE_STREAMING_OUTPUT=False,
+            ENABLE_RESPONSE_CACHE=False,
+            OUTPUTS_DIR=os.path.join(temp_dir, 'outputs'),
+            API_CALL_LOG_PATH=os.path.join(temp_dir, 'logs', 'api_calls.jsonl')
+        ):
+            import workflow
+            
+            if cassette is None:
+                cassette = os.path.join(temp_dir, 'session.jsonl.gz')
+                stats = _record_mock_session(workflow, cassette, memory_snapshot)
+                print(f"Recorded mock session: {stats['recorded']} calls, "
+                      f"{stats['recorded_latency']:.2f}s of API time, "
+                      f"{os.path.getsize(cassette) / 1024:.1f} KB cassette")
+            
+            print(f"Workflow replay of {cassette} ({runs} runs, latency x{latency_scale})")
+            
+            timings = []
+            for run in range(1, runs + 1):
+                elapsed, stats = _replay(workflow, cassette, memory_snapshot, latency_scale)
+                timings.append(elapsed)
+                overhead = elapsed - stats['replayed_latency']
+                print(f"  Run {run}: {elapsed:6.2f}s wall  {stats['replayed']} calls replayed, "
+                      f"{stats['replayed_latency']:.2f}s simulated API time (serial sum), "
+                      f"{overhead:+.2f}s vs serial")
+            
+            timings.sort()
+            print(f"  Median wall time: {timings[len(timings) // 2]:.2f}s  (min {timings[0]:.2f}s, max {timings[-1]:.2f}s)")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Benchmark the full workflow end to end against the offline mock provider.
+
+Runs AIContentStudioWorkflow with AI_PROVIDER=mock, approving every draft and
+picking the first variation, so the writer, LLMON and editor stages, the rate
+limiter and the retry code all run without network access or an API key.
+Outputs, memory, cache and call log go to a temporary directory.
+
+Usage:
+    python -m benchmarks.bench_workflow_mock [runs] [latency_seconds] [tokens_per_second] [failure_rate]
+"""
+import io
+import os
+import sys
+import time
+import shutil
+import tempfile
+import contextlib
+from unittest import mock
+from config import Config
+
+
+def _run_once(workflow_module):
+    """Run one auto-approved workflow; return wall time, completion, provider, usage and limiter stats."""
+    import api_client
+    import response_cache
+    import rate_limiter
+    import token_budget
+    
+    # Fresh provider, cache, limiter and usage log per run
+    with mock.patch.object(api_client, '_provider_clients', {}), \
+         mock.patch.object(response_cache, '_shared_cache', None), \
+         mock.patch.object(rate_limiter, '_limiters', {}), \
+         mock.patch.object(token_budget, '_usage_log', None), \
+         mock.patch.object(workflow_module, 'get_user_choice', return_value=1), \
+         mock.patch.object(workflow_module, 'get_user_input', return_value=''), \
+         contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        workflow = workflow_module.AIContentStudioWorkflow()
+        workflow.run()
+        elapsed = time.perf_counter() - start
+        
+        final_path = os.path.join(workflow.session_dir, "FINAL_ARTICLE.md")
+        completed = os.path.exists(final_path)
+        provider = api_client.get_provider_client('mock', None)
+        totals = token_budget.get_usage_log().get_totals()
+        limiter = rate_limiter.get_rate_limiter('mock').get_stats() if Config.ENABLE_RATE_LIMITER else None
+    
+    return elapsed, completed, provider, totals, limiter
+
+
+def main():
+    """Run the benchmark and print a summary."""
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+    tokens_per_second = float(sys.argv[3]) if len(sys.argv) > 3 else 0
+    failure_rate = float(sys.argv[4]) if len(sys.argv) > 4 else 0
+    
+    temp_dir = tempfile.mkdtemp()
+    try:
+        with mock.patch.multiple(
+            Config,
+            AI_PROVIDER='mock',
+            MOCK_LATENCY_SECONDS=latency,
+            MOCK_TOKENS_PER_SECOND=tokens_per_second,
+            MOCK_FAILURE_RATE=failure_rate,
+            API_RETRY_BASE_DELAY=0.05,
+            ENABLE_STREAMING_OUTPUT=False,
+            ENABLE_RESPONSE_CACHE=False,
+            OUTPUTS_DIR=os.path.join(temp_dir, 'outputs'),
+            MEMORY_DIR=os.path.join(temp_dir, 'memory'),
+            RESPONSE_CACHE_DIR=os.path.join(temp_dir, 'cache'),
+            API_CALL_LOG_PATH=os.path.join(temp_dir, 'logs', 'api_calls.jsonl')
+        ):
+            import workflow
+            
+            print(f"Workflow end to end, mock provider ({runs} runs, {latency}s median latency, "
+                  f"{tokens_per_second or 'instant'} tokens/s, {failure_rate:.0%} failures)")
+            
+            timings = []
+            for run in range(1, runs + 1):
+                elapsed, completed, provider, totals, limiter = _run_once(workflow)
+                timings.append(elapsed)
+                
+                status = "completed" if completed else "DID NOT COMPLETE"
+                print(f"  Run {run}: {elapsed:6.2f}s  {status}  "
+                      f"{provider.calls} requests, {provider.failures} injected failures, "
+                      f"{totals['prompt_tokens']:,} prompt / {totals['completion_tokens']:,} completion tokens "
+                      f"({totals['cached_tokens']:,} cached)")
+                if limiter:
+                    print(f"         queueing {limiter['total_queue_delay']:.2f}s vs model {limiter['total_model_latency']:.2f}s, "
+                          f"concurrency limit {limiter['concurrency_limit']:.1f}")
+            
+            timings.sort()
+            print(f"  Median wall time: {timings[len(timings) // 2]:.2f}s  (min {timings[0]:.2f}s, max {timings[-1]:.2f}s)")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,13 +8,15 @@ class Config:
     """Configuration settings for the workflow."""
     
     # API Configuration
-    AI_PROVIDER = os.getenv('AI_PROVIDER', 'openai').lower()  # 'openai' or 'gemini'
+    AI_PROVIDER = os.getenv('AI_PROVIDER', 'openai').lower()  # 'openai', 'gemini', 'auto' (route between them) or 'mock' (offline)
     
     # OpenAI Configuration - Per-Agent Models
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
     OPENAI_WRITER_MODEL = os.getenv('OPENAI_WRITER_MODEL')  # Model for Writer Agent
     OPENAI_LLMON_MODEL = os.getenv('OPENAI_LLMON_MODEL')    # Model for LLMON Agent
     OPENAI_EDITOR_MODEL = os.getenv('OPENAI_EDITOR_MODEL')  # Model for Editor Agent
+    OPENAI_EDITOR_FAST_MODEL = os.getenv('OPENAI_EDITOR_FAST_MODEL')  # Optional small model tried first on editor passes
+    OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL')  # OpenAI-compatible server (e.g. local_openai_server.py); None = api.openai.com
     
     # Gemini Configuration (fallback)
     GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
@@ -25,6 +27,7 @@ class Config:
     RULES_DIR = 'rules'
     OUTPUTS_DIR = 'outputs'
     MEMORY_DIR = 'memory'
+    RESPONSE_CACHE_DIR = 'cache'
     
     # Content Mode Selection
     CONTENT_MODE = os.getenv('CONTENT_MODE', 'article')  # 'article' or 'tool_review'
@@ -34,6 +37,9 @@ class Config:
     TOOL_REVIEW_MAX_QUOTES = 10
     TOOL_REVIEW_TARGET_WORDS = (900, 1400)  # soft range
     
+    # Article Settings
+    ARTICLE_TARGET_WORDS = (800, 2000)  # soft range; a "N-M words" target in the brief wins
+    
     # Agent Settings
     WRITER_TEMPERATURE = 0.7
     LLMON_TEMPERATURE = 0.8  # Higher for more variation
@@ -61,11 +67,145 @@ class Config:
     # Priority 6: Multi-Pass Editor
     ENABLE_MULTIPASS_EDITING = True
     
+    # Performance: Editor model cascade (small model first, escalate to OPENAI_EDITOR_MODEL when local checks fail)
+    ENABLE_EDITOR_CASCADE = os.getenv('ENABLE_EDITOR_CASCADE', 'true').lower() == 'true'
+    EDITOR_PASS_MODELS = dict(  # Per-pass first-choice model, e.g. "grammar=gpt-5-nano,flow=gpt-5-mini"
+        item.split('=', 1) for item in os.getenv('EDITOR_PASS_MODELS', '').replace(' ', '').split(',') if '=' in item
+    )
+    EDITOR_CASCADE_MAX_QUALITY_DROP = 3.0  # Overall quality points a cheap pass may lose before escalating
+    EDITOR_CASCADE_MIN_LENGTH_RATIO = 0.8  # Escalate if a cheap pass returns less than this share of the words
+    
+    # Performance: One request for all LLMON variations instead of one per variation
+    LLMON_BATCH_MODE = os.getenv('LLMON_BATCH_MODE', 'off').lower()  # 'off', 'auto', 'n' (provider sampling) or 'delimited' (one multi-output prompt)
+    LLMON_BATCH_MIN_LENGTH_RATIO = 0.5  # Batched variations shorter than this share of the article are regenerated alone
+    
+    # Performance: Response Cache (opt-in per call site)
+    ENABLE_RESPONSE_CACHE = os.getenv('ENABLE_RESPONSE_CACHE', 'true').lower() == 'true'
+    RESPONSE_CACHE_MAX_MB = 200
+    ENABLE_REQUEST_COALESCING = True  # Identical concurrent use_cache calls share one upstream request
+    
+    # Performance: Stream writer and editor output to the terminal as it is generated
+    ENABLE_STREAMING_OUTPUT = os.getenv('ENABLE_STREAMING_OUTPUT', 'true').lower() == 'true'
+    
+    # Performance: Shared HTTP connection pool (one per provider and API key)
+    HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '20'))
+    HTTP_KEEPALIVE_SECONDS = 120
+    ENABLE_CONNECTION_PREWARM = True  # Warm the pool while the user reads a draft
+    API_TIMEOUT = float(os.getenv('API_TIMEOUT', '600'))  # Seconds per HTTP request (OpenAI-compatible servers)
+    
+    # Performance: Show LLMON variations as each one finishes (early pick cancels the rest)
+    ENABLE_VARIATION_STREAMING = os.getenv('ENABLE_VARIATION_STREAMING', 'true').lower() == 'true'
+    
+    # Performance: Over-generate LLMON variations in one burst and keep the most diverse
+    LLMON_OVERGENERATE_COUNT = min(int(os.getenv('LLMON_OVERGENERATE_COUNT', '0')), 8)  # candidates; off unless > LLMON_VERSIONS_COUNT; at most 8 (one per distinct emphasis)
+    LLMON_DIVERSITY_QUALITY_WEIGHT = 0.0  # 0-1: weight of the quality score when picking the subset
+    
+    # Performance: MinHash/LSH near-duplicate index (large variation pools, article history)
+    NEAR_DUPLICATE_NUM_PERM = 128  # signature length
+    NEAR_DUPLICATE_BANDS = 32  # must divide NEAR_DUPLICATE_NUM_PERM; more bands = lower candidate threshold
+    NEAR_DUPLICATE_SHINGLE_SIZE = 3  # words per shingle
+    NEAR_DUPLICATE_THRESHOLD = 0.5  # estimated Jaccard similarity of shingle sets
+    
+    # Performance: Cross-session originality index over outputs/ (memory-mapped, updated incrementally)
+    ENABLE_ORIGINALITY_CHECK = os.getenv('ENABLE_ORIGINALITY_CHECK', 'true').lower() == 'true'
+    ORIGINALITY_INDEX_DIR = os.getenv('ORIGINALITY_INDEX_DIR')  # None = <OUTPUTS_DIR>/.originality_index
+    ORIGINALITY_MERGE_THRESHOLD = 500  # new articles kept in the small pending file before a merge
+    ORIGINALITY_WARN_SCORE = 50  # warn when a draft or variation scores below this (0-100)
+    
+    # Performance: Concurrent Gemini variations (safety blocks are retried per variation)
+    GEMINI_MAX_PARALLEL_VARIATIONS = int(os.getenv('GEMINI_MAX_PARALLEL_VARIATIONS', '2'))
+    LLMON_SAFETY_RETRIES = 2  # rephrased retries of a variation blocked by safety filters
+    
+    # Performance: Shared LLM scheduler (one worker pool, global in-flight cap, priority classes)
+    ENABLE_LLM_SCHEDULER = True
+    SCHEDULER_MAX_IN_FLIGHT = int(os.getenv('SCHEDULER_MAX_IN_FLIGHT', '16'))  # across all agents, stages and sessions
+    SCHEDULER_INTERACTIVE_RESERVE = 2  # slots kept for interactive calls (revisions, outlines)
+    SCHEDULER_MAX_WORKERS = 16  # shared threads for agent-level fan-out
+    
+    # Performance: Adaptive rate limiting (RPM/TPM budgets + AIMD concurrency per provider)
+    ENABLE_RATE_LIMITER = os.getenv('ENABLE_RATE_LIMITER', 'true').lower() == 'true'
+    RATE_LIMITS = {
+        'openai': {
+            'rpm': int(os.getenv('OPENAI_RPM', '500')),
+            'tpm': int(os.getenv('OPENAI_TPM', '200000'))
+        },
+        'gemini': {
+            'rpm': int(os.getenv('GEMINI_RPM', '10')),  # Free tier
+            'tpm': int(os.getenv('GEMINI_TPM', '250000'))
+        },
+        'mock': {
+            'rpm': int(os.getenv('MOCK_RPM', '10000')),
+            'tpm': int(os.getenv('MOCK_TPM', '10000000'))
+        }
+    }
+    RATE_LIMIT_INITIAL_CONCURRENCY = 4
+    RATE_LIMIT_MAX_CONCURRENCY = 16
+    
+    # Performance: Retries with full-jitter exponential backoff, hedged requests
+    API_MAX_RETRIES = int(os.getenv('API_MAX_RETRIES', '3'))
+    API_RETRY_BASE_DELAY = 1.0   # Seconds; the backoff ceiling doubles per attempt
+    API_RETRY_MAX_DELAY = 30.0
+    API_CALL_DEADLINE = 600      # Seconds per call, retries included
+    ENABLE_HEDGED_REQUESTS = os.getenv('ENABLE_HEDGED_REQUESTS', 'false').lower() == 'true'  # Opt-in: editor passes duplicate requests slower than p95 (up to 2x billed calls)
+    HEDGE_LATENCY_PERCENTILE = 95
+    HEDGE_MIN_SAMPLES = 5        # Recent requests needed before hedging kicks in
+    
+    # Performance: Per-task output token budgets and per-call usage log
+    MIN_OUTPUT_TOKENS = 1024
+    OUTLINE_OUTPUT_TOKENS = 3000
+    REASONING_TOKEN_RESERVE = 8192  # Extra budget for models with hidden reasoning (gpt-5, o-series)
+    ENABLE_API_CALL_LOG = True
+    API_CALL_LOG_PATH = os.path.join('logs', 'api_calls.jsonl')
+    
+    # Performance: Offline mock provider (AI_PROVIDER=mock) for tests, benchmarks and load tests
+    MOCK_MODEL_NAME = 'mock-writer-1'
+    MOCK_SEED = int(os.getenv('MOCK_SEED', '0'))  # Seeds latency and failure sampling
+    MOCK_LATENCY_DISTRIBUTION = os.getenv('MOCK_LATENCY_DISTRIBUTION', 'lognormal')  # 'fixed', 'uniform' or 'lognormal'
+    MOCK_LATENCY_SECONDS = float(os.getenv('MOCK_LATENCY_SECONDS', '0.5'))  # Median time to first token
+    MOCK_LATENCY_SPREAD = float(os.getenv('MOCK_LATENCY_SPREAD', '0.5'))  # uniform: +/- fraction, lognormal: sigma
+    MOCK_TOKENS_PER_SECOND = float(os.getenv('MOCK_TOKENS_PER_SECOND', '0'))  # Output rate; 0 = instant
+    MOCK_FAILURE_RATE = float(os.getenv('MOCK_FAILURE_RATE', '0'))  # Fraction of requests that fail
+    MOCK_FAILURE_STATUS = int(os.getenv('MOCK_FAILURE_STATUS', '503'))  # 429 to exercise throttling
+    MOCK_OUTPUT_WORDS = 1200
+    
+    # Performance: Session cassettes (record real sessions, replay them as perf regression tests)
+    CASSETTE_MODE = os.getenv('CASSETTE_MODE', 'off').lower()  # 'off', 'record' or 'replay'
+    CASSETTE_PATH = os.getenv('CASSETTE_PATH', os.path.join('cassettes', 'session.jsonl.gz'))
+    CASSETTE_LATENCY_SCALE = float(os.getenv('CASSETTE_LATENCY_SCALE', '1.0'))  # 0 = replay instantly
+    
+    # Performance: Multi-provider routing (AI_PROVIDER=auto) with latency-aware failover
+    ROUTER_PROVIDERS = [p.strip() for p in os.getenv('ROUTER_PROVIDERS', 'openai,gemini').lower().split(',') if p.strip()]  # preference order
+    ROUTER_LATENCY_ALPHA = 0.3  # EWMA weight of the newest latency/error sample
+    ROUTER_ERROR_PENALTY = 4.0  # score = latency * (1 + penalty * error rate)
+    ROUTER_EXPLORE_RATE = 0.05  # share of calls sent to a slower provider to keep its stats fresh
+    ROUTER_FAILURE_THRESHOLD = 3  # consecutive failures that open a provider's circuit
+    ROUTER_ERROR_RATE_THRESHOLD = 0.5
+    ROUTER_MIN_CALLS = 5  # calls before the error rate can open a circuit
+    ROUTER_COOLDOWN_SECONDS = 30  # open circuit waits this long before a half-open trial call
+    ROUTING_LOG_PATH = os.path.join('logs', 'routing.jsonl')  # written when ENABLE_API_CALL_LOG is on
+    
+    @classmethod
+    def routable_providers(cls):
+        """Providers from ROUTER_PROVIDERS that are fully configured, in preference order."""
+        usable = []
+        for provider in cls.ROUTER_PROVIDERS:
+            if provider == 'openai':
+                has_models = cls.OPENAI_WRITER_MODEL and cls.OPENAI_LLMON_MODEL and cls.OPENAI_EDITOR_MODEL
+                if (cls.OPENAI_API_KEY or cls.OPENAI_BASE_URL) and has_models:
+                    usable.append(provider)
+            elif provider == 'gemini':
+                if cls.GEMINI_API_KEY:
+                    usable.append(provider)
+            elif provider == 'mock':
+                usable.append(provider)
+        return usable
+    
     @classmethod
     def validate(cls):
         """Validate required configuration."""
         if cls.AI_PROVIDER == 'openai':
-            if not cls.OPENAI_API_KEY:
+            # Self-hosted OpenAI-compatible servers usually accept any key
+            if not cls.OPENAI_API_KEY and not cls.OPENAI_BASE_URL:
                 raise ValueError(
                     "OPENAI_API_KEY not found. Please add your OpenAI API key to .env file.\n"
                     "Example: OPENAI_API_KEY=sk-proj-..."
@@ -94,9 +234,16 @@ class Config:
                     "GEMINI_API_KEY not found. Please add your Gemini API key to .env file.\n"
                     "Get a free key from https://makersuite.google.com/app/apikey"
                 )
-        else:
+        elif cls.AI_PROVIDER == 'auto':
+            if not cls.routable_providers():
+                raise ValueError(
+                    f"AI_PROVIDER=auto but none of ROUTER_PROVIDERS ({', '.join(cls.ROUTER_PROVIDERS)}) "
+                    "is configured. Add OPENAI_API_KEY plus the three OPENAI_*_MODEL settings "
+                    "and/or GEMINI_API_KEY to your .env file."
+                )
+        elif cls.AI_PROVIDER != 'mock':
             raise ValueError(
-                f"Invalid AI_PROVIDER: {cls.AI_PROVIDER}. Must be 'openai' or 'gemini'"
+                f"Invalid AI_PROVIDER: {cls.AI_PROVIDER}. Must be 'openai', 'gemini', 'auto' or 'mock'"
             )
         return True
 
@@ -0,0 +1,251 @@
+"""LLM Scheduler - One shared worker pool and a global, priority-aware cap on in-flight LLM calls.
+
+Every provider request, from every agent, stage and concurrent session,
+takes a slot here before it reaches the rate limiter. Waiting calls are
+admitted strictly by priority class, and the last few slots are kept for
+interactive calls. A user waiting on a revision therefore never queues behind
+a batch of background variations. Agent-level fan-out (for example one
+thread per LLMON variation) runs on a single long-lived thread pool instead
+of a ThreadPoolExecutor per call.
+"""
+import time
+import heapq
+import asyncio
+import itertools
+import threading
+import contextlib
+import contextvars
+import concurrent.futures
+
+# Priority classes (lower runs first)
+INTERACTIVE = 0  # The user is waiting on this one result (revisions, outlines)
+STANDARD = 1     # Normal workflow stages
+BACKGROUND = 2   # Unattended batch work (async_pipeline.run_many)
+
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', STANDARD: 'standard', BACKGROUND: 'background'}
+
+# Default class per generate_content task; anything else is STANDARD
+TASK_PRIORITIES = {
+    'revision': INTERACTIVE,
+    'outline': INTERACTIVE
+}
+
+# Priority set by the caller (see priority_scope); overrides the task default
+current_priority = contextvars.ContextVar('llm_priority', default=None)
+
+
+@contextlib.contextmanager
+def priority_scope(priority):
+    """
+    Run a block with every LLM call inside it at the given priority.
+    
+    Args:
+        priority: INTERACTIVE, STANDARD or BACKGROUND (None leaves the current priority)
+    """
+    if priority is None:
+        yield
+        return
+    
+    token = current_priority.set(priority)
+    try:
+        yield
+    finally:
+        current_priority.reset(token)
+
+
+def priority_for(task=None):
+    """Priority of a call: the caller's priority_scope, else the task's default class."""
+    priority = current_priority.get()
+    if priority is not None:
+        return priority
+    return TASK_PRIORITIES.get(task, STANDARD)
+
+
+class LLMScheduler:
+    """
+    Global in-flight limit with priority admission, plus a shared worker pool.
+    
+    slot() must be used on the shared API event loop; submit() and map()
+    may be called from any thread.
+    """
+    
+    def __init__(self, max_in_flight=16, interactive_reserve=2, max_workers=16):
+        """
+        Initialize scheduler.
+        
+        Args:
+            max_in_flight: Most LLM calls in flight at once, across all clients
+            interactive_reserve: Slots only INTERACTIVE calls may take
+            max_workers: Threads in the shared worker pool
+        """
+        self.max_in_flight = max(1, max_in_flight)
+        self.interactive_reserve = max(0, min(interactive_reserve, self.max_in_flight - 1))
+        self.max_workers = max_workers
+        
+        self.in_flight = 0
+        self._waiters = []  # heap of (priority, sequence, future)
+        self._sequence = itertools.count()
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        
+        # Counters exposed through get_stats()
+        self.admitted = {name: 0 for name in PRIORITY_NAMES.values()}
+        self.queued = {name: 0 for name in PRIORITY_NAMES.values()}
+        self.queue_delay = {name: 0.0 for name in PRIORITY_NAMES.values()}
+        self.peak_in_flight = 0
+    
+    def _capacity(self, priority):
+        """Slots a call of this priority may fill."""
+        if priority <= INTERACTIVE:
+            return self.max_in_flight
+        return self.max_in_flight - self.interactive_reserve
+    
+    @contextlib.asynccontextmanager
+    async def slot(self, priority=STANDARD):
+        """
+        Hold one global in-flight slot for the duration of a provider request.
+        
+        Args:
+            priority: Priority class of the call
+        """
+        await self._acquire(priority)
+        try:
+            yield
+        finally:
+            self._release()
+    
+    async def _acquire(self, priority):
+        """Wait until the call is admitted; higher priorities go first, FIFO within a class."""
+        name = PRIORITY_NAMES.get(priority, 'standard')
+        waiting_ahead = any(not future.done() and queued <= priority for queued, _, future in self._waiters)
+        if not waiting_ahead and self.in_flight < self._capacity(priority):
+            self._admit(name)
+            return
+        
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        self.queued[name] += 1
+        start = time.monotonic()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Admitted just as the caller was cancelled: hand the slot on
+                self._release()
+            else:
+                future.cancel()
+            raise
+        self.queue_delay[name] += time.monotonic() - start
+        self.admitted[name] += 1
+    
+    def _admit(self, name):
+        """Count an immediately admitted call."""
+        self.in_flight += 1
+        self.admitted[name] += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+    
+    def _release(self):
+        """Free a slot and admit waiters in priority order."""
+        self.in_flight -= 1
+        while self._waiters:
+            priority, _, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            if self.in_flight >= self._capacity(priority):
+                break  # Lower classes have no more room than the head of the queue
+            heapq.heappop(self._waiters)
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            future.set_result(None)
+    
+    def submit(self, fn, *args, priority=None, **kwargs):
+        """
+        Run a blocking function on the shared worker pool.
+        
+        LLM calls made by fn run at `priority` (default: the caller's current priority).
+        
+        Returns:
+            concurrent.futures.Future with fn's result
+        """
+        if priority is None:
+            priority = current_priority.get()
+        return self._get_executor().submit(_run_at_priority, priority, fn, args, kwargs)
+    
+    def map(self, fn, argument_lists, priority=None, max_parallel=None):
+        """
+        Run fn once per argument list on the shared worker pool.
+        
+        Args:
+            fn: Blocking function
+            argument_lists: Iterable of argument tuples
+            priority: Priority for LLM calls made by fn
+            max_parallel: Most calls of this map running at once (None = no extra limit)
+        
+        Returns:
+            Results in input order; the first exception is raised after all calls finish
+        """
+        futures = []
+        running = set()
+        for args in argument_lists:
+            if max_parallel and len(running) >= max_parallel:
+                _, running = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+            future = self.submit(fn, *args, priority=priority)
+            futures.append(future)
+            running.add(future)
+        
+        concurrent.futures.wait(futures)
+        return [future.result() for future in futures]
+    
+    def _get_executor(self):
+        """Create the shared worker pool on first use."""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix='llm-worker'
+                )
+            return self._executor
+    
+    def get_stats(self):
+        """
+        Get scheduler counters.
+        
+        Returns:
+            Dictionary with in-flight counts, limits and per-class admitted,
+            queued and queue delay totals
+        """
+        return {
+            'max_in_flight': self.max_in_flight,
+            'interactive_reserve': self.interactive_reserve,
+            'in_flight': self.in_flight,
+            'peak_in_flight': self.peak_in_flight,
+            'waiting': sum(1 for _, _, future in self._waiters if not future.done()),
+            'admitted': dict(self.admitted),
+            'queued': dict(self.queued),
+            'queue_delay': {name: round(delay, 3) for name, delay in self.queue_delay.items()}
+        }
+
+
+def _run_at_priority(priority, fn, args, kwargs):
+    """Worker-thread entry point: call fn inside priority_scope(priority)."""
+    with priority_scope(priority):
+        return fn(*args, **kwargs)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Get the process-wide scheduler, configured from Config."""
+    from config import Config
+    global _scheduler
+    
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LLMScheduler(
+                max_in_flight=Config.SCHEDULER_MAX_IN_FLIGHT,
+                interactive_reserve=Config.SCHEDULER_INTERACTIVE_RESERVE,
+                max_workers=Config.SCHEDULER_MAX_WORKERS
+            )
+        return _scheduler
@@ -0,0 +1,306 @@
+"""Local OpenAI-compatible stand-in server for load tests and HTTP benchmarks.
+
+Serves /v1/chat/completions (JSON and server-sent event streaming) and
+/v1/models over plain HTTP/1.1 with keep-alive, answering with the same
+deterministic text, latency and failure settings as AI_PROVIDER=mock.
+It can also return 429s, either at random or beyond a requests-per-minute
+budget, so the rate limiter and retry code see realistic throttling.
+
+Point the workflow at it with:
+    OPENAI_BASE_URL=http://127.0.0.1:8000/v1 python main.py
+
+Usage:
+    python local_openai_server.py [--port 8000] [--latency 0.5] [--tokens-per-second 0]
+                                  [--throttle-rate 0.0] [--rpm 0]
+"""
+import re
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from config import Config
+from mock_provider import MockProvider
+from rate_limiter import TokenBucket
+from token_budget import MAX_OUTPUT_TOKENS, estimate_tokens
+
+
+class LocalOpenAIServer(ThreadingHTTPServer):
+    """Threaded HTTP server holding the mock generator, throttling and counters."""
+    
+    daemon_threads = True
+    
+    def __init__(self, address, throttle_rate=0.0, requests_per_minute=0, retry_after=1):
+        """
+        Initialize server.
+        
+        Args:
+            address: (host, port) to bind; port 0 picks a free port
+            throttle_rate: Fraction of requests answered with 429
+            requests_per_minute: Budget beyond which requests get 429 (0 = unlimited)
+            retry_after: Retry-After seconds sent with 429s
+        """
+        super().__init__(address, ChatCompletionsHandler)
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.bucket = TokenBucket(requests_per_minute, burst_seconds=1) if requests_per_minute else None
+        self.provider = MockProvider()
+        self._rng = random.Random(Config.MOCK_SEED)
+        self._lock = threading.Lock()
+        self.stats = {'connections': 0, 'requests': 0, 'completions': 0, 'streams': 0, 'throttled': 0, 'failed': 0}
+    
+    @property
+    def base_url(self):
+        """OpenAI base URL clients should use."""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+    
+    def count(self, field):
+        """Increment a counter."""
+        with self._lock:
+            self.stats[field] += 1
+    
+    def get_stats(self):
+        """
+        Get request counters.
+        
+        Returns:
+            Dictionary with connections accepted, requests, completions,
+            streams, throttled and failed counts
+        """
+        with self._lock:
+            return dict(self.stats)
+    
+    def admit(self):
+        """
+        Decide whether to serve a completion request.
+        
+        Returns:
+            None to serve it, or the HTTP status code to fail it with
+        """
+        with self._lock:
+            if self.bucket:
+                if self.bucket.wait_time(1) > 0:
+                    return 429
+                self.bucket.consume(1)
+            if self.throttle_rate and self._rng.random() < self.throttle_rate:
+                return 429
+            if Config.MOCK_FAILURE_RATE and self._rng.random() < Config.MOCK_FAILURE_RATE:
+                return Config.MOCK_FAILURE_STATUS
+        return None
+    
+    def complete(self, prompt, temperature, max_tokens, n=1):
+        """Sample latency and build n mock completions (thread-safe)."""
+        with self._lock:
+            latency = self.provider.sample_latency()
+            results = [self.provider.complete(prompt, temperature, max_tokens, sample) for sample in range(n)]
+        return latency, results
+    
+    def process_request(self, request, client_address):
+        """Count accepted TCP connections (one per pooled client connection)."""
+        self.count('connections')
+        super().process_request(request, client_address)
+
+
+class ChatCompletionsHandler(BaseHTTPRequestHandler):
+    """Handles the subset of the OpenAI REST API used by AsyncAPIClient."""
+    
+    protocol_version = 'HTTP/1.1'  # keep-alive, so client connection pools are exercised
+    disable_nagle_algorithm = True  # Flush each streamed event immediately
+    
+    def log_message(self, format, *args):
+        """Stay quiet; benchmarks read get_stats() instead."""
+    
+    def do_GET(self):
+        """List models (used for connection prewarming)."""
+        self.server.count('requests')
+        if self.path.rstrip('/') != '/v1/models':
+            self._send_error(404, f"Unknown path {self.path}", 'not_found')
+            return
+        
+        self._send_json(200, {
+            'object': 'list',
+            'data': [{'id': Config.MOCK_MODEL_NAME, 'object': 'model', 'created': 0, 'owned_by': 'local'}]
+        })
+    
+    def do_POST(self):
+        """Create a chat completion, streamed or not."""
+        self.server.count('requests')
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if self.path.rstrip('/') != '/v1/chat/completions':
+            self._send_error(404, f"Unknown path {self.path}", 'not_found')
+            return
+        
+        try:
+            request = json.loads(body or b'{}')
+            prompt = next(m['content'] for m in reversed(request['messages']) if m['role'] == 'user')
+        except (ValueError, KeyError, StopIteration, TypeError):
+            self._send_error(400, "Request needs a JSON body with a user message", 'invalid_request_error')
+            return
+        
+        status = self.server.admit()
+        if status == 429:
+            self.server.count('throttled')
+            self._send_error(429, "Rate limit reached (local stand-in)", 'rate_limit_exceeded',
+                             {'Retry-After': str(self.server.retry_after)})
+            return
+        if status:
+            self.server.count('failed')
+            self._send_error(status, "Injected failure (local stand-in)", 'server_error')
+            return
+        
+        max_tokens = request.get('max_completion_tokens') or request.get('max_tokens') or MAX_OUTPUT_TOKENS
+        n = int(request.get('n') or 1)
+        latency, results = self.server.complete(prompt, request.get('temperature', 1.0), max_tokens, n)
+        time.sleep(latency)
+        
+        model = request.get('model') or Config.MOCK_MODEL_NAME
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        text, usage = results[0]
+        
+        if request.get('stream'):
+            self.server.count('streams')
+            include_usage = (request.get('stream_options') or {}).get('include_usage', False)
+            finish_reason = 'length' if usage['truncated'] else 'stop'
+            self._stream(completion_id, model, text, usage, finish_reason, include_usage)
+        else:
+            self.server.count('completions')
+            # Choices decode in parallel; the prompt is billed once
+            time.sleep(max(_seconds_for(counts['completion_tokens']) for _, counts in results))
+            usage = dict(usage, completion_tokens=sum(counts['completion_tokens'] for _, counts in results))
+            self._send_json(200, {
+                'id': completion_id,
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': model,
+                'choices': [{
+                    'index': index,
+                    'message': {'role': 'assistant', 'content': choice_text},
+                    'finish_reason': 'length' if counts['truncated'] else 'stop'
+                } for index, (choice_text, counts) in enumerate(results)],
+                'usage': _usage_payload(usage)
+            })
+    
+    def _stream(self, completion_id, model, text, usage, finish_reason, include_usage):
+        """Send the completion as server-sent events over chunked transfer encoding."""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        
+        def chunk(choices, **extra):
+            return {
+                'id': completion_id,
+                'object': 'chat.completion.chunk',
+                'created': int(time.time()),
+                'model': model,
+                'choices': choices,
+                **extra
+            }
+        
+        self._send_event(chunk([{'index': 0, 'delta': {'role': 'assistant', 'content': ''}, 'finish_reason': None}]))
+        for piece in re.findall(r"\S+\s*", text):
+            time.sleep(_seconds_for(estimate_tokens(piece)))
+            self._send_event(chunk([{'index': 0, 'delta': {'content': piece}, 'finish_reason': None}]))
+        self._send_event(chunk([{'index': 0, 'delta': {}, 'finish_reason': finish_reason}]))
+        if include_usage:
+            self._send_event(chunk([], usage=_usage_payload(usage)))
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+    
+    def _send_event(self, payload):
+        """Write one server-sent event."""
+        self._write_chunk(f"data: {json.dumps(payload)}\n\n".encode('utf-8'))
+    
+    def _write_chunk(self, data):
+        """Write one HTTP/1.1 chunk (an empty chunk ends the body)."""
+        self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+    
+    def _send_json(self, status, payload, headers=None):
+        """Send a JSON response with a Content-Length so the connection stays open."""
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def _send_error(self, status, message, error_type, headers=None):
+        """Send an error in the OpenAI error format."""
+        self._send_json(status, {'error': {'message': message, 'type': error_type, 'code': error_type}}, headers)
+
+
+def _seconds_for(tokens):
+    """Time to emit a number of tokens at Config.MOCK_TOKENS_PER_SECOND (0 = instant)."""
+    return tokens / Config.MOCK_TOKENS_PER_SECOND if Config.MOCK_TOKENS_PER_SECOND > 0 else 0
+
+
+def _usage_payload(usage):
+    """Convert mock usage counts to the OpenAI usage object."""
+    return {
+        'prompt_tokens': usage['prompt_tokens'],
+        'completion_tokens': usage['completion_tokens'],
+        'total_tokens': usage['prompt_tokens'] + usage['completion_tokens'],
+        'prompt_tokens_details': {'cached_tokens': usage['cached_tokens']},
+        'completion_tokens_details': {'reasoning_tokens': usage['reasoning_tokens']}
+    }
+
+
+def start_server(host='127.0.0.1', port=0, **options):
+    """
+    Start the stand-in server on a daemon thread.
+    
+    Args:
+        host: Interface to bind
+        port: Port to bind (0 picks a free port)
+        **options: LocalOpenAIServer options (throttle_rate, requests_per_minute, retry_after)
+    
+    Returns:
+        Running LocalOpenAIServer; call shutdown() and server_close() when done
+    """
+    server = LocalOpenAIServer((host, port), **options)
+    thread = threading.Thread(target=server.serve_forever, name="local-openai-server", daemon=True)
+    thread.start()
+    return server
+
+
+def main():
+    """Run the stand-in server until interrupted."""
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stand-in server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=Config.MOCK_LATENCY_SECONDS,
+                        help="Median time to first token in seconds")
+    parser.add_argument('--tokens-per-second', type=float, default=Config.MOCK_TOKENS_PER_SECOND,
+                        help="Output rate (0 = instant)")
+    parser.add_argument('--throttle-rate', type=float, default=0.0,
+                        help="Fraction of requests answered with 429")
+    parser.add_argument('--rpm', type=int, default=0,
+                        help="Requests per minute before answering 429 (0 = unlimited)")
+    args = parser.parse_args()
+    
+    Config.MOCK_LATENCY_SECONDS = args.latency
+    Config.MOCK_TOKENS_PER_SECOND = args.tokens_per_second
+    
+    server = LocalOpenAIServer((args.host, args.port), throttle_rate=args.throttle_rate, requests_per_minute=args.rpm)
+    print(f"Local OpenAI stand-in listening on {server.base_url}")
+    print(f"  Set OPENAI_BASE_URL={server.base_url} (any OPENAI_API_KEY works)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"\nServed: {server.get_stats()}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -19,8 +19,11 @@ def main():
         print(f"{Fore.CYAN}  Writer Agent:  {Config.OPENAI_WRITER_MODEL}{Style.RESET_ALL}")
         print(f"{Fore.CYAN}  LLMON Agent:   {Config.OPENAI_LLMON_MODEL}{Style.RESET_ALL}")
         print(f"{Fore.CYAN}  Editor Agent:  {Config.OPENAI_EDITOR_MODEL}{Style.RESET_ALL}")
+    elif Config.AI_PROVIDER == 'auto':
+        providers = ', '.join(Config.routable_providers()) or 'none configured'
+        print(f"{Fore.CYAN}AI Provider: AUTO (routing across {providers}){Style.RESET_ALL}")
     else:
-        model_display = Config.MODEL_NAME
+        model_display = Config.MOCK_MODEL_NAME if Config.AI_PROVIDER == 'mock' else Config.MODEL_NAME
         print(f"{Fore.CYAN}AI Provider: {provider_display} ({model_display}){Style.RESET_ALL}")
     print()
     
@@ -0,0 +1,247 @@
+"""Mock Provider - Offline, deterministic stand-in for a real AI provider.
+
+Selected with AI_PROVIDER=mock. Output text is derived from the prompt (same
+prompt and temperature, same text), while latency, token rate and injected
+failures follow the MOCK_* settings in Config. This lets the whole workflow,
+the rate limiter and the retry/hedging code run without an API key.
+"""
+import re
+import math
+import random
+import asyncio
+import hashlib
+from config import Config
+from token_budget import TOKENS_PER_WORD, estimate_tokens
+
+# Providers only cache prompt prefixes in fixed-size blocks above a minimum length
+PROMPT_CACHE_BLOCK_CHARS = 512
+PROMPT_CACHE_MIN_TOKENS = 1024
+
+WORD_PATTERN = re.compile(r"\b[A-Za-z][a-z]{3,}\b")
+URL_PATTERN = re.compile(r"https?://[^\s)\]>\"']+")
+
+# Marker lines ("=== VARIATION 2 ===") that ask for several outputs in one response
+MULTI_OUTPUT_MARKER = re.compile(r"^=== [A-Z]+ \d+ ===$", re.MULTILINE)
+
+FALLBACK_VOCABULARY = (
+    'content', 'workflow', 'readers', 'practical', 'strategy', 'example',
+    'results', 'teams', 'process', 'quality', 'insight', 'approach'
+)
+
+SENTENCE_OPENERS = (
+    'In practice,', 'For most teams,', 'As a result,', 'In short,',
+    'More importantly,', 'By comparison,', 'Over time,', 'Put simply,'
+)
+
+
+class MockProviderError(Exception):
+    """Injected provider failure carrying an HTTP status code."""
+    
+    def __init__(self, status_code):
+        super().__init__(f"Mock provider failure (HTTP {status_code})")
+        self.status_code = status_code
+
+
+class MockProvider:
+    """Generates deterministic markdown with simulated latency and failures."""
+    
+    def __init__(self, seed=None):
+        """
+        Initialize mock provider.
+        
+        Args:
+            seed: Seed for latency and failure sampling (defaults to Config.MOCK_SEED)
+        """
+        self._rng = random.Random(Config.MOCK_SEED if seed is None else seed)
+        self._seen_prefixes = set()
+        self.calls = 0
+        self.failures = 0
+    
+    def sample_latency(self):
+        """
+        Sample time to first token from the configured distribution.
+        
+        Returns:
+            Seconds to wait before the first output token
+        """
+        median = Config.MOCK_LATENCY_SECONDS
+        spread = Config.MOCK_LATENCY_SPREAD
+        distribution = Config.MOCK_LATENCY_DISTRIBUTION
+        
+        if median <= 0:
+            return 0.0
+        if distribution == 'uniform':
+            return max(0.0, self._rng.uniform(median * (1 - spread), median * (1 + spread)))
+        if distribution == 'lognormal':
+            return self._rng.lognormvariate(math.log(median), spread)
+        return median
+    
+    def complete(self, prompt, temperature, max_tokens, sample=0):
+        """
+        Build the response text and usage for a prompt without waiting.
+        
+        A prompt that asks for several outputs, each starting with a marker
+        line such as "=== VARIATION 2 ===", gets one article per marker.
+        
+        Args:
+            prompt: Full prompt text
+            temperature: Sampling temperature (part of the output seed)
+            max_tokens: Output token budget
+            sample: Index of the completion when several are sampled (part of the seed)
+        
+        Returns:
+            Tuple of (text, usage dictionary)
+        """
+        seed_text = f"{sample}\n{prompt}" if sample else prompt
+        markers = list(dict.fromkeys(MULTI_OUTPUT_MARKER.findall(prompt)))
+        if markers:
+            words = []
+            for marker in markers:
+                words += [f"\n\n{marker}\n\n"] + _mock_article_words(f"{marker}\n{seed_text}", temperature)
+        else:
+            words = _mock_article_words(seed_text, temperature)
+        budget_words = int(max_tokens / TOKENS_PER_WORD)
+        truncated = len(words) > budget_words
+        text = _join_words(words[:budget_words])
+        
+        usage = {
+            'prompt_tokens': estimate_tokens(prompt),
+            'cached_tokens': self._cached_prefix_tokens(prompt),
+            'completion_tokens': estimate_tokens(text),
+            'reasoning_tokens': 0,
+            'truncated': truncated
+        }
+        return text, usage
+    
+    async def generate(self, prompt, temperature, max_tokens, usage=None, n=1):
+        """
+        Generate a complete response.
+        
+        Args:
+            prompt: Full prompt text
+            temperature: Sampling temperature
+            max_tokens: Output token budget (per completion)
+            usage: Optional dictionary to fill with token counts
+            n: Number of completions; like OpenAI's `n`, they decode in parallel
+               and the prompt is counted once
+        
+        Returns:
+            Generated text, or a list of n texts when n > 1
+        
+        Raises:
+            MockProviderError: When a failure is injected
+        """
+        await self._start_request()
+        results = [self.complete(prompt, temperature, max_tokens, sample) for sample in range(n)]
+        await asyncio.sleep(max(_generation_seconds(counts['completion_tokens']) for _, counts in results))
+        
+        if usage is not None:
+            usage.update(results[0][1])
+            usage['completion_tokens'] = sum(counts['completion_tokens'] for _, counts in results)
+            usage['truncated'] = any(counts['truncated'] for _, counts in results)
+        if n > 1:
+            return [text for text, _ in results]
+        return results[0][0]
+    
+    async def stream(self, prompt, temperature, max_tokens, usage=None):
+        """
+        Stream a response in word-sized chunks paced by Config.MOCK_TOKENS_PER_SECOND.
+        
+        Args:
+            prompt: Full prompt text
+            temperature: Sampling temperature
+            max_tokens: Output token budget
+            usage: Optional dictionary to fill with token counts
+        
+        Yields:
+            Text chunks
+        """
+        await self._start_request()
+        text, counts = self.complete(prompt, temperature, max_tokens)
+        
+        for chunk in re.findall(r"\S+\s*", text):
+            await asyncio.sleep(_generation_seconds(estimate_tokens(chunk)))
+            yield chunk
+        
+        if usage is not None:
+            usage.update(counts)
+    
+    async def _start_request(self):
+        """Wait out the time to first token, then maybe inject a failure."""
+        self.calls += 1
+        await asyncio.sleep(self.sample_latency())
+        
+        if Config.MOCK_FAILURE_RATE and self._rng.random() < Config.MOCK_FAILURE_RATE:
+            self.failures += 1
+            raise MockProviderError(Config.MOCK_FAILURE_STATUS)
+    
+    def _cached_prefix_tokens(self, prompt):
+        """Simulate provider prompt caching: tokens in the longest previously seen prefix."""
+        digest = hashlib.sha256()
+        cached_chars = 0
+        for end in range(PROMPT_CACHE_BLOCK_CHARS, len(prompt) + 1, PROMPT_CACHE_BLOCK_CHARS):
+            digest.update(prompt[end - PROMPT_CACHE_BLOCK_CHARS:end].encode('utf-8'))
+            prefix = digest.copy().digest()
+            if prefix in self._seen_prefixes:
+                cached_chars = end
+            else:
+                self._seen_prefixes.add(prefix)
+        
+        cached_tokens = estimate_tokens(prompt[:cached_chars])
+        return cached_tokens if cached_tokens >= PROMPT_CACHE_MIN_TOKENS else 0
+
+
+def _generation_seconds(tokens):
+    """Time to emit a number of tokens at Config.MOCK_TOKENS_PER_SECOND (0 = instant)."""
+    if Config.MOCK_TOKENS_PER_SECOND <= 0:
+        return 0
+    return tokens / Config.MOCK_TOKENS_PER_SECOND
+
+
+def _mock_article_words(prompt, temperature):
+    """
+    Build a markdown article as a list of words, seeded by the prompt.
+    
+    Headings and sentences reuse the prompt's own vocabulary, and any URLs in
+    the prompt are cited so citation checks have something to find.
+    """
+    seed = hashlib.sha256(f"{temperature}\n{prompt}".encode('utf-8')).digest()
+    rng = random.Random(seed)
+    
+    vocabulary = list(dict.fromkeys(word.lower() for word in WORD_PATTERN.findall(prompt)))
+    vocabulary = vocabulary or list(FALLBACK_VOCABULARY)
+    urls = list(dict.fromkeys(URL_PATTERN.findall(prompt)))
+    
+    def phrase(count):
+        return [rng.choice(vocabulary) for _ in range(count)]
+    
+    words = ['#'] + [word.capitalize() for word in phrase(rng.randint(3, 6))] + ['\n\n']
+    section = 0
+    while len(words) < Config.MOCK_OUTPUT_WORDS:
+        if len(words) > 40 and rng.random() < 0.2:
+            section += 1
+            words += ['\n\n##'] + [word.capitalize() for word in phrase(rng.randint(2, 5))] + ['\n\n']
+        
+        for _ in range(rng.randint(3, 6)):
+            sentence = phrase(rng.randint(8, 18))
+            if rng.random() < 0.3:
+                sentence = [rng.choice(SENTENCE_OPENERS)] + sentence
+            sentence[0] = sentence[0].capitalize()
+            sentence[-1] += '.'
+            words += sentence
+        
+        if urls and rng.random() < 0.3:
+            url = urls[section % len(urls)]
+            words += ['See', f"[{rng.choice(vocabulary)}]({url})."]
+        words.append('\n\n')
+    
+    if urls and 'source' in prompt.lower():
+        words += ['\n\n##', 'Sources', '\n\n'] + [f"- {url}\n" for url in urls]
+    
+    return words
+
+
+def _join_words(words):
+    """Join generated words, keeping the markdown line breaks tidy."""
+    text = ' '.join(words)
+    return re.sub(r" *\n *", "\n", text).strip()
@@ -0,0 +1,398 @@
+"""Near-Duplicate Index - MinHash signatures with LSH banding for sub-linear lookup.
+
+Each text is reduced to its set of word shingles (runs of shingle_size
+words) and summarized by a MinHash signature: num_perm minimum hash values,
+where the share of equal positions between two signatures estimates the
+Jaccard similarity of their shingle sets. The signature is cut into bands of
+rows; two texts become candidates when any band matches exactly. A lookup
+therefore only scores the few texts sharing a band bucket, not the whole
+corpus. That keeps it fast for large LLMON variation pools and for a
+persistent history of published articles.
+"""
+import os
+import re
+import json
+import zlib
+import numpy as np
+from config import Config
+
+# Permutations are (a * x + b) mod MERSENNE_PRIME; products stay below 2**62
+MERSENNE_PRIME = (1 << 31) - 1
+EMPTY_VALUE = MERSENNE_PRIME  # Signature value of a text with no shingles
+
+WORD_PATTERN = re.compile(r"[a-z0-9']+")
+
+
+def shingles(text, size=3):
+    """
+    Split a text into its set of word shingles.
+    
+    Args:
+        text: Text to shingle
+        size: Words per shingle (texts shorter than this give one shingle)
+    
+    Returns:
+        Set of shingle strings
+    """
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) <= size:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+class MinHasher:
+    """Computes MinHash signatures with a fixed, seeded set of hash permutations."""
+    
+    def __init__(self, num_perm=128, shingle_size=3, seed=1):
+        """
+        Initialize hasher.
+        
+        Args:
+            num_perm: Hash permutations (signature length)
+            shingle_size: Words per shingle
+            seed: Seed for the permutations; signatures only compare under the same seed
+        """
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.seed = seed
+        
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, MERSENNE_PRIME, size=num_perm, dtype=np.int64).astype(np.uint64)
+        self._b = rng.randint(0, MERSENNE_PRIME, size=num_perm, dtype=np.int64).astype(np.uint64)
+    
+    def signature(self, text):
+        """
+        MinHash signature of a text.
+        
+        Args:
+            text: Text to sign
+        
+        Returns:
+            uint32 numpy array of length num_perm
+        """
+        hashed = np.fromiter(
+            (zlib.crc32(shingle.encode('utf-8')) for shingle in shingles(text, self.shingle_size)),
+            dtype=np.uint64
+        )
+        if not len(hashed):
+            return np.full(self.num_perm, EMPTY_VALUE, dtype=np.uint32)
+        
+        hashed %= MERSENNE_PRIME
+        permuted = (np.outer(self._a, hashed) + self._b[:, None]) % MERSENNE_PRIME
+        return permuted.min(axis=1).astype(np.uint32)
+    
+    def signatures(self, texts):
+        """
+        MinHash signatures of several texts.
+        
+        Args:
+            texts: List of texts
+        
+        Returns:
+            uint32 numpy array of shape (len(texts), num_perm)
+        """
+        if not texts:
+            return np.empty((0, self.num_perm), dtype=np.uint32)
+        return np.vstack([self.signature(text) for text in texts])
+
+
+def band_keys(signatures, bands):
+    """
+    Hash every band of every signature to one 64-bit bucket key.
+    
+    Args:
+        signatures: uint32 array of shape (n, num_perm) (or one signature)
+        bands: Number of bands; must divide num_perm
+    
+    Returns:
+        uint64 array of shape (n, bands)
+    """
+    signatures = np.atleast_2d(signatures)
+    n, num_perm = signatures.shape
+    rows = num_perm // bands
+    # Fixed odd multipliers: a wrapping polynomial hash over the rows of a band
+    multipliers = np.random.RandomState(rows).randint(1, 2 ** 62, size=rows, dtype=np.int64).astype(np.uint64)
+    multipliers |= np.uint64(1)
+    banded = signatures[:, :bands * rows].reshape(n, bands, rows).astype(np.uint64)
+    return (banded * multipliers).sum(axis=2, dtype=np.uint64)
+
+
+def estimate_similarity(signature, others):
+    """
+    Estimated Jaccard similarity between one signature and several others.
+    
+    Args:
+        signature: uint32 array of length num_perm
+        others: uint32 array of shape (n, num_perm)
+    
+    Returns:
+        float numpy array of length n (share of equal signature positions)
+    """
+    return (np.atleast_2d(others) == signature).mean(axis=1)
+
+
+class MinHashIndex:
+    """
+    In-memory MinHash LSH index of texts under string keys.
+    
+    With bands b of r rows, two texts with Jaccard similarity s share a bucket
+    with probability 1 - (1 - s**r)**b, a steep S-curve around (1/b)**(1/r).
+    Candidates are then scored on their full signatures, so results only
+    include texts whose estimated similarity reaches the threshold.
+    """
+    
+    def __init__(self, num_perm=128, bands=32, shingle_size=3, threshold=0.5, seed=1):
+        """
+        Initialize index.
+        
+        Args:
+            num_perm: Hash permutations per signature
+            bands: LSH bands; must divide num_perm
+            shingle_size: Words per shingle
+            threshold: Default estimated Jaccard similarity for a near duplicate
+            seed: Permutation seed
+        """
+        if bands <= 0 or num_perm % bands:
+            raise ValueError(f"bands ({bands}) must divide num_perm ({num_perm})")
+        
+        self.hasher = MinHasher(num_perm, shingle_size, seed)
+        self.bands = bands
+        self.threshold = threshold
+        
+        self.keys = []
+        self._positions = {}  # key -> row
+        self._signatures = np.empty((16, num_perm), dtype=np.uint32)
+        self._buckets = [{} for _ in range(bands)]  # band -> bucket key -> rows
+        
+        # Rows scored by the last query (sub-linear when far below len(self))
+        self.last_candidates = 0
+    
+    def __len__(self):
+        """Number of indexed texts."""
+        return len(self.keys)
+    
+    def __contains__(self, key):
+        """Whether a key is indexed."""
+        return key in self._positions
+    
+    @property
+    def signatures(self):
+        """Signatures of the indexed texts, in insertion order."""
+        return self._signatures[:len(self.keys)]
+    
+    def add(self, key, text=None, signature=None):
+        """
+        Index a text under a key, replacing any text already under that key.
+        
+        Args:
+            key: String key (for example a file path)
+            text: Text to index (ignored if signature is given)
+            signature: Precomputed signature from this index's hasher
+        
+        Returns:
+            The signature stored
+        """
+        if signature is None:
+            signature = self.hasher.signature(text)
+        
+        if key in self._positions:
+            row = self._positions[key]
+            self._unbucket(row)
+        else:
+            row = len(self.keys)
+            if row == len(self._signatures):
+                self._signatures = np.resize(self._signatures, (2 * row, self.hasher.num_perm))
+            self.keys.append(key)
+            self._positions[key] = row
+        
+        self._signatures[row] = signature
+        for band, bucket_key in enumerate(band_keys(signature, self.bands)[0]):
+            self._buckets[band].setdefault(int(bucket_key), []).append(row)
+        return signature
+    
+    def add_many(self, items):
+        """
+        Index several texts.
+        
+        Args:
+            items: Iterable of (key, text) pairs
+        """
+        for key, text in items:
+            self.add(key, text)
+    
+    def remove(self, key):
+        """
+        Remove a text from the index (the last row moves into its place).
+        
+        Args:
+            key: Key to remove
+        
+        Returns:
+            True if the key was indexed
+        """
+        row = self._positions.pop(key, None)
+        if row is None:
+            return False
+        
+        self._unbucket(row)
+        last = len(self.keys) - 1
+        if row != last:
+            moved = self.keys[last]
+            self._unbucket(last)
+            self._signatures[row] = self._signatures[last]
+            self.keys[row] = moved
+            self._positions[moved] = row
+            for band, bucket_key in enumerate(band_keys(self._signatures[row], self.bands)[0]):
+                self._buckets[band].setdefault(int(bucket_key), []).append(row)
+        self.keys.pop()
+        return True
+    
+    def _unbucket(self, row):
+        """Remove a row from the buckets of its current signature."""
+        for band, bucket_key in enumerate(band_keys(self._signatures[row], self.bands)[0]):
+            bucket = self._buckets[band].get(int(bucket_key))
+            if bucket and row in bucket:
+                bucket.remove(row)
+    
+    def candidates(self, signature):
+        """
+        Rows sharing at least one band bucket with a signature.
+        
+        Args:
+            signature: Signature from this index's hasher
+        
+        Returns:
+            Sorted list of rows
+        """
+        rows = set()
+        for band, bucket_key in enumerate(band_keys(signature, self.bands)[0]):
+            rows.update(self._buckets[band].get(int(bucket_key), ()))
+        return sorted(rows)
+    
+    def query(self, text=None, signature=None, threshold=None, limit=None, exclude=None):
+        """
+        Find indexed texts that are near duplicates of a text.
+        
+        Args:
+            text: Text to look up (ignored if signature is given)
+            signature: Precomputed signature from this index's hasher
+            threshold: Minimum estimated Jaccard similarity (default: self.threshold)
+            limit: Most results to return (None = all)
+            exclude: Key to leave out (for example the text's own key)
+        
+        Returns:
+            List of (key, estimated similarity), most similar first
+        """
+        if signature is None:
+            signature = self.hasher.signature(text)
+        threshold = self.threshold if threshold is None else threshold
+        
+        rows = self.candidates(signature)
+        self.last_candidates = len(rows)
+        if not rows:
+            return []
+        
+        scores = estimate_similarity(signature, self._signatures[rows])
+        matches = [
+            (self.keys[row], float(score))
+            for row, score in zip(rows, scores)
+            if score >= threshold and self.keys[row] != exclude
+        ]
+        matches.sort(key=lambda match: (-match[1], match[0]))
+        return matches[:limit] if limit else matches
+    
+    def near_duplicate_pairs(self, threshold=None):
+        """
+        All pairs of indexed texts that are near duplicates of each other.
+        
+        Only rows sharing a bucket are compared, so a large pool of mostly
+        distinct texts costs far fewer than n * (n - 1) / 2 comparisons.
+        
+        Args:
+            threshold: Minimum estimated Jaccard similarity (default: self.threshold)
+        
+        Returns:
+            List of (key1, key2, estimated similarity), most similar first
+        """
+        threshold = self.threshold if threshold is None else threshold
+        pairs = set()
+        for buckets in self._buckets:
+            for rows in buckets.values():
+                for i, first in enumerate(rows):
+                    pairs.update((min(first, second), max(first, second)) for second in rows[i + 1:])
+        self.last_candidates = len(pairs)
+        if not pairs:
+            return []
+        
+        firsts, seconds = np.array(sorted(pairs)).T
+        scores = (self._signatures[firsts] == self._signatures[seconds]).mean(axis=1)
+        matches = [
+            (self.keys[first], self.keys[second], float(score))
+            for first, second, score in zip(firsts, seconds, scores)
+            if score >= threshold
+        ]
+        matches.sort(key=lambda match: -match[2])
+        return matches
+    
+    def save(self, path):
+        """
+        Save the index (signatures, keys and settings) to one .npz file.
+        
+        Args:
+            path: File path
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        settings = {
+            'num_perm': self.hasher.num_perm,
+            'bands': self.bands,
+            'shingle_size': self.hasher.shingle_size,
+            'threshold': self.threshold,
+            'seed': self.hasher.seed
+        }
+        with open(path, 'wb') as f:
+            np.savez_compressed(
+                f,
+                signatures=self.signatures,
+                keys=np.array(json.dumps(self.keys)),
+                settings=np.array(json.dumps(settings))
+            )
+    
+    @classmethod
+    def load(cls, path):
+        """
+        Load an index saved with save().
+        
+        Args:
+            path: File path
+        
+        Returns:
+            MinHashIndex
+        """
+        with np.load(path) as data:
+            settings = json.loads(str(data['settings']))
+            keys = json.loads(str(data['keys']))
+            signatures = data['signatures']
+        
+        index = cls(**settings)
+        index.keys = keys
+        index._positions = {key: row for row, key in enumerate(keys)}
+        index._signatures = np.array(signatures, dtype=np.uint32).reshape(len(keys), index.hasher.num_perm)
+        if not len(keys):
+            index._signatures = np.empty((16, index.hasher.num_perm), dtype=np.uint32)
+        
+        for row, row_keys in enumerate(band_keys(index.signatures, index.bands).tolist()):
+            for band, bucket_key in enumerate(row_keys):
+                index._buckets[band].setdefault(bucket_key, []).append(row)
+        return index
+
+
+def create_index():
+    """Create an empty MinHashIndex with the NEAR_DUPLICATE_* settings from Config."""
+    return MinHashIndex(
+        num_perm=Config.NEAR_DUPLICATE_NUM_PERM,
+        bands=Config.NEAR_DUPLICATE_BANDS,
+        shingle_size=Config.NEAR_DUPLICATE_SHINGLE_SIZE,
+        threshold=Config.NEAR_DUPLICATE_THRESHOLD
+    )
@@ -0,0 +1,418 @@
+"""Originality Index - Persistent near-duplicate index over everything in outputs/.
+
+Every FINAL_ARTICLE.md and LLMON variation file under outputs/ (session
+folders, and the per-article folders of batch runs such as
+outputs/batch_<timestamp>/001_<name>/) is summarized by a MinHash signature (see near_duplicate_index). New drafts
+and variations are then scored against all earlier sessions in
+milliseconds, without re-reading past articles.
+
+On disk the index is two parts, like a small log-structured store:
+
+- A main segment of .npy files, opened memory-mapped: the signatures, plus
+  each LSH band's bucket keys sorted with the row each key came from. A
+  lookup runs one binary search (searchsorted) per band, then reads only the
+  matching signature rows. Lookups therefore take about as long at 100,000
+  articles as at 100, and loading only maps the files and reads the manifest.
+- A pending MinHashIndex holding articles added since the last merge. It is
+  saved as one small .npz file and merged into a new main segment once it
+  outgrows merge_threshold.
+
+A manifest records each file's modification time and size, so sync() only
+reads files that are new or have changed since the last run.
+"""
+import os
+import json
+import threading
+import numpy as np
+from config import Config
+from near_duplicate_index import MinHashIndex, band_keys, estimate_similarity
+
+MANIFEST_NAME = 'manifest.json'
+PENDING_NAME = 'pending.npz'
+FINAL_ARTICLE_NAME = 'FINAL_ARTICLE.md'
+VARIATION_PREFIX = '02_llmon_variation'
+
+
+def is_indexed_output(name):
+    """Whether an output file name is a final article or an LLMON variation."""
+    return name == FINAL_ARTICLE_NAME or (name.startswith(VARIATION_PREFIX) and name.endswith('.md'))
+
+
+class OriginalityIndex:
+    """
+    Persistent, incrementally updated similarity index over past outputs.
+    
+    Keys are output paths relative to outputs_dir, with '/' separators
+    (for example "20250101_120000/FINAL_ARTICLE.md", or
+    "batch_20250101_120000/001_tides/FINAL_ARTICLE.md" for a batch run).
+    They therefore start with the folder path of the run that wrote them,
+    which lets a session or batch article exclude its own files.
+    """
+    
+    def __init__(self, directory, outputs_dir, num_perm=128, bands=32, shingle_size=3, merge_threshold=500):
+        """
+        Initialize index, loading it from disk if it exists.
+        
+        Args:
+            directory: Directory holding the index files
+            outputs_dir: Directory of session output folders that is indexed
+            num_perm: MinHash permutations per signature
+            bands: LSH bands; must divide num_perm
+            shingle_size: Words per shingle
+            merge_threshold: Pending articles that trigger a merge into the main segment
+        """
+        self.directory = directory
+        self.outputs_dir = outputs_dir
+        self.merge_threshold = merge_threshold
+        self.settings = {'num_perm': num_perm, 'bands': bands, 'shingle_size': shingle_size}
+        self.bands = bands
+        self.dirty = False
+        
+        # Stored articles scored by the last query
+        self.last_candidates = 0
+        
+        self._reset()
+        self._load()
+    
+    def __len__(self):
+        """Number of indexed articles."""
+        return len(self.main_keys) - len(self.deleted) + len(self.pending)
+    
+    def __contains__(self, key):
+        """Whether a key is indexed."""
+        return key in self.pending or (key in self._main_rows and self._main_rows[key] not in self.deleted)
+    
+    def _reset(self):
+        """Start with an empty index."""
+        num_perm = self.settings['num_perm']
+        self.pending = MinHashIndex(**self.settings)
+        self.files = {}  # key -> [mtime_ns, size] of the indexed file
+        self.generation = 0
+        self._set_main([], np.empty((0, num_perm), dtype=np.uint32),
+                       np.empty((self.bands, 0), dtype=np.uint64), np.empty((self.bands, 0), dtype=np.int64))
+    
+    def _set_main(self, keys, signatures, sorted_keys, sorted_rows, deleted=()):
+        """Install a main segment."""
+        self.main_keys = keys
+        self._main_rows = {key: row for row, key in enumerate(keys)}
+        self.signatures = signatures
+        self._sorted_keys = sorted_keys
+        self._sorted_rows = sorted_rows
+        self.deleted = set(deleted)
+    
+    def _path(self, name):
+        """Path of an index file."""
+        return os.path.join(self.directory, name)
+    
+    def _segment_names(self, generation):
+        """File names of a main segment generation."""
+        return {
+            'signatures': f"signatures-{generation}.npy",
+            'keys': f"band_keys-{generation}.npy",
+            'rows': f"band_rows-{generation}.npy"
+        }
+    
+    def _load(self):
+        """Open the index on disk; a missing, unreadable or differently configured one starts empty."""
+        try:
+            with open(self._path(MANIFEST_NAME), 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('settings') != self.settings:
+                return  # Signatures are not comparable; sync() rebuilds from the files
+            
+            names = self._segment_names(manifest['generation'])
+            if manifest['main_keys']:
+                self._set_main(
+                    manifest['main_keys'],
+                    np.load(self._path(names['signatures']), mmap_mode='r'),
+                    np.load(self._path(names['keys']), mmap_mode='r'),
+                    np.load(self._path(names['rows']), mmap_mode='r'),
+                    manifest['deleted']
+                )
+            if os.path.exists(self._path(PENDING_NAME)):
+                self.pending = MinHashIndex.load(self._path(PENDING_NAME))
+            self.generation = manifest['generation']
+            self.files = manifest['files']
+        except (OSError, ValueError, KeyError):
+            self._reset()  # sync() rebuilds from the files
+    
+    def key_for(self, path):
+        """Index key of an output file path."""
+        return os.path.relpath(path, self.outputs_dir).replace(os.sep, '/')
+    
+    def add(self, key, text, stamp=None):
+        """
+        Index an article, replacing any earlier version under the same key.
+        
+        Args:
+            key: Output key (see key_for)
+            text: Article text
+            stamp: [mtime_ns, size] of the file, used by sync() to skip unchanged files
+        """
+        row = self._main_rows.get(key)
+        if row is not None:
+            self.deleted.add(row)
+        self.pending.add(key, text)
+        self.files[key] = stamp
+        self.dirty = True
+    
+    def add_file(self, path, text=None):
+        """
+        Index an output file.
+        
+        Args:
+            path: File path under outputs_dir
+            text: File contents, if already in memory
+        """
+        if text is None:
+            with open(path, 'r', encoding='utf-8') as f:
+                text = f.read()
+        stat = os.stat(path)
+        self.add(self.key_for(path), text, [stat.st_mtime_ns, stat.st_size])
+    
+    def remove(self, key):
+        """
+        Drop an article from the index.
+        
+        Args:
+            key: Output key
+        """
+        row = self._main_rows.get(key)
+        if row is not None:
+            self.deleted.add(row)
+        self.pending.remove(key)
+        self.files.pop(key, None)
+        self.dirty = True
+    
+    def sync(self):
+        """
+        Bring the index up to date with outputs_dir.
+        
+        Only files whose modification time or size changed are read.
+        
+        Returns:
+            Tuple of (articles added or updated, articles removed)
+        """
+        seen = set()
+        added = 0
+        for key, entry in self._output_files():
+            seen.add(key)
+            stat = entry.stat()
+            if self.files.get(key) == [stat.st_mtime_ns, stat.st_size] and key in self:
+                continue
+            try:
+                with open(entry.path, 'r', encoding='utf-8') as f:
+                    self.add(key, f.read(), [stat.st_mtime_ns, stat.st_size])
+                added += 1
+            except (OSError, UnicodeDecodeError):
+                pass
+        
+        gone = [key for key in self.files if key not in seen]
+        for key in gone:
+            self.remove(key)
+        return added, len(gone)
+    
+    def _output_files(self):
+        """
+        Walk outputs_dir for final articles and variations at any folder depth.
+        
+        Files directly in outputs_dir and hidden folders (the index itself)
+        are skipped.
+        
+        Yields:
+            (key, os.DirEntry) for each indexed output file
+        """
+        if not os.path.isdir(self.outputs_dir):
+            return
+        folders = [(self.outputs_dir, '')]
+        while folders:
+            path, prefix = folders.pop()
+            for entry in os.scandir(path):
+                if entry.name.startswith('.'):
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    folders.append((entry.path, f"{prefix}{entry.name}/"))
+                elif prefix and entry.is_file() and is_indexed_output(entry.name):
+                    yield f"{prefix}{entry.name}", entry
+    
+    def query(self, text, exclude_prefix=None, limit=5):
+        """
+        Find the indexed articles most similar to a text.
+        
+        Only articles sharing an LSH band bucket with the text are scored;
+        articles below roughly 0.3 estimated Jaccard similarity are not found.
+        
+        Args:
+            text: Text to look up
+            exclude_prefix: Leave out keys starting with this (for example "<session_id>/")
+            limit: Most matches to return
+        
+        Returns:
+            List of (key, estimated Jaccard similarity), most similar first
+        """
+        signature = self.pending.hasher.signature(text)
+        matches = {}
+        
+        # Main segment: binary search for the query's key in every sorted band
+        if len(self.main_keys):
+            query_keys = band_keys(signature, self.bands)[0]
+            rows = []
+            for band in range(self.bands):
+                band_sorted = self._sorted_keys[band]
+                start = np.searchsorted(band_sorted, query_keys[band], side='left')
+                end = np.searchsorted(band_sorted, query_keys[band], side='right')
+                if end > start:
+                    rows.append(self._sorted_rows[band][start:end])
+            if rows:
+                rows = [row for row in np.unique(np.concatenate(rows)).tolist() if row not in self.deleted]
+                if rows:
+                    scores = estimate_similarity(signature, self.signatures[rows])
+                    matches.update((self.main_keys[row], float(score)) for row, score in zip(rows, scores))
+        main_candidates = len(matches)
+        
+        pending = self.pending.query(signature=signature, threshold=0.0)
+        matches.update(pending)
+        self.last_candidates = main_candidates + self.pending.last_candidates
+        
+        ranked = sorted(
+            ((key, score) for key, score in matches.items()
+             if not (exclude_prefix and key.startswith(exclude_prefix))),
+            key=lambda match: (-match[1], match[0])
+        )
+        return ranked[:limit]
+    
+    def originality(self, text, exclude_prefix=None):
+        """
+        Originality of a text against everything indexed.
+        
+        Args:
+            text: Draft, variation or final article
+            exclude_prefix: Leave out keys starting with this (for example "<session_id>/")
+        
+        Returns:
+            Dictionary with score (0-100, 100 = nothing similar found),
+            similarity and closest key of the best match (None if none),
+            matches, candidates scored and indexed article count
+        """
+        matches = self.query(text, exclude_prefix)
+        similarity = matches[0][1] if matches else 0.0
+        return {
+            'score': round((1.0 - similarity) * 100, 1),
+            'similarity': round(similarity, 3),
+            'closest': matches[0][0] if matches else None,
+            'matches': matches,
+            'candidates': self.last_candidates,
+            'indexed': len(self)
+        }
+    
+    def save(self):
+        """Persist changes; merges pending articles once they reach merge_threshold."""
+        if not self.dirty:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        
+        if len(self.pending) >= self.merge_threshold or len(self.deleted) > len(self.main_keys) // 4:
+            self.merge()
+            return
+        
+        temp_path = self._path(PENDING_NAME + '.tmp')
+        self.pending.save(temp_path)
+        os.replace(temp_path, self._path(PENDING_NAME))
+        self._write_manifest()
+        self.dirty = False
+    
+    def merge(self):
+        """
+        Write a new main segment holding every live article, then drop the old one.
+        
+        Each generation gets new file names, so segments still memory-mapped
+        by another process (or on Windows) are never overwritten.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        live = [row for row in range(len(self.main_keys)) if row not in self.deleted]
+        keys = [self.main_keys[row] for row in live] + list(self.pending.keys)
+        signatures = np.concatenate([np.asarray(self.signatures)[live], self.pending.signatures])
+        
+        # One sorted run of bucket keys per band, with the row each came from
+        banded = band_keys(signatures, self.bands).T
+        order = np.argsort(banded, axis=1, kind='stable')
+        sorted_keys = np.take_along_axis(banded, order, axis=1)
+        
+        old_names = self._segment_names(self.generation)
+        self.generation += 1
+        names = self._segment_names(self.generation)
+        for field, array in (('signatures', signatures), ('keys', sorted_keys), ('rows', order)):
+            np.save(self._path(names[field]), np.ascontiguousarray(array))
+        
+        self.pending = MinHashIndex(**self.settings)
+        self._set_main(
+            keys,
+            np.load(self._path(names['signatures']), mmap_mode='r'),
+            np.load(self._path(names['keys']), mmap_mode='r'),
+            np.load(self._path(names['rows']), mmap_mode='r')
+        )
+        self._write_manifest()
+        self.dirty = False
+        
+        for name in list(old_names.values()) + [PENDING_NAME]:
+            try:
+                os.remove(self._path(name))
+            except OSError:
+                pass  # Missing, or still mapped by another process (left as a stale file)
+    
+    def _write_manifest(self):
+        """Atomically write the manifest."""
+        manifest = {
+            'settings': self.settings,
+            'generation': self.generation,
+            'main_keys': self.main_keys,
+            'deleted': sorted(self.deleted),
+            'files': self.files
+        }
+        temp_path = self._path(MANIFEST_NAME + '.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(temp_path, self._path(MANIFEST_NAME))
+    
+    def get_stats(self):
+        """
+        Get index statistics.
+        
+        Returns:
+            Dictionary with indexed, main segment, pending and deleted counts
+        """
+        return {
+            'indexed': len(self),
+            'main': len(self.main_keys),
+            'pending': len(self.pending),
+            'deleted': len(self.deleted),
+            'generation': self.generation
+        }
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_originality_index():
+    """
+    Get the process-wide originality index for Config.OUTPUTS_DIR, synced and saved.
+    
+    Returns:
+        OriginalityIndex
+    """
+    global _index
+    
+    with _index_lock:
+        if _index is None or _index.outputs_dir != Config.OUTPUTS_DIR:
+            _index = OriginalityIndex(
+                Config.ORIGINALITY_INDEX_DIR or os.path.join(Config.OUTPUTS_DIR, '.originality_index'),
+                Config.OUTPUTS_DIR,
+                num_perm=Config.NEAR_DUPLICATE_NUM_PERM,
+                bands=Config.NEAR_DUPLICATE_BANDS,
+                shingle_size=Config.NEAR_DUPLICATE_SHINGLE_SIZE,
+                merge_threshold=Config.ORIGINALITY_MERGE_THRESHOLD
+            )
+            _index.sync()
+            _index.save()
+        return _index
@@ -0,0 +1,33 @@
+"""Prompt Builder - Lays out prompts so providers can reuse a cached prefix.
+
+OpenAI and Gemini cache the longest prompt prefix they have already seen, so
+every agent prompt is assembled in the same order:
+
+1. Static sections: instructions, rules, templates, briefs and references
+   that are identical for every call of a stage
+2. Variable sections: the article, outline or feedback being worked on
+3. Task: role, pass or variation specifics and output instructions
+"""
+
+
+def build_prompt(static_sections, variable_sections=(), task=""):
+    """
+    Assemble a prompt with a stable prefix.
+    
+    Args:
+        static_sections: List of (heading, text) blocks shared across calls
+        variable_sections: List of (heading, text) blocks that change per call
+        task: Task-specific instructions, always placed last
+    
+    Returns:
+        Prompt text; empty sections are skipped
+    """
+    parts = []
+    for heading, text in list(static_sections) + list(variable_sections):
+        if text:
+            parts.append(f"# {heading}\n{text}")
+    
+    if task:
+        parts.append(task.strip())
+    
+    return "\n\n".join(parts)
@@ -0,0 +1,276 @@
+"""Provider Router - Latency-aware provider selection with circuit breakers.
+
+Used when AI_PROVIDER=auto. Every call is routed to the provider with the
+best score (recent latency for the task, inflated by its recent error rate).
+A provider that keeps failing has its circuit opened and gets no traffic
+until a cooldown has passed. After that, one trial call (half-open)
+decides whether it rejoins. Calls that fail on one provider fall back to
+the next.
+"""
+import os
+import json
+import time
+import random
+import threading
+from datetime import datetime
+from config import Config
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class BackendHealth:
+    """Rolling latency and error statistics plus circuit state for one provider."""
+    
+    def __init__(self, name):
+        """
+        Initialize backend health.
+        
+        Args:
+            name: Provider name
+        """
+        self.name = name
+        self.latency = None        # EWMA over all tasks, seconds
+        self.task_latency = {}     # task -> EWMA seconds
+        self.error_rate = 0.0      # EWMA of failures (0-1)
+        self.consecutive_failures = 0
+        self.calls = 0
+        self.failures = 0
+        self.state = CLOSED
+        self.opened_at = None
+        self.trial_in_flight = False
+    
+    def expected_latency(self, task):
+        """Estimated latency for a task (0 until measured, so new providers get tried)."""
+        if task in self.task_latency:
+            return self.task_latency[task]
+        return self.latency or 0.0
+
+
+class ProviderRouter:
+    """
+    Orders providers per call and tracks their health.
+    
+    All methods must run on the shared API event loop.
+    """
+    
+    def __init__(self, providers, alpha=0.3, error_penalty=4.0, explore_rate=0.05, failure_threshold=3,
+                 error_rate_threshold=0.5, min_calls=5, cooldown_seconds=30, log_path=None):
+        """
+        Initialize router.
+        
+        Args:
+            providers: Provider names in preference order (ties go to the earlier one)
+            alpha: EWMA weight of the newest latency/error sample
+            error_penalty: Score = latency * (1 + error_penalty * error rate)
+            explore_rate: Share of calls sent to a non-best provider to refresh its stats
+            failure_threshold: Consecutive failures that open a circuit
+            error_rate_threshold: Error rate that opens a circuit (after min_calls)
+            min_calls: Calls needed before the error rate can open a circuit
+            cooldown_seconds: Time an open circuit waits before a half-open trial
+            log_path: JSON Lines file for per-call routing decisions (None = no log)
+        """
+        self.backends = {name: BackendHealth(name) for name in providers}
+        self.order = list(providers)
+        self.alpha = alpha
+        self.error_penalty = error_penalty
+        self.explore_rate = explore_rate
+        self.failure_threshold = failure_threshold
+        self.error_rate_threshold = error_rate_threshold
+        self.min_calls = min_calls
+        self.cooldown_seconds = cooldown_seconds
+        self.log_path = log_path
+        self._rng = random.Random()
+        self._log_lock = threading.Lock()
+    
+    def score(self, name, task=None):
+        """Lower is better: expected latency inflated by the recent error rate."""
+        backend = self.backends[name]
+        return backend.expected_latency(task) * (1 + self.error_penalty * backend.error_rate)
+    
+    def choose(self, task=None):
+        """
+        Order providers for a call.
+        
+        Closed circuits come first by score. An open circuit whose cooldown
+        has passed becomes half-open and is offered for one trial call. If
+        every circuit is open, the one closest to its retry time is used as
+        a last resort.
+        
+        Args:
+            task: Task name (latency is tracked per task)
+        
+        Returns:
+            Provider names, best first
+        """
+        now = time.monotonic()
+        available = []
+        for name in self.order:
+            backend = self.backends[name]
+            if backend.state == OPEN and now - backend.opened_at >= self.cooldown_seconds:
+                backend.state = HALF_OPEN
+            if backend.state == CLOSED or (backend.state == HALF_OPEN and not backend.trial_in_flight):
+                available.append(name)
+        
+        if not available:
+            return [min(self.order, key=lambda name: self.backends[name].opened_at or 0)]
+        
+        ranked = sorted(available, key=lambda name: (self.score(name, task), self.order.index(name)))
+        if len(ranked) > 1 and self.explore_rate and self._rng.random() < self.explore_rate:
+            explored = self._rng.choice(ranked[1:])
+            ranked.remove(explored)
+            ranked.insert(0, explored)
+        return ranked
+    
+    def begin(self, name):
+        """
+        Claim a provider for one attempt.
+        
+        Args:
+            name: Provider about to be called
+        
+        Returns:
+            False if it is half-open and another call already holds the trial
+        """
+        backend = self.backends[name]
+        if backend.state == HALF_OPEN:
+            if backend.trial_in_flight:
+                return False
+            backend.trial_in_flight = True
+        return True
+    
+    def record_success(self, name, task, latency=None):
+        """
+        Record a successful call.
+        
+        Args:
+            name: Provider that served the call
+            task: Task name
+            latency: Upstream latency in seconds, or None if served without
+                     a provider request (cache hit, coalesced)
+        """
+        backend = self.backends[name]
+        backend.calls += 1
+        backend.consecutive_failures = 0
+        backend.error_rate = self._ewma(backend.error_rate, 0.0)
+        if latency is not None:
+            backend.latency = self._ewma(backend.latency, latency)
+            backend.task_latency[task] = self._ewma(backend.task_latency.get(task), latency)
+        
+        if backend.state != CLOSED:
+            backend.state = CLOSED
+            backend.error_rate = 0.0
+        backend.trial_in_flight = False
+    
+    def record_failure(self, name, task, latency=None):
+        """
+        Record a failed call and open the circuit if the provider looks unhealthy.
+        
+        Args:
+            name: Provider that failed
+            task: Task name
+            latency: Seconds until the failure
+        """
+        backend = self.backends[name]
+        backend.calls += 1
+        backend.failures += 1
+        backend.consecutive_failures += 1
+        backend.error_rate = self._ewma(backend.error_rate, 1.0)
+        if latency is not None:
+            # A provider that fails slowly should also look slow
+            backend.latency = self._ewma(backend.latency, latency)
+        
+        unhealthy = (
+            backend.consecutive_failures >= self.failure_threshold
+            or (backend.calls >= self.min_calls and backend.error_rate >= self.error_rate_threshold)
+        )
+        if backend.state == HALF_OPEN or unhealthy:
+            backend.state = OPEN
+            backend.opened_at = time.monotonic()
+        backend.trial_in_flight = False
+    
+    def release(self, name):
+        """Release a half-open trial that was cancelled before finishing."""
+        self.backends[name].trial_in_flight = False
+    
+    def log_decision(self, task, attempts, candidates):
+        """
+        Append one routing decision to the routing log.
+        
+        Args:
+            task: Task name
+            attempts: List of {'provider', 'outcome', 'latency', 'error'} in order tried
+            candidates: Provider order chosen for the first attempt
+        """
+        if not self.log_path:
+            return
+        
+        entry = {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'task': task,
+            'provider': attempts[-1]['provider'] if attempts and attempts[-1]['outcome'] == 'success' else None,
+            'failover': len(attempts) > 1,
+            'attempts': attempts,
+            'candidates': candidates,
+            'scores': {name: round(self.score(name, task), 3) for name in self.order},
+            'states': {name: backend.state for name, backend in self.backends.items()}
+        }
+        with self._log_lock:
+            try:
+                directory = os.path.dirname(self.log_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(self.log_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(entry) + '\n')
+            except OSError:
+                # Logging must never break generation
+                pass
+    
+    def get_stats(self):
+        """
+        Get per-provider routing statistics.
+        
+        Returns:
+            Dictionary of provider -> calls, failures, error_rate, latency, state
+        """
+        return {
+            name: {
+                'calls': backend.calls,
+                'failures': backend.failures,
+                'error_rate': round(backend.error_rate, 3),
+                'latency': round(backend.latency, 3) if backend.latency is not None else None,
+                'state': backend.state
+            }
+            for name, backend in self.backends.items()
+        }
+    
+    def _ewma(self, current, sample):
+        """Exponentially weighted moving average step."""
+        if current is None:
+            return sample
+        return self.alpha * sample + (1 - self.alpha) * current
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_provider_router():
+    """Get the process-wide router over Config.routable_providers()."""
+    global _router
+    
+    with _router_lock:
+        if _router is None:
+            _router = ProviderRouter(
+                Config.routable_providers(),
+                alpha=Config.ROUTER_LATENCY_ALPHA,
+                error_penalty=Config.ROUTER_ERROR_PENALTY,
+                explore_rate=Config.ROUTER_EXPLORE_RATE,
+                failure_threshold=Config.ROUTER_FAILURE_THRESHOLD,
+                error_rate_threshold=Config.ROUTER_ERROR_RATE_THRESHOLD,
+                min_calls=Config.ROUTER_MIN_CALLS,
+                cooldown_seconds=Config.ROUTER_COOLDOWN_SECONDS,
+                log_path=Config.ROUTING_LOG_PATH if Config.ENABLE_API_CALL_LOG else None
+            )
+        return _router
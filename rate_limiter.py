@@ -0,0 +1,207 @@
+"""Rate Limiter - Per-provider request/token budgets with adaptive concurrency."""
+import asyncio
+import threading
+import time
+
+
+class TokenBucket:
+    """Continuously refilling budget (requests or tokens per minute)."""
+    
+    def __init__(self, rate_per_minute, burst_seconds=60):
+        """
+        Initialize token bucket.
+        
+        Args:
+            rate_per_minute: Sustained budget per minute
+            burst_seconds: Seconds of budget that may be spent at once
+        """
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = max(1.0, self.rate_per_second * burst_seconds)
+        self.available = self.capacity
+        self.updated = time.monotonic()
+    
+    def _refill(self):
+        """Add budget accrued since the last update."""
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate_per_second)
+        self.updated = now
+    
+    def wait_time(self, amount):
+        """
+        Seconds until `amount` can be consumed (0 if available now).
+        
+        Requests larger than the bucket are clamped so they cannot stall forever.
+        """
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.available >= amount:
+            return 0.0
+        return (amount - self.available) / self.rate_per_second
+    
+    def consume(self, amount):
+        """Spend budget."""
+        self._refill()
+        self.available -= min(amount, self.capacity)
+
+
+class AdaptiveRateLimiter:
+    """
+    Enforces requests-per-minute and tokens-per-minute budgets for one provider
+    and adapts allowed concurrency with AIMD (additive increase on success,
+    multiplicative decrease on 429s and timeouts).
+    
+    All methods must run on the shared API event loop.
+    """
+    
+    def __init__(self, requests_per_minute, tokens_per_minute, initial_concurrency=4,
+                 min_concurrency=1, max_concurrency=16, decrease_factor=0.5, burst_seconds=60):
+        """
+        Initialize rate limiter.
+        
+        Args:
+            requests_per_minute: Request budget per minute
+            tokens_per_minute: Token budget per minute (prompt + requested output)
+            initial_concurrency: Starting number of allowed in-flight requests
+            min_concurrency: Lower bound for the concurrency limit
+            max_concurrency: Upper bound for the concurrency limit
+            decrease_factor: Multiplier applied to the limit on throttling
+            burst_seconds: Seconds of budget that may be spent at once
+        """
+        self.request_bucket = TokenBucket(requests_per_minute, burst_seconds)
+        self.token_bucket = TokenBucket(tokens_per_minute, burst_seconds)
+        
+        self.concurrency_limit = float(initial_concurrency)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.decrease_factor = decrease_factor
+        
+        self.in_flight = 0
+        self._condition = None
+        self._last_decrease = 0.0
+        
+        # Counters exposed through get_stats()
+        self.total_requests = 0
+        self.throttled_requests = 0
+        self.failed_requests = 0
+        self.total_queue_delay = 0.0
+        self.total_model_latency = 0.0
+        self.max_queue_delay = 0.0
+    
+    async def acquire(self, estimated_tokens):
+        """
+        Wait for a concurrency slot and enough request/token budget.
+        
+        Args:
+            estimated_tokens: Tokens the request is expected to consume
+        
+        Returns:
+            Seconds spent queueing
+        """
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        
+        start = time.monotonic()
+        
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.concurrency_limit))
+            self.in_flight += 1
+        
+        try:
+            while True:
+                wait = max(
+                    self.request_bucket.wait_time(1),
+                    self.token_bucket.wait_time(estimated_tokens)
+                )
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+        except BaseException:
+            await self._release_slot()
+            raise
+        
+        self.request_bucket.consume(1)
+        self.token_bucket.consume(estimated_tokens)
+        
+        queue_delay = time.monotonic() - start
+        self.total_queue_delay += queue_delay
+        self.max_queue_delay = max(self.max_queue_delay, queue_delay)
+        return queue_delay
+    
+    async def release(self, latency, outcome='success'):
+        """
+        Record the outcome of a request and adapt the concurrency limit.
+        
+        Args:
+            latency: Seconds the provider took to answer
+            outcome: 'success', 'throttled' (429 or timeout), 'failed' or 'cancelled'
+        """
+        self.total_requests += 1
+        self.total_model_latency += latency
+        
+        if outcome == 'throttled':
+            self.throttled_requests += 1
+            # Back off at most once per latency window so one burst of 429s
+            # doesn't collapse the limit to the floor
+            now = time.monotonic()
+            if now - self._last_decrease >= max(latency, 1.0):
+                self.concurrency_limit = max(self.min_concurrency, self.concurrency_limit * self.decrease_factor)
+                self._last_decrease = now
+        elif outcome == 'failed':
+            self.failed_requests += 1
+        elif outcome == 'success':
+            # Additive increase: roughly +1 slot per window of successful requests
+            self.concurrency_limit = min(
+                self.max_concurrency,
+                self.concurrency_limit + 1.0 / max(self.concurrency_limit, 1.0)
+            )
+        
+        await self._release_slot()
+    
+    async def _release_slot(self):
+        """Free a concurrency slot and wake up waiters."""
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+    
+    def get_stats(self):
+        """
+        Get limiter state for reporting.
+        
+        Returns:
+            Dictionary with concurrency, budget and timing information
+        """
+        completed = self.total_requests
+        return {
+            'concurrency_limit': round(self.concurrency_limit, 2),
+            'in_flight': self.in_flight,
+            'total_requests': completed,
+            'throttled_requests': self.throttled_requests,
+            'failed_requests': self.failed_requests,
+            'total_queue_delay': round(self.total_queue_delay, 3),
+            'avg_queue_delay': round(self.total_queue_delay / completed, 3) if completed else 0.0,
+            'max_queue_delay': round(self.max_queue_delay, 3),
+            'total_model_latency': round(self.total_model_latency, 3),
+            'avg_model_latency': round(self.total_model_latency / completed, 3) if completed else 0.0,
+            'available_requests': round(self.request_bucket.available, 1),
+            'available_tokens': int(self.token_bucket.available)
+        }
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider):
+    """Get the process-wide rate limiter for a provider, configured from Config."""
+    from config import Config
+    
+    with _limiters_lock:
+        if provider not in _limiters:
+            limits = Config.RATE_LIMITS.get(provider, Config.RATE_LIMITS['openai'])
+            _limiters[provider] = AdaptiveRateLimiter(
+                requests_per_minute=limits['rpm'],
+                tokens_per_minute=limits['tpm'],
+                initial_concurrency=Config.RATE_LIMIT_INITIAL_CONCURRENCY,
+                max_concurrency=Config.RATE_LIMIT_MAX_CONCURRENCY
+            )
+        return _limiters[provider]
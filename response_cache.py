@@ -0,0 +1,207 @@
+"""Response Cache - Disk-backed, content-addressed cache for model responses."""
+import os
+import json
+import hashlib
+import threading
+import time
+from utils import ensure_dir
+
+
+class ResponseCache:
+    """Stores generated responses on disk with size-bounded LRU eviction."""
+    
+    def __init__(self, cache_dir='cache', max_bytes=200 * 1024 * 1024):
+        """
+        Initialize response cache.
+        
+        Args:
+            cache_dir: Directory to store cache entries
+            max_bytes: Maximum total size of all entries before eviction
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        
+        self._lock = threading.Lock()
+        self._entries = {}  # key -> [size_bytes, last_access]
+        self._total_bytes = 0
+        
+        ensure_dir(cache_dir)
+        self._load_index()
+    
+    @staticmethod
+    def make_key(provider, model, temperature, max_tokens, prompt):
+        """
+        Build a content-addressed key for a request.
+        
+        Args:
+            provider: AI provider name
+            model: Model name
+            temperature: Sampling temperature
+            max_tokens: Output token limit
+            prompt: Full prompt text
+        
+        Returns:
+            Hex digest identifying the request
+        """
+        prompt_hash = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+        material = json.dumps([provider, model, temperature, max_tokens, prompt_hash])
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+    
+    def get(self, key):
+        """
+        Look up a cached response.
+        
+        Args:
+            key: Request key from make_key()
+        
+        Returns:
+            Cached response text, or None on a miss
+        """
+        path = self._entry_path(key)
+        
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                # Entry vanished or is corrupt - treat as a miss
+                self._forget(key)
+                self.misses += 1
+                return None
+            
+            # Touch the file so LRU order survives restarts
+            now = time.time()
+            self._entries[key][1] = now
+            try:
+                os.utime(path, (now, now))
+            except OSError:
+                pass
+            
+            self.hits += 1
+            return entry['content']
+    
+    def put(self, key, content, metadata=None):
+        """
+        Store a response and evict least recently used entries if over budget.
+        
+        Args:
+            key: Request key from make_key()
+            content: Response text to cache
+            metadata: Optional dictionary stored alongside the content
+        """
+        path = self._entry_path(key)
+        payload = json.dumps({
+            'content': content,
+            'metadata': metadata or {},
+            'created': time.time()
+        })
+        size = len(payload.encode('utf-8'))
+        
+        # Never store a single entry that could not fit the budget
+        if size > self.max_bytes:
+            return
+        
+        with self._lock:
+            ensure_dir(os.path.dirname(path))
+            temp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(payload)
+            os.replace(temp_path, path)
+            
+            if key in self._entries:
+                self._total_bytes -= self._entries[key][0]
+            self._entries[key] = [size, time.time()]
+            self._total_bytes += size
+            
+            self._evict()
+    
+    def clear(self):
+        """Remove all cached entries."""
+        with self._lock:
+            for key in list(self._entries):
+                self._forget(key)
+    
+    def get_stats(self):
+        """
+        Get cache statistics.
+        
+        Returns:
+            Dictionary with hit/miss counters and size information
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'size_bytes': self._total_bytes,
+                'max_bytes': self.max_bytes
+            }
+    
+    def _entry_path(self, key):
+        """Get file path for a cache key (sharded by key prefix)."""
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+    
+    def _load_index(self):
+        """Rebuild the in-memory index from files on disk."""
+        for shard in os.scandir(self.cache_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if not entry.name.endswith('.json'):
+                    continue
+                stat = entry.stat()
+                key = entry.name[:-len('.json')]
+                self._entries[key] = [stat.st_size, stat.st_mtime]
+                self._total_bytes += stat.st_size
+        
+        with self._lock:
+            self._evict()
+    
+    def _evict(self):
+        """Drop least recently used entries until under budget (lock held)."""
+        if self._total_bytes <= self.max_bytes:
+            return
+        
+        by_age = sorted(self._entries.items(), key=lambda item: item[1][1])
+        for key, _ in by_age:
+            if self._total_bytes <= self.max_bytes:
+                break
+            self._forget(key)
+            self.evictions += 1
+    
+    def _forget(self, key):
+        """Remove an entry from disk and the index (lock held)."""
+        size, _ = self._entries.pop(key, (0, 0))
+        self._total_bytes -= size
+        try:
+            os.remove(self._entry_path(key))
+        except OSError:
+            pass
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_shared_cache():
+    """Get the process-wide response cache configured from Config."""
+    global _shared_cache
+    from config import Config
+    
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = ResponseCache(
+                Config.RESPONSE_CACHE_DIR,
+                Config.RESPONSE_CACHE_MAX_MB * 1024 * 1024
+            )
+        return _shared_cache
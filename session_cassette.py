@@ -0,0 +1,243 @@
+"""Session Cassette - Record real API sessions and replay them offline.
+
+In record mode every APIClient.generate_content call (and every answer to a
+workflow prompt) is appended to a gzip-compressed JSON Lines file together
+with its timings. In replay mode the same calls are served from that file,
+sleeping for the recorded latency times Config.CASSETTE_LATENCY_SCALE, so a
+full workflow run can be repeated as a performance regression test without
+paying for the API calls again.
+"""
+import os
+import gzip
+import json
+import hashlib
+import functools
+import threading
+from collections import deque
+from config import Config
+
+
+class CassetteMissError(LookupError):
+    """A replayed session made a request the cassette has no recording for."""
+
+
+class SessionCassette:
+    """Gzip JSON Lines recording of API responses and user answers."""
+    
+    def __init__(self, path, mode, latency_scale=1.0):
+        """
+        Initialize session cassette.
+        
+        Args:
+            path: Cassette file (.jsonl.gz)
+            mode: 'record' (overwrite path) or 'replay' (read path)
+            latency_scale: Multiplier for recorded latencies on replay (0 = instant)
+        """
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self._lock = threading.Lock()
+        self._started = False
+        
+        # Replay queues: identical requests are served in recorded order
+        self._responses = {}   # key -> deque of entries
+        self._answers = deque()
+        
+        self.stats = {
+            'recorded': 0,
+            'replayed': 0,
+            'recorded_latency': 0.0,
+            'replayed_latency': 0.0
+        }
+        
+        if mode == 'replay':
+            self._load()
+    
+    @staticmethod
+    def make_key(prompt, temperature, task=None):
+        """
+        Build the lookup key for a request.
+        
+        Provider and model are left out so a session recorded against one
+        provider can be replayed under another (including 'mock').
+        
+        Args:
+            prompt: Full prompt text
+            temperature: Sampling temperature
+            task: Task name passed to generate_content
+        
+        Returns:
+            Hex digest string
+        """
+        payload = json.dumps([task, temperature, prompt], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def record_response(self, key, task, content, latency, first_chunk_latency=None, error=None):
+        """
+        Append one generate_content call.
+        
+        Args:
+            key: Request key from make_key()
+            task: Task name
+            content: Returned text (None if the call failed)
+            latency: Wall time of the call in seconds
+            first_chunk_latency: Seconds until the first streamed chunk, if streamed
+            error: The APIClientError raised, if the call failed
+        """
+        entry = {
+            'type': 'response',
+            'key': key,
+            'task': task,
+            'latency': round(latency, 4),
+            'first_chunk_latency': round(first_chunk_latency, 4) if first_chunk_latency is not None else None
+        }
+        if error is not None:
+            entry['error'] = str(error)
+            entry['retryable'] = getattr(error, 'retryable', False)
+            entry['error_type'] = type(error).__name__
+        else:
+            entry['content'] = content
+        
+        self._append(entry)
+        with self._lock:
+            self.stats['recorded'] += 1
+            self.stats['recorded_latency'] += latency
+    
+    def record_answer(self, kind, value):
+        """
+        Append one answer to an interactive workflow prompt.
+        
+        Args:
+            kind: 'choice' or 'input'
+            value: The user's answer
+        """
+        self._append({'type': 'answer', 'kind': kind, 'value': value})
+    
+    def next_response(self, key):
+        """
+        Pop the next recorded response for a request.
+        
+        Args:
+            key: Request key from make_key()
+        
+        Returns:
+            Recorded entry with 'content' or 'error', plus latency fields
+        
+        Raises:
+            CassetteMissError: If the request was never recorded (or is exhausted)
+        """
+        with self._lock:
+            queue = self._responses.get(key)
+            if not queue:
+                raise CassetteMissError(
+                    f"No recorded response left for request {key[:12]} in {self.path}. "
+                    "The prompt changed since the session was recorded; record it again."
+                )
+            entry = queue.popleft()
+            self.stats['replayed'] += 1
+            self.stats['recorded_latency'] += entry['latency']
+            self.stats['replayed_latency'] += self.scaled(entry['latency'])
+            return entry
+    
+    def next_answer(self, kind):
+        """
+        Pop the next recorded answer to an interactive prompt.
+        
+        Args:
+            kind: 'choice' or 'input'
+        
+        Returns:
+            Recorded answer
+        
+        Raises:
+            CassetteMissError: If the session asks more questions than were recorded
+        """
+        with self._lock:
+            if not self._answers or self._answers[0]['kind'] != kind:
+                raise CassetteMissError(f"No recorded {kind} answer left in {self.path}")
+            return self._answers.popleft()['value']
+    
+    def scaled(self, seconds):
+        """Recorded duration adjusted by the replay latency scale."""
+        return (seconds or 0.0) * self.latency_scale
+    
+    def get_stats(self):
+        """
+        Get record/replay counters.
+        
+        Returns:
+            Dictionary with recorded/replayed call counts and latency totals
+        """
+        with self._lock:
+            return dict(self.stats)
+    
+    def _append(self, entry):
+        """Write one entry as its own gzip member so a crash keeps earlier calls."""
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        with self._lock:
+            if not self._started:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+            with gzip.open(self.path, 'at' if self._started else 'wt', encoding='utf-8') as f:
+                f.write(line)
+            self._started = True
+    
+    def _load(self):
+        """Read a recorded cassette into the replay queues."""
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"Cassette not found: {self.path} (record one with CASSETTE_MODE=record)")
+        
+        with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if entry['type'] == 'response':
+                    self._responses.setdefault(entry['key'], deque()).append(entry)
+                else:
+                    self._answers.append(entry)
+
+
+def interactive(func, kind):
+    """
+    Wrap a user prompt helper so its answers are recorded and replayed.
+    
+    Args:
+        func: get_user_choice or get_user_input
+        kind: 'choice' or 'input'
+    
+    Returns:
+        Wrapped function with the same signature
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        cassette = get_cassette()
+        if cassette and cassette.mode == 'replay':
+            return cassette.next_answer(kind)
+        
+        value = func(*args, **kwargs)
+        if cassette:
+            cassette.record_answer(kind, value)
+        return value
+    
+    return wrapper
+
+
+_cassette = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette():
+    """Get the process-wide cassette, or None when Config.CASSETTE_MODE is 'off'."""
+    global _cassette
+    
+    if Config.CASSETTE_MODE not in ('record', 'replay'):
+        return None
+    
+    with _cassette_lock:
+        if _cassette is None:
+            _cassette = SessionCassette(
+                Config.CASSETTE_PATH, Config.CASSETTE_MODE, Config.CASSETTE_LATENCY_SCALE
+            )
+        return _cassette
@@ -0,0 +1,1659 @@
+"""Test suite for the API client performance layer."""
+import unittest
+import os
+import json
+import time
+import asyncio
+from types import SimpleNamespace
+import tempfile
+import shutil
+from unittest import mock
+from config import Config
+from response_cache import ResponseCache
+from rate_limiter import AdaptiveRateLimiter
+import token_budget
+
+
+class TestResponseCache(unittest.TestCase):
+    """Test ResponseCache functionality."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache = ResponseCache(self.temp_dir, max_bytes=10 * 1024)
+    
+    def tearDown(self):
+        """Clean up test fixtures."""
+        shutil.rmtree(self.temp_dir)
+    
+    def test_key_depends_on_all_fields(self):
+        """Test that every request field changes the key."""
+        base = ResponseCache.make_key('openai', 'gpt-5-mini', 0.7, 16384, 'prompt')
+        
+        self.assertEqual(base, ResponseCache.make_key('openai', 'gpt-5-mini', 0.7, 16384, 'prompt'))
+        self.assertNotEqual(base, ResponseCache.make_key('gemini', 'gpt-5-mini', 0.7, 16384, 'prompt'))
+        self.assertNotEqual(base, ResponseCache.make_key('openai', 'gpt-4o', 0.7, 16384, 'prompt'))
+        self.assertNotEqual(base, ResponseCache.make_key('openai', 'gpt-5-mini', 0.5, 16384, 'prompt'))
+        self.assertNotEqual(base, ResponseCache.make_key('openai', 'gpt-5-mini', 0.7, 4096, 'prompt'))
+        self.assertNotEqual(base, ResponseCache.make_key('openai', 'gpt-5-mini', 0.7, 16384, 'other'))
+    
+    def test_hit_and_miss_counters(self):
+        """Test hit/miss accounting."""
+        key = ResponseCache.make_key('openai', 'm', 0.7, 100, 'p')
+        
+        self.assertIsNone(self.cache.get(key))
+        self.cache.put(key, 'cached text')
+        self.assertEqual(self.cache.get(key), 'cached text')
+        
+        stats = self.cache.get_stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['entries'], 1)
+    
+    def test_persists_across_instances(self):
+        """Test that entries survive a new cache instance."""
+        key = ResponseCache.make_key('openai', 'm', 0.7, 100, 'p')
+        self.cache.put(key, 'persisted')
+        
+        reloaded = ResponseCache(self.temp_dir, max_bytes=10 * 1024)
+        self.assertEqual(reloaded.get(key), 'persisted')
+    
+    def test_lru_eviction(self):
+        """Test least recently used entries are evicted first."""
+        keys = [ResponseCache.make_key('openai', 'm', 0.7, 100, f"p{i}") for i in range(4)]
+        for key in keys[:3]:
+            self.cache.put(key, 'x' * 3000)
+        
+        # Touch the oldest entry so the second one becomes least recent
+        self.cache.get(keys[0])
+        self.cache.put(keys[3], 'x' * 3000)
+        
+        self.assertIsNotNone(self.cache.get(keys[0]))
+        self.assertIsNone(self.cache.get(keys[1]))
+        self.assertLessEqual(self.cache.get_stats()['size_bytes'], 10 * 1024)
+        self.assertGreaterEqual(self.cache.get_stats()['evictions'], 1)
+
+
+class APIClientTestCase(unittest.TestCase):
+    """Base class that configures an offline OpenAI client."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.config_patch = mock.patch.multiple(
+            Config,
+            AI_PROVIDER='openai',
+            OPENAI_API_KEY='sk-test',
+            OPENAI_WRITER_MODEL='gpt-test',
+            OPENAI_LLMON_MODEL='gpt-test',
+            OPENAI_EDITOR_MODEL='gpt-test',
+            RESPONSE_CACHE_DIR=os.path.join(self.temp_dir, 'cache'),
+            ENABLE_RATE_LIMITER=False,
+            API_RETRY_BASE_DELAY=0.01,
+            API_RETRY_MAX_DELAY=0.05,
+            API_CALL_LOG_PATH=os.path.join(self.temp_dir, 'logs', 'api_calls.jsonl')
+        )
+        self.config_patch.start()
+        
+        import response_cache
+        self.shared_cache_patch = mock.patch.object(response_cache, '_shared_cache', None)
+        self.shared_cache_patch.start()
+        
+        import token_budget
+        self.usage_log_patch = mock.patch.object(token_budget, '_usage_log', None)
+        self.usage_log_patch.start()
+        
+        import api_client
+        self.registry_patch = mock.patch.object(api_client, '_provider_clients', {})
+        self.registry_patch.start()
+        self.single_flight_patch = mock.patch.object(api_client, '_single_flight', api_client.SingleFlight())
+        self.single_flight_patch.start()
+    
+        import llm_scheduler
+        self.scheduler_patch = mock.patch.object(llm_scheduler, '_scheduler', None)
+        self.scheduler_patch.start()
+    
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.scheduler_patch.stop()
+        self.single_flight_patch.stop()
+        self.registry_patch.stop()
+        self.usage_log_patch.stop()
+        self.shared_cache_patch.stop()
+        self.config_patch.stop()
+        shutil.rmtree(self.temp_dir)
+
+
+class TestAPIClientCache(APIClientTestCase):
+    """Test response caching in APIClient."""
+    
+    def test_use_cache_skips_second_call(self):
+        """Test that an opted-in call is served from cache on repeat."""
+        from api_client import APIClient
+        client = APIClient(model='gpt-test')
+        
+        with mock.patch.object(client.async_client, '_generate_openai', new=mock.AsyncMock(return_value='draft')) as upstream:
+            first = client.generate_content('same prompt', 0.7, use_cache=True)
+            second = client.generate_content('same prompt', 0.7, use_cache=True)
+        
+        self.assertEqual(first, 'draft')
+        self.assertEqual(second, 'draft')
+        self.assertEqual(upstream.call_count, 1)
+        self.assertEqual(client.cache.get_stats()['hits'], 1)
+    
+    def test_default_bypasses_cache(self):
+        """Test that calls without use_cache always hit the provider."""
+        from api_client import APIClient
+        client = APIClient(model='gpt-test')
+        
+        with mock.patch.object(client.async_client, '_generate_openai', new=mock.AsyncMock(return_value='variation')) as upstream:
+            client.generate_content('same prompt', 0.8)
+            client.generate_content('same prompt', 0.8)
+        
+        self.assertEqual(upstream.call_count, 2)
+    
+    def test_cache_write_failure_still_returns_content(self):
+        """Test that a cache write error (e.g. disk full) is reported and the reply still returned."""
+        from api_client import APIClient
+        client = APIClient(model='gpt-test')
+        
+        with mock.patch.object(client.async_client, '_generate_openai', new=mock.AsyncMock(return_value='draft')), \
+                mock.patch.object(client.cache, 'put', side_effect=OSError('No space left on device')), \
+                mock.patch('api_client.print_error') as report:
+            content = client.generate_content('prompt', 0.7, use_cache=True)
+        
+        self.assertEqual(content, 'draft')
+        self.assertIn('No space left on device', report.call_args[0][0])
+
+
+async def make_openai_stream(pieces):
+    """Build a fake OpenAI chunk stream for the given text pieces."""
+    for piece in pieces:
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))])
+
+
+def fake_openai_client(pieces):
+    """Build a fake AsyncOpenAI client whose completions stream the given pieces."""
+    client = mock.Mock()
+    client.chat.completions.create = mock.AsyncMock(return_value=make_openai_stream(pieces))
+    return client
+
+
+class TestAPIClientStreaming(APIClientTestCase):
+    """Test token streaming in APIClient."""
+    
+    def test_generate_content_stream_yields_chunks(self):
+        """Test that the stream yields provider chunks in order."""
+        from api_client import APIClient
+        client = APIClient(model='gpt-test')
+        client.async_client.client = fake_openai_client(['Hel', 'lo', None, '!'])
+        
+        chunks = list(client.generate_content_stream('prompt', 0.7))
+        
+        self.assertEqual(chunks, ['Hel', 'lo', '!'])
+        self.assertTrue(client.async_client.client.chat.completions.create.call_args.kwargs['stream'])
+    
+    def test_stream_handler_receives_chunks_and_result_is_assembled(self):
+        """Test that generate_content renders chunks and returns the full text."""
+        from api_client import APIClient
+        client = APIClient(model='gpt-test')
+        client.async_client.client = fake_openai_client(['# Title', '\n', 'Body'])
+        
+        received = []
+        client.stream_handler = received.append
+        content = client.generate_content('prompt', 0.7)
+        
+        self.assertEqual(content, '# Title\nBody')
+        self.assertEqual(received, ['# Title', '\n', 'Body', None])
+
+
+class TestAsyncAPIClient(APIClientTestCase):
+    """Test the asyncio client and the synchronous wrapper."""
+    
+    def test_concurrent_requests_share_one_loop(self):
+        """Test that many in-flight requests overlap on the shared loop."""
+        from api_client import AsyncAPIClient, run_sync
+        client = AsyncAPIClient(model='gpt-test')
+        
+        async def slow_generate(prompt, temperature, *args):
+            await asyncio.sleep(0.2)
+            return prompt.upper()
+        
+        async def run_all():
+            return await asyncio.gather(*[
+                client.generate_content(f"prompt {i}") for i in range(20)
+            ])
+        
+        with mock.patch.object(client, '_generate_openai', new=slow_generate):
+            start = time.time()
+            results = run_sync(run_all())
+            elapsed = time.time() - start
+        
+        self.assertEqual(results[3], 'PROMPT 3')
+        self.assertLess(elapsed, 1.0)
+    
+    def test_provider_errors_are_wrapped(self):
+        """Test that provider failures surface with the provider name."""
+        from api_client import APIClient
+        client = APIClient(model='gpt-test')
+        
+        failing = mock.AsyncMock(side_effect=RuntimeError('boom'))
+        with mock.patch.object(client.async_client, '_generate_openai', new=failing):
+            with self.assertRaises(Exception) as context:
+                client.generate_content('prompt')
+        
+        self.assertIn('API Error (openai)', str(context.exception))
+
+
+class TestSharedClientRegistry(APIClientTestCase):
+    """Test the process-wide provider client registry."""
+    
+    def test_agents_share_one_provider_client(self):
+        """Test that clients for different agent models reuse one SDK client."""
+        from api_client import APIClient
+        writer_client = APIClient(model='gpt-writer')
+        editor_client = APIClient(model='gpt-editor')
+        
+        self.assertIs(writer_client.async_client.client, editor_client.async_client.client)
+        self.assertEqual(editor_client.model, 'gpt-editor')
+    
+    def test_different_keys_get_different_clients(self):
+        """Test that the registry keys clients by API key."""
+        from api_client import get_provider_client
+        
+        self.assertIsNot(
+            get_provider_client('openai', 'sk-one'),
+            get_provider_client('openai', 'sk-two')
+        )
+    
+    def test_prewarm_opens_connection_and_ignores_errors(self):
+        """Test that pre-warming issues a lightweight request and never raises."""
+        from api_client import APIClient, run_sync
+        client = APIClient(model='gpt-test')
+        fake = mock.Mock()
+        fake.models.list = mock.AsyncMock(side_effect=RuntimeError('offline'))
+        client.async_client.client = fake
+        
+        run_sync(client.async_client.prewarm())
+        
+        fake.models.list.assert_awaited_once()
+
+
+class TestGeminiModelReuse(APIClientTestCase):
+    """Test that Gemini model objects are built once and reused."""
+    
+    def test_model_cached_per_temperature(self):
+        """Test GenerativeModel reuse across calls with the same settings."""
+        from api_client import AsyncAPIClient
+        with mock.patch.multiple(Config, AI_PROVIDER='gemini', GEMINI_API_KEY='test-key'):
+            client = AsyncAPIClient()
+        
+        first = client._gemini_model(0.4)
+        
+        self.assertIs(first, client._gemini_model(0.4))
+        self.assertIsNot(first, client._gemini_model(0.5))
+        self.assertEqual(first._generation_config['temperature'], 0.4)
+
+
+class TestGeminiVariations(APIClientTestCase):
+    """Test concurrent Gemini variations with per-variation safety retries."""
+    
+    def setUp(self):
+        """Use a Gemini client and a small rules file."""
+        super().setUp()
+        self.gemini_patch = mock.patch.multiple(Config, AI_PROVIDER='gemini', GEMINI_API_KEY='test-key')
+        self.gemini_patch.start()
+        self.rules_path = os.path.join(self.temp_dir, 'llmon_rules.md')
+        with open(self.rules_path, 'w', encoding='utf-8') as f:
+            f.write('Write in plain English.')
+    
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.gemini_patch.stop()
+        super().tearDown()
+    
+    def test_safety_block_detection(self):
+        """Test that SAFETY (3) and prompt blocks raise SafetyBlockedError, but MAX_TOKENS (2) does not."""
+        from api_client import AsyncAPIClient, SafetyBlockedError
+        client = AsyncAPIClient()
+        empty = SimpleNamespace(parts=[])
+        
+        with self.assertRaises(SafetyBlockedError):
+            client._check_gemini_response(SimpleNamespace(candidates=[SimpleNamespace(finish_reason=3, content=empty)]))
+        with self.assertRaises(SafetyBlockedError):
+            client._check_gemini_response(SimpleNamespace(
+                candidates=[], prompt_feedback=SimpleNamespace(block_reason=SimpleNamespace(name='PROHIBITED_CONTENT'))
+            ))
+        with self.assertRaises(Exception) as context:
+            client._check_gemini_response(SimpleNamespace(candidates=[SimpleNamespace(finish_reason=2, content=empty)]))
+        self.assertNotIsInstance(context.exception, SafetyBlockedError)
+        self.assertIn('MAX_TOKENS', str(context.exception))
+    
+    def test_blocked_variation_retried_alone(self):
+        """Test bounded concurrency and that only the blocked variation is sent again."""
+        from agents import LLMONAgent
+        from api_client import AsyncAPIClient, SafetyBlockedError
+        prompts = []
+        active = [0, 0]  # current, peak
+        
+        async def fake_generate(client, prompt, temperature, max_tokens, usage=None):
+            prompts.append(prompt)
+            active[0] += 1
+            active[1] = max(active[1], active[0])
+            await asyncio.sleep(0.02)
+            active[0] -= 1
+            if 'variation #2' in prompt and 'neutral' not in prompt:
+                raise SafetyBlockedError("blocked (SAFETY)")
+            return f"Variation text {len(prompts)}"
+        
+        with mock.patch.multiple(Config, GEMINI_MAX_PARALLEL_VARIATIONS=2, LLMON_BATCH_MODE='off'), \
+             mock.patch.object(AsyncAPIClient, '_generate_gemini', new=fake_generate):
+            variations = LLMONAgent().generate_variations_parallel("# Article\n\nBody.", self.rules_path)
+        
+        self.assertEqual(len(prompts), 4)
+        self.assertEqual(sum('variation #2' in prompt for prompt in prompts), 2)
+        self.assertEqual(active[1], 2)
+        self.assertEqual(len(variations), 3)
+        self.assertTrue(all(variations))
+
+
+class TestAdaptiveRateLimiter(unittest.TestCase):
+    """Test request budgets and AIMD concurrency control."""
+    
+    def test_concurrency_halves_on_throttle_and_grows_on_success(self):
+        """Test multiplicative decrease and additive increase."""
+        from api_client import run_sync
+        limiter = AdaptiveRateLimiter(6000, 10 ** 6, initial_concurrency=8)
+        
+        async def request(outcome):
+            await limiter.acquire(100)
+            await limiter.release(0.1, outcome)
+        
+        run_sync(request('throttled'))
+        self.assertEqual(limiter.concurrency_limit, 4)
+        
+        # A second 429 from the same window doesn't shrink the limit again
+        run_sync(request('throttled'))
+        self.assertEqual(limiter.concurrency_limit, 4)
+        
+        for _ in range(4):
+            run_sync(request('success'))
+        self.assertGreater(limiter.concurrency_limit, 4.9)
+        self.assertLess(limiter.concurrency_limit, 5.1)
+        self.assertEqual(limiter.get_stats()['throttled_requests'], 2)
+    
+    def test_requests_per_minute_budget_delays_requests(self):
+        """Test that an exhausted request bucket queues the next request."""
+        from api_client import run_sync
+        # 600 RPM with a 0.1s burst allows one request, then one per 0.1s
+        limiter = AdaptiveRateLimiter(600, 10 ** 6, burst_seconds=0.1)
+        
+        async def request():
+            delay = await limiter.acquire(10)
+            await limiter.release(0.0)
+            return delay
+        
+        self.assertLess(run_sync(request()), 0.05)
+        self.assertGreaterEqual(run_sync(request()), 0.05)
+        self.assertGreater(limiter.get_stats()['total_queue_delay'], 0.05)
+    
+    def test_concurrency_limit_caps_in_flight_requests(self):
+        """Test that no more than the allowed number of requests run at once."""
+        from api_client import run_sync
+        limiter = AdaptiveRateLimiter(6000, 10 ** 6, initial_concurrency=2, max_concurrency=2)
+        peak = {'current': 0, 'max': 0}
+        
+        async def request():
+            await limiter.acquire(10)
+            peak['current'] += 1
+            peak['max'] = max(peak['max'], peak['current'])
+            await asyncio.sleep(0.02)
+            peak['current'] -= 1
+            await limiter.release(0.02)
+        
+        async def run_all():
+            await asyncio.gather(*[request() for _ in range(6)])
+        
+        run_sync(run_all())
+        self.assertEqual(peak['max'], 2)
+
+
+class TestAPIClientRateLimiting(APIClientTestCase):
+    """Test rate limiter integration in the API client."""
+    
+    def test_rate_limit_errors_shrink_concurrency(self):
+        """Test that a 429 from the provider is recorded as throttling."""
+        from api_client import APIClient
+        
+        class RateLimitError(Exception):
+            status_code = 429
+        
+        with mock.patch.multiple(Config, ENABLE_RATE_LIMITER=True, API_MAX_RETRIES=0):
+            limiter = AdaptiveRateLimiter(6000, 10 ** 6, initial_concurrency=8)
+            with mock.patch('api_client.get_rate_limiter', return_value=limiter):
+                client = APIClient(model='gpt-test')
+        
+        failing = mock.AsyncMock(side_effect=RateLimitError('slow down'))
+        with mock.patch.object(client.async_client, '_generate_openai', new=failing):
+            with mock.patch.object(Config, 'API_MAX_RETRIES', 0):
+                with self.assertRaises(Exception):
+                    client.generate_content('prompt')
+        
+        stats = client.rate_limiter.get_stats()
+        self.assertEqual(stats['throttled_requests'], 1)
+        self.assertEqual(stats['concurrency_limit'], 4)
+        self.assertEqual(stats['in_flight'], 0)
+
+
+class ProviderError(Exception):
+    """Stand-in for an SDK error carrying an HTTP status."""
+    
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+class TestRetriesAndHedging(APIClientTestCase):
+    """Test classified retries, deadlines and hedged requests."""
+    
+    def test_transient_errors_are_retried(self):
+        """Test that a 503 is retried and the later success is returned."""
+        from api_client import APIClient
+        client = APIClient(model='gpt-test')
+        
+        upstream = mock.AsyncMock(side_effect=[ProviderError(503), ProviderError(429), 'recovered'])
+        with mock.patch.object(client.async_client, '_generate_openai', new=upstream):
+            content = client.generate_content('prompt')
+        
+        self.assertEqual(content, 'recovered')
+        self.assertEqual(upstream.call_count, 3)
+        self.assertEqual(client.async_client.retries, 2)
+    
+    def test_permanent_errors_fail_fast(self):
+        """Test that auth and bad request errors are not retried."""
+        from api_client import APIClient, NonRetryableAPIError
+        client = APIClient(model='gpt-test')
+        
+        upstream = mock.AsyncMock(side_effect=ProviderError(401))
+        with mock.patch.object(client.async_client, '_generate_openai', new=upstream):
+            with self.assertRaises(NonRetryableAPIError) as context:
+                client.generate_content('prompt')
+        
+        self.assertEqual(upstream.call_count, 1)
+        self.assertIn('API Error (openai)', str(context.exception))
+    
+    def test_retries_stop_at_max_attempts(self):
+        """Test that persistent transient errors surface as retryable."""
+        from api_client import APIClient, RetryableAPIError
+        client = APIClient(model='gpt-test')
+        
+        upstream = mock.AsyncMock(side_effect=ProviderError(500))
+        with mock.patch.object(Config, 'API_MAX_RETRIES', 2):
+            with mock.patch.object(client.async_client, '_generate_openai', new=upstream):
+                with self.assertRaises(RetryableAPIError):
+                    client.generate_content('prompt')
+        
+        self.assertEqual(upstream.call_count, 3)
+    
+    def test_deadline_bounds_total_time(self):
+        """Test that a hung request is abandoned at the call deadline."""
+        from api_client import APIClient, RetryableAPIError
+        client = APIClient(model='gpt-test')
+        
+        async def hang(prompt, temperature, *args):
+            await asyncio.sleep(5)
+        
+        with mock.patch.object(Config, 'API_CALL_DEADLINE', 0.2):
+            with mock.patch.object(client.async_client, '_generate_openai', new=hang):
+                start = time.time()
+                with self.assertRaises(RetryableAPIError) as context:
+                    client.generate_content('prompt')
+        
+        self.assertLess(time.time() - start, 1.0)
+        self.assertIn('deadline', str(context.exception))
+    
+    def test_streamed_output_is_not_retried_after_chunks(self):
+        """Test that a stream failing mid-way is not replayed to the handler."""
+        from api_client import APIClient
+        client = APIClient(model='gpt-test')
+        
+        async def broken_stream(prompt, temperature, *args):
+            yield 'partial'
+            raise ProviderError(503)
+        
+        received = []
+        client.stream_handler = received.append
+        with mock.patch.object(client.async_client, '_stream_openai', new=broken_stream):
+            with self.assertRaises(Exception):
+                client.generate_content('prompt')
+        
+        self.assertEqual(received, ['partial'])
+    
+    @mock.patch.object(Config, 'ENABLE_HEDGED_REQUESTS', True)
+    def test_slow_request_is_hedged(self):
+        """Test that a request slower than p95 is duplicated and the fast copy wins."""
+        from api_client import APIClient
+        client = APIClient(model='gpt-test')
+        for _ in range(10):
+            client.async_client._latencies.add(0.05)
+        
+        delays = [2.0, 0.01]
+        
+        async def generate(prompt, temperature, *args):
+            await asyncio.sleep(delays.pop(0))
+            return 'answer'
+        
+        with mock.patch.object(client.async_client, '_generate_openai', new=generate):
+            start = time.time()
+            content = client.generate_content('prompt', hedge=True)
+            elapsed = time.time() - start
+        
+        self.assertEqual(content, 'answer')
+        self.assertEqual(client.async_client.hedged_requests, 1)
+        self.assertLess(elapsed, 1.0)
+    
+    @mock.patch.object(Config, 'ENABLE_HEDGED_REQUESTS', True)
+    def test_slow_first_chunk_is_hedged_when_streaming(self):
+        """Test that a stream with a slow first chunk is raced by a duplicate."""
+        from api_client import APIClient
+        client = APIClient(model='gpt-test')
+        for _ in range(10):
+            client.async_client._first_chunk_latencies.add(0.05)
+        
+        delays = [2.0, 0.01]
+        
+        async def stream(prompt, temperature, *args):
+            await asyncio.sleep(delays.pop(0))
+            yield 'fast'
+            yield ' copy'
+        
+        received = []
+        client.stream_handler = received.append
+        with mock.patch.object(client.async_client, '_stream_openai', new=stream):
+            start = time.time()
+            content = client.generate_content('prompt', hedge=True)
+            elapsed = time.time() - start
+        
+        self.assertEqual(content, 'fast copy')
+        self.assertEqual(received, ['fast', ' copy', None])
+        self.assertLess(elapsed, 1.0)
+    
+    def test_hedging_waits_for_enough_samples(self):
+        """Test that no duplicate is sent before the latency window fills."""
+        from api_client import APIClient
+        client = APIClient(model='gpt-test')
+        
+        with mock.patch.object(client.async_client, '_generate_openai', new=mock.AsyncMock(return_value='x')) as upstream:
+            client.generate_content('prompt', hedge=True)
+        
+        self.assertEqual(upstream.call_count, 1)
+        self.assertEqual(client.async_client.hedged_requests, 0)
+
+
+class TestTokenBudget(unittest.TestCase):
+    """Test token estimates and per-task output budgets."""
+    
+    def test_estimate_tokens(self):
+        """Test the local estimator scales with text size."""
+        self.assertEqual(token_budget.estimate_tokens(''), 0)
+        self.assertAlmostEqual(token_budget.estimate_tokens('word ' * 1000), 1350, delta=100)
+    
+    def test_rewrite_budget_follows_source_size(self):
+        """Test that rewrite budgets grow with the article and stay within bounds."""
+        short = token_budget.output_budget('edit_pass', 'word ' * 200, 'gpt-4o')
+        long = token_budget.output_budget('edit_pass', 'word ' * 3000, 'gpt-4o')
+        huge = token_budget.output_budget('edit_pass', 'word ' * 50000, 'gpt-4o')
+        
+        self.assertEqual(short, Config.MIN_OUTPUT_TOKENS)
+        self.assertGreater(long, short)
+        self.assertEqual(huge, token_budget.MAX_OUTPUT_TOKENS)
+    
+    def test_draft_budget_uses_target_words(self):
+        """Test drafts are sized from config targets or a target in the brief."""
+        tool_review = token_budget.output_budget('tool_review_draft', None, 'gpt-4o')
+        self.assertEqual(tool_review, int(Config.TOOL_REVIEW_TARGET_WORDS[1] * token_budget.TOKENS_PER_WORD * 1.5))
+        
+        long_brief = token_budget.output_budget('draft', 'Word Count Target: 3,000-4,000 words', 'gpt-4o')
+        self.assertEqual(long_brief, int(4000 * token_budget.TOKENS_PER_WORD * 1.5))
+    
+    def test_reasoning_models_get_reserve(self):
+        """Test that reasoning models get extra headroom for hidden tokens."""
+        plain = token_budget.output_budget('outline', None, 'gpt-4o')
+        reasoning = token_budget.output_budget('outline', None, 'gpt-5-mini')
+        
+        self.assertEqual(reasoning - plain, Config.REASONING_TOKEN_RESERVE)
+        self.assertEqual(token_budget.output_budget(None), token_budget.MAX_OUTPUT_TOKENS)
+
+
+class TestTokenAccounting(APIClientTestCase):
+    """Test adaptive max tokens and the per-call usage log."""
+    
+    def fake_response(self, content, finish_reason='stop'):
+        """Build a fake chat completion with usage counts."""
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content), finish_reason=finish_reason)],
+            usage=SimpleNamespace(
+                prompt_tokens=120, completion_tokens=40,
+                prompt_tokens_details=SimpleNamespace(cached_tokens=96),
+                completion_tokens_details=SimpleNamespace(reasoning_tokens=8)
+            )
+        )
+    
+    def test_task_budget_is_sent_and_logged(self):
+        """Test that the task budget reaches the provider and usage is logged."""
+        import json
+        from api_client import APIClient
+        client = APIClient(model='gpt-test')
+        fake = mock.Mock()
+        fake.chat.completions.create = mock.AsyncMock(return_value=self.fake_response('outline'))
+        client.async_client.client = fake
+        
+        client.generate_content('prompt', task='outline')
+        
+        sent = fake.chat.completions.create.call_args.kwargs['max_completion_tokens']
+        self.assertEqual(sent, token_budget.output_budget('outline', None, 'gpt-test'))
+        
+        with open(Config.API_CALL_LOG_PATH, encoding='utf-8') as f:
+            entry = json.loads(f.readline())
+        self.assertEqual(entry['task'], 'outline')
+        self.assertEqual(entry['max_tokens'], sent)
+        self.assertEqual(entry['prompt_tokens'], 120)
+        self.assertEqual(entry['completion_tokens'], 40)
+        self.assertEqual(entry['reasoning_tokens'], 8)
+        self.assertEqual(token_budget.get_usage_log().get_totals()['completion_tokens'], 40)
+        self.assertEqual(entry['cached_tokens'], 96)
+        self.assertAlmostEqual(token_budget.get_usage_log().get_prompt_cache_stats()['outline']['cached_rate'], 0.8)
+    
+    def test_truncated_response_is_retried_with_full_budget(self):
+        """Test that hitting a reduced budget re-requests with MAX_OUTPUT_TOKENS."""
+        from api_client import APIClient
+        client = APIClient(model='gpt-test')
+        fake = mock.Mock()
+        fake.chat.completions.create = mock.AsyncMock(side_effect=[
+            self.fake_response('cut o', 'length'),
+            self.fake_response('complete')
+        ])
+        client.async_client.client = fake
+        
+        content = client.generate_content('prompt', task='outline')
+        
+        self.assertEqual(content, 'complete')
+        budgets = [call.kwargs['max_completion_tokens'] for call in fake.chat.completions.create.call_args_list]
+        self.assertEqual(budgets[1], token_budget.MAX_OUTPUT_TOKENS)
+        self.assertLess(budgets[0], budgets[1])
+        self.assertEqual(token_budget.get_usage_log().get_totals()['truncated'], 1)
+    
+    def test_streamed_call_gets_full_budget_and_truncation_is_not_cached(self):
+        """Test that streams request MAX_OUTPUT_TOKENS and a reply cut off anyway is not cached."""
+        from api_client import APIClient
+        client = APIClient(model='gpt-test')
+        client.stream_handler = lambda chunk: None
+        budgets = []
+        
+        async def cut_off_stream(prompt, temperature, max_tokens, usage):
+            budgets.append(max_tokens)
+            usage['truncated'] = True
+            yield 'cut o'
+        
+        with mock.patch.object(client.async_client, '_stream_openai', new=cut_off_stream):
+            first = client.generate_content('prompt', use_cache=True, task='draft')
+            second = client.generate_content('prompt', use_cache=True, task='draft')
+        
+        self.assertEqual((first, second), ('cut o', 'cut o'))
+        self.assertEqual(budgets, [token_budget.MAX_OUTPUT_TOKENS] * 2)
+        self.assertEqual(client.cache.get_stats()['entries'], 0)
+    
+    def test_gemini_truncation_from_int_finish_reason(self):
+        """Test that a bare int MAX_TOKENS finish reason counts as truncated."""
+        from api_client import _gemini_usage
+        usage = {}
+        
+        _gemini_usage(SimpleNamespace(candidates=[SimpleNamespace(finish_reason=2)]), usage)
+        
+        self.assertTrue(usage['truncated'])
+
+
+class TestPromptLayout(APIClientTestCase):
+    """Test that agent prompts keep static content in a shared prefix."""
+    
+    def test_variations_share_rules_and_article_prefix(self):
+        """Test that only the task tail differs between variation prompts."""
+        from agents import LLMONAgent
+        llmon = LLMONAgent()
+        prompts = [
+            llmon._build_variation_prompt('ARTICLE BODY', 'RULES TEXT', i) for i in range(1, 4)
+        ]
+        
+        prefix = os.path.commonprefix(prompts)
+        self.assertIn('RULES TEXT', prefix)
+        self.assertIn('ARTICLE BODY', prefix)
+        self.assertNotIn('variation #1', prefix)
+    
+    def test_editor_passes_start_with_rules(self):
+        """Test that every editor pass leads with the same rules block."""
+        from agents import EditorAgent
+        editor = EditorAgent()
+        
+        for plan in (editor._multipass_plan(), editor._tool_review_plan()):
+            prompts = [prompt_builder('ARTICLE BODY', 'RULES TEXT') for _, prompt_builder, _ in plan]
+            prefix = os.path.commonprefix(prompts)
+            self.assertIn('RULES TEXT', prefix)
+            self.assertTrue(all(prompt.index('RULES TEXT') < prompt.index('ARTICLE BODY') for prompt in prompts))
+    
+    def test_outline_and_draft_share_input_prefix(self):
+        """Test that writer prompts put every static input before the task."""
+        from agents import WriterAgent
+        writer = WriterAgent()
+        paths = [os.path.join(Config.TEMPLATES_DIR, name) for name in
+                 ('manual.md', 'template.md', 'references.md', 'writer_prompt.md')]
+        
+        with mock.patch.object(writer.client, 'generate_content', return_value='outline') as generate:
+            writer.generate_outline(*paths)
+        outline_prompt = generate.call_args.args[0]
+        draft_prompt = writer._build_draft_prompt(*paths)
+        
+        prefix = os.path.commonprefix([outline_prompt, draft_prompt])
+        self.assertIn('# REFERENCE MATERIALS', prefix)
+        self.assertNotIn('YOUR TASK', prefix)
+
+
+class TestMockProvider(APIClientTestCase):
+    """Test the offline mock provider."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        super().setUp()
+        self.mock_patch = mock.patch.multiple(
+            Config,
+            AI_PROVIDER='mock',
+            MOCK_LATENCY_SECONDS=0,
+            MOCK_TOKENS_PER_SECOND=0,
+            MOCK_FAILURE_RATE=0,
+            MOCK_OUTPUT_WORDS=300
+        )
+        self.mock_patch.start()
+    
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.mock_patch.stop()
+        super().tearDown()
+    
+    def test_validate_accepts_mock_without_keys(self):
+        """Test that the mock provider needs no API key."""
+        with mock.patch.multiple(Config, OPENAI_API_KEY=None, GEMINI_API_KEY=None):
+            self.assertTrue(Config.validate())
+    
+    def test_output_is_deterministic_per_prompt(self):
+        """Test that identical prompts produce identical text and usage."""
+        from api_client import APIClient
+        client = APIClient()
+        prompt = "Write about espresso grinders. Cite https://example.com/grinders as a source."
+        
+        first = client.generate_content(prompt)
+        self.assertEqual(first, client.generate_content(prompt))
+        self.assertNotEqual(first, client.generate_content(prompt + " Be brief."))
+        self.assertTrue(first.startswith('# '))
+        self.assertIn('https://example.com/grinders', first)
+        self.assertEqual(client.model, Config.MOCK_MODEL_NAME)
+        
+        totals = token_budget.get_usage_log().get_totals()
+        self.assertEqual(totals['calls'], 3)
+        self.assertGreater(totals['completion_tokens'], 0)
+    
+    def test_stream_matches_complete_response(self):
+        """Test that streamed chunks join to the non-streamed text."""
+        from api_client import APIClient
+        client = APIClient()
+        
+        chunks = list(client.generate_content_stream("Describe a coffee workflow", 0.5))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(''.join(chunks), client.generate_content("Describe a coffee workflow", 0.5))
+    
+    def test_small_budget_is_truncated(self):
+        """Test that output beyond max_tokens is cut off and flagged."""
+        from mock_provider import MockProvider
+        text, usage = MockProvider().complete("prompt", 0.7, 100)
+        
+        self.assertTrue(usage['truncated'])
+        self.assertLessEqual(len(text.split()), 100)
+    
+    def test_injected_failures_are_retried(self):
+        """Test that injected 503s go through the retry path."""
+        from api_client import APIClient, RetryableAPIError
+        client = APIClient()
+        
+        with mock.patch.multiple(Config, MOCK_FAILURE_RATE=1.0, API_MAX_RETRIES=2):
+            with self.assertRaises(RetryableAPIError):
+                client.generate_content("prompt")
+        
+        self.assertEqual(client.async_client.retries, 2)
+        self.assertEqual(client.async_client.client.failures, 3)
+    
+    def test_latency_distributions(self):
+        """Test that sampled latencies follow the configured distribution."""
+        from mock_provider import MockProvider
+        provider = MockProvider(seed=1)
+        
+        with mock.patch.multiple(Config, MOCK_LATENCY_SECONDS=1.0, MOCK_LATENCY_SPREAD=0.5):
+            with mock.patch.object(Config, 'MOCK_LATENCY_DISTRIBUTION', 'fixed'):
+                self.assertEqual(provider.sample_latency(), 1.0)
+            with mock.patch.object(Config, 'MOCK_LATENCY_DISTRIBUTION', 'uniform'):
+                samples = [provider.sample_latency() for _ in range(200)]
+                self.assertTrue(all(0.5 <= sample <= 1.5 for sample in samples))
+            with mock.patch.object(Config, 'MOCK_LATENCY_DISTRIBUTION', 'lognormal'):
+                samples = sorted(provider.sample_latency() for _ in range(201))
+                self.assertAlmostEqual(samples[100], 1.0, delta=0.2)
+
+
+class TestSessionCassette(APIClientTestCase):
+    """Test recording and replaying API sessions."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        super().setUp()
+        import session_cassette
+        self.session_cassette = session_cassette
+        self.cassette_patch = mock.patch.multiple(
+            Config,
+            CASSETTE_PATH=os.path.join(self.temp_dir, 'cassettes', 'session.jsonl.gz'),
+            CASSETTE_LATENCY_SCALE=0
+        )
+        self.cassette_patch.start()
+        self.mode_patches = []
+    
+    def tearDown(self):
+        """Clean up test fixtures."""
+        for mode_patch in reversed(self.mode_patches):
+            mode_patch.stop()
+        self.cassette_patch.stop()
+        self.session_cassette._cassette = None
+        super().tearDown()
+    
+    def client_in_mode(self, mode, **settings):
+        """Create a client with a fresh cassette in the given mode."""
+        from api_client import APIClient
+        self.session_cassette._cassette = None
+        mode_patch = mock.patch.multiple(Config, CASSETTE_MODE=mode, **settings)
+        mode_patch.start()
+        self.mode_patches.append(mode_patch)
+        return APIClient()
+    
+    def test_replay_serves_recorded_responses_in_order(self):
+        """Test that repeated identical requests replay in recorded order."""
+        client = self.client_in_mode('record')
+        responses = iter(['first', 'second', 'other'])
+        
+        async def fake_generate(prompt, temperature, *args):
+            return next(responses)
+        
+        with mock.patch.object(client.async_client, '_generate_openai', new=fake_generate):
+            recorded = [client.generate_content('same'), client.generate_content('same'),
+                        client.generate_content('different', task='draft')]
+        
+        client = self.client_in_mode('replay')
+        with mock.patch.object(client.async_client, '_generate_openai', new=mock.AsyncMock()) as upstream:
+            replayed = [client.generate_content('same'), client.generate_content('same'),
+                        client.generate_content('different', task='draft')]
+            
+            from session_cassette import CassetteMissError
+            with self.assertRaises(CassetteMissError):
+                client.generate_content('same')
+        
+        self.assertEqual(replayed, recorded)
+        upstream.assert_not_called()
+        self.assertEqual(self.session_cassette.get_cassette().get_stats()['replayed'], 3)
+    
+    def test_replay_uses_scaled_latency_and_streams(self):
+        """Test that replay sleeps for the scaled recorded latency."""
+        client = self.client_in_mode('record')
+        
+        async def slow_generate(prompt, temperature, *args):
+            await asyncio.sleep(0.2)
+            return 'one two three four five'
+        
+        with mock.patch.object(client.async_client, '_generate_openai', new=slow_generate):
+            client.generate_content('prompt')
+        
+        client = self.client_in_mode('replay', CASSETTE_LATENCY_SCALE=0.5)
+        chunks = []
+        client.stream_handler = chunks.append
+        
+        start = time.monotonic()
+        self.assertEqual(client.generate_content('prompt'), 'one two three four five')
+        elapsed = time.monotonic() - start
+        
+        self.assertGreaterEqual(elapsed, 0.09)
+        self.assertLess(elapsed, 0.2)
+        self.assertEqual(''.join(chunks[:-1]), 'one two three four five')
+        self.assertIsNone(chunks[-1])
+    
+    def test_failures_and_answers_are_replayed(self):
+        """Test that failed calls and user answers replay as recorded."""
+        from api_client import NonRetryableAPIError
+        client = self.client_in_mode('record')
+        choose = self.session_cassette.interactive(lambda prompt, options: 2, 'choice')
+        
+        with mock.patch.object(client.async_client, '_generate_openai',
+                               new=mock.AsyncMock(side_effect=ProviderError(401))):
+            with self.assertRaises(NonRetryableAPIError):
+                client.generate_content('prompt')
+        self.assertEqual(choose("Pick one", ['a', 'b']), 2)
+        
+        client = self.client_in_mode('replay')
+        with self.assertRaises(NonRetryableAPIError):
+            client.generate_content('prompt')
+        self.assertEqual(choose("Pick one", ['a', 'b']), 2)
+    
+    def run_workflow_in_mode(self, mode, run, questions=None):
+        """Run the full mock workflow with streamed variations; return cassette stats and streamed stages."""
+        import io
+        import contextlib
+        import rate_limiter
+        import workflow
+        self.session_cassette._cassette = None
+        settings = mock.patch.multiple(
+            Config,
+            CASSETTE_MODE=mode,
+            AI_PROVIDER='mock',
+            MOCK_LATENCY_SECONDS=0.2,
+            ENABLE_VARIATION_STREAMING=True,
+            ENABLE_PARALLEL_VARIATIONS=True,
+            ENABLE_STREAMING_OUTPUT=False,
+            ENABLE_RESPONSE_CACHE=False,
+            ENABLE_WORKFLOW_MEMORY=False,
+            OUTPUTS_DIR=os.path.join(self.temp_dir, f"outputs_{run}")
+        )
+        answers = self.session_cassette.interactive(lambda prompt, *args: questions.append(prompt) or 1, 'choice')
+        stream_stage = workflow.AIContentStudioWorkflow._stream_variations
+        with settings, mock.patch.object(rate_limiter, '_limiters', {}), \
+                mock.patch.object(workflow, 'get_user_choice', answers if mode == 'record' else workflow.get_user_choice), \
+                mock.patch.object(workflow.AIContentStudioWorkflow, '_stream_variations',
+                                  autospec=True, side_effect=stream_stage) as streamed, \
+                contextlib.redirect_stdout(io.StringIO()):
+            workflow.AIContentStudioWorkflow().run()
+            return self.session_cassette.get_cassette().get_stats(), streamed.call_count
+    
+    def test_streamed_variation_workflow_replays_every_call(self):
+        """Test that a session with streamed variations records every request and replays them all."""
+        questions = []
+        recorded, streamed = self.run_workflow_in_mode('record', 'record', questions)
+        
+        self.assertEqual(streamed, 1)
+        self.assertGreaterEqual(recorded['recorded'], 3 + Config.LLMON_VERSIONS_COUNT)
+        self.assertFalse([question for question in questions if 'still generating' in question])
+        for run in range(2):
+            replayed, streamed = self.run_workflow_in_mode('replay', f"replay{run}")
+            self.assertEqual(streamed, 1)
+            self.assertEqual(replayed['replayed'], recorded['recorded'])
+
+
+class TestLocalOpenAIServer(APIClientTestCase):
+    """Test the OpenAI client end to end against the local stand-in server."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        super().setUp()
+        from local_openai_server import start_server
+        self.server = start_server()
+        self.server_patch = mock.patch.multiple(
+            Config,
+            OPENAI_BASE_URL=self.server.base_url,
+            MOCK_LATENCY_SECONDS=0,
+            MOCK_TOKENS_PER_SECOND=0,
+            MOCK_OUTPUT_WORDS=200
+        )
+        self.server_patch.start()
+    
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.server_patch.stop()
+        self.server.shutdown()
+        self.server.server_close()
+        super().tearDown()
+    
+    def test_completions_over_pooled_connections(self):
+        """Test JSON completions, usage and keep-alive reuse over real HTTP."""
+        from api_client import APIClient
+        from mock_provider import MockProvider
+        client = APIClient(model='gpt-test')
+        
+        texts = [client.generate_content(f"Prompt {i}", 0.5) for i in range(5)]
+        
+        self.assertEqual(texts[0], MockProvider().complete("Prompt 0", 0.5, 16384)[0])
+        stats = self.server.get_stats()
+        self.assertEqual(stats['completions'], 5)
+        self.assertLess(stats['connections'], 5)
+        self.assertGreater(token_budget.get_usage_log().get_totals()['completion_tokens'], 0)
+    
+    def test_streaming_matches_completion(self):
+        """Test that server-sent event streaming yields the same text."""
+        from api_client import APIClient
+        client = APIClient(model='gpt-test')
+        
+        chunks = list(client.generate_content_stream("Stream this", 0.5))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(''.join(chunks), client.generate_content("Stream this", 0.5))
+        self.assertEqual(self.server.get_stats()['streams'], 1)
+    
+    def test_simulated_rate_limits_are_retried(self):
+        """Test that 429s from the server go through the retry path."""
+        from api_client import APIClient, RetryableAPIError
+        client = APIClient(model='gpt-test')
+        self.server.throttle_rate = 1.0
+        
+        with mock.patch.object(Config, 'API_MAX_RETRIES', 1):
+            with self.assertRaises(RetryableAPIError):
+                client.generate_content("prompt")
+        
+        self.assertEqual(self.server.get_stats()['throttled'], 2)
+
+
+class TestRequestCoalescing(APIClientTestCase):
+    """Test single-flight sharing of identical in-flight requests."""
+    
+    def gather(self, *coros):
+        """Run coroutines concurrently on the shared loop."""
+        from api_client import run_sync
+        
+        async def run_all():
+            return await asyncio.gather(*coros, return_exceptions=True)
+        
+        return run_sync(run_all())
+    
+    def test_identical_concurrent_calls_share_one_request(self):
+        """Test that concurrent use_cache calls make one upstream request."""
+        from api_client import AsyncAPIClient, get_single_flight
+        writer, editor = AsyncAPIClient('gpt-test'), AsyncAPIClient('gpt-test')
+        calls = []
+        
+        async def slow_generate(prompt, temperature, *args):
+            calls.append(prompt)
+            await asyncio.sleep(0.1)
+            return f"answer to {prompt}"
+        
+        chunks = []
+        with mock.patch.object(AsyncAPIClient, '_generate_openai', new=lambda self, *args: slow_generate(*args)):
+            results = self.gather(
+                writer.generate_content('brief', 0.7, use_cache=True, task='outline'),
+                writer.generate_content('brief', 0.7, use_cache=True, task='outline'),
+                editor.generate_content('brief', 0.7, use_cache=True, task='outline', on_chunk=chunks.append),
+                writer.generate_content('other', 0.7, use_cache=True, task='outline')
+            )
+        
+        self.assertEqual(results[:3], ['answer to brief'] * 3)
+        self.assertEqual(sorted(calls), ['brief', 'other'])
+        self.assertEqual(chunks, ['answer to brief', None])
+        self.assertEqual(get_single_flight().get_stats(),
+                         {'upstream_requests': 2, 'coalesced_calls': 2, 'in_flight': 0})
+        self.assertEqual(token_budget.get_usage_log().get_totals()['coalesced'], 2)
+    
+    def test_sampled_calls_are_not_coalesced(self):
+        """Test that use_cache=False calls each go upstream."""
+        from api_client import AsyncAPIClient
+        client = AsyncAPIClient('gpt-test')
+        
+        with mock.patch.object(client, '_generate_openai', new=mock.AsyncMock(return_value='variation')) as upstream:
+            self.gather(*(client.generate_content('same', 0.8) for _ in range(3)))
+        
+        self.assertEqual(upstream.await_count, 3)
+    
+    def test_leader_failure_is_shared_then_cleared(self):
+        """Test that followers see the leader's error and later calls retry upstream."""
+        from api_client import AsyncAPIClient, NonRetryableAPIError
+        client = AsyncAPIClient('gpt-test')
+        
+        async def failing_generate(prompt, temperature, *args):
+            await asyncio.sleep(0.05)
+            raise ProviderError(400)
+        
+        with mock.patch.object(client, '_generate_openai', new=failing_generate):
+            results = self.gather(*(client.generate_content('brief', 0.7, use_cache=True) for _ in range(3)))
+        self.assertTrue(all(isinstance(result, NonRetryableAPIError) for result in results))
+        
+        with mock.patch.object(client, '_generate_openai', new=mock.AsyncMock(return_value='ok')) as upstream:
+            self.assertEqual(self.gather(client.generate_content('brief', 0.7, use_cache=True)), ['ok'])
+        upstream.assert_awaited_once()
+
+
+class TestProviderRouter(APIClientTestCase):
+    """Test latency-aware routing, circuit breakers and failover (AI_PROVIDER=auto)."""
+    
+    def setUp(self):
+        """Route between OpenAI and the instant mock provider."""
+        super().setUp()
+        self.routing_log = os.path.join(self.temp_dir, 'logs', 'routing.jsonl')
+        self.router_config_patch = mock.patch.multiple(
+            Config,
+            AI_PROVIDER='auto',
+            ROUTER_PROVIDERS=['openai', 'mock'],
+            ROUTER_EXPLORE_RATE=0,
+            ROUTER_FAILURE_THRESHOLD=2,
+            ROUTING_LOG_PATH=self.routing_log,
+            MOCK_LATENCY_SECONDS=0,
+            MOCK_TOKENS_PER_SECOND=0,
+            MOCK_FAILURE_RATE=0
+        )
+        self.router_config_patch.start()
+        
+        import provider_router
+        self.router_patch = mock.patch.object(provider_router, '_router', None)
+        self.router_patch.start()
+    
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.router_patch.stop()
+        self.router_config_patch.stop()
+        super().tearDown()
+    
+    def test_prefers_faster_provider(self):
+        """Test that the provider with lower task latency is ranked first."""
+        from provider_router import ProviderRouter
+        router = ProviderRouter(['openai', 'gemini'], explore_rate=0)
+        router.record_success('openai', 'outline', 2.0)
+        router.record_success('gemini', 'outline', 0.5)
+        router.record_success('openai', 'edit', 0.4)
+        router.record_success('gemini', 'edit', 1.5)
+        
+        self.assertEqual(router.choose('outline'), ['gemini', 'openai'])
+        self.assertEqual(router.choose('edit'), ['openai', 'gemini'])
+    
+    def test_circuit_opens_then_half_opens_after_cooldown(self):
+        """Test that repeated failures stop traffic until a trial call succeeds."""
+        from provider_router import ProviderRouter, OPEN, CLOSED
+        router = ProviderRouter(['openai', 'gemini'], explore_rate=0, failure_threshold=2, cooldown_seconds=60)
+        router.record_failure('openai', 'outline')
+        router.record_failure('openai', 'outline')
+        
+        self.assertEqual(router.backends['openai'].state, OPEN)
+        self.assertEqual(router.choose('outline'), ['gemini'])
+        
+        router.backends['openai'].opened_at -= 61
+        self.assertIn('openai', router.choose('outline'))
+        self.assertTrue(router.begin('openai'))
+        self.assertFalse(router.begin('openai'))  # One trial at a time
+        router.record_success('openai', 'outline', 0.1)
+        self.assertEqual(router.backends['openai'].state, CLOSED)
+    
+    def test_failover_to_next_provider_is_logged(self):
+        """Test that a failing provider falls back and the decision is logged per call."""
+        from api_client import APIClient, AsyncAPIClient
+        client = APIClient(model='gpt-test')
+        
+        with mock.patch.object(AsyncAPIClient, '_generate_openai', new=mock.AsyncMock(side_effect=ProviderError(503))) as upstream:
+            first = client.generate_content('Write about tides', 0.7, task='outline')
+            second = client.generate_content('Write about tides', 0.7, task='outline')
+            third = client.generate_content('Write about tides', 0.7, task='outline')
+        
+        self.assertTrue(first and first == second == third)
+        self.assertEqual(upstream.await_count, 2)  # Circuit opened after two failures
+        
+        with open(self.routing_log, encoding='utf-8') as f:
+            entries = [json.loads(line) for line in f]
+        self.assertEqual(len(entries), 3)
+        self.assertEqual([entry['provider'] for entry in entries], ['mock'] * 3)
+        self.assertTrue(entries[0]['failover'])
+        self.assertEqual(entries[0]['attempts'][0]['outcome'], 'failed')
+        self.assertEqual(entries[2]['candidates'], ['mock'])
+        self.assertEqual(entries[2]['states']['openai'], 'open')
+
+
+class TestEditorCascade(APIClientTestCase):
+    """Test small-model-first editor passes with escalation on failed local checks."""
+    
+    ARTICLE = "# Tides\n\n" + "The moon pulls the sea and the coast answers twice a day. " * 20 + \
+              "\n\nSee [NOAA](https://tidesandcurrents.noaa.gov) for tables.\n\n## Sources\n"
+    
+    def setUp(self):
+        """Configure a small editor model tried before gpt-test."""
+        super().setUp()
+        self.cascade_patch = mock.patch.multiple(
+            Config,
+            OPENAI_EDITOR_FAST_MODEL='gpt-small',
+            ENABLE_EDITOR_CASCADE=True,
+            EDITOR_PASS_MODELS={},
+            ENABLE_QUALITY_SCORING=False
+        )
+        self.cascade_patch.start()
+        self.calls = []
+    
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.cascade_patch.stop()
+        super().tearDown()
+    
+    def run_plan(self, edits, plan_name='multipass'):
+        """Run an editing plan where each model returns edits[model](article)."""
+        from agents import EditorAgent
+        from api_client import AsyncAPIClient
+        editor = EditorAgent()
+        
+        async def fake_generate(client, prompt, temperature, *args):
+            self.calls.append(client.model)
+            return edits[client.model](self.ARTICLE)
+        
+        with mock.patch.object(AsyncAPIClient, '_generate_openai', new=fake_generate):
+            if plan_name == 'tool_review':
+                result = editor._run_passes(self.ARTICLE, 'RULES', editor._tool_review_plan(), tool_review=True)
+            else:
+                result = editor._run_passes(self.ARTICLE, 'RULES', editor._multipass_plan())
+        return editor, result
+    
+    def test_small_model_output_is_kept_when_checks_pass(self):
+        """Test that passes stay on the small model when nothing regresses."""
+        editor, result = self.run_plan({'gpt-small': lambda article: article.replace('pulls', 'tugs')})
+        
+        self.assertEqual(self.calls, ['gpt-small'] * 4)
+        self.assertIn('tugs', result)
+        self.assertEqual(editor.cascade_stats['escalated'], 0)
+    
+    def test_changed_citation_escalates_to_editor_model(self):
+        """Test that a pass which drops a URL is rerun on the editor model."""
+        editor, result = self.run_plan({
+            'gpt-small': lambda article: article.replace('(https://tidesandcurrents.noaa.gov)', ''),
+            'gpt-test': lambda article: article.replace('pulls', 'draws')
+        })
+        
+        self.assertEqual(self.calls, ['gpt-small', 'gpt-test'] * 4)
+        self.assertIn('https://tidesandcurrents.noaa.gov', result)
+        self.assertEqual(editor.cascade_stats['escalated'], 4)
+        self.assertIn('URL(s) dropped', editor.cascade_stats['reasons'][0])
+    
+    def test_tool_review_format_regression_escalates(self):
+        """Test that a new _validate_tool_review_format issue triggers escalation."""
+        editor, _ = self.run_plan({
+            'gpt-small': lambda article: article.replace('answers', 'answers \u2014 always'),
+            'gpt-test': lambda article: article
+        }, plan_name='tool_review')
+        
+        self.assertEqual(editor.cascade_stats['escalated'], editor.cascade_stats['passes'])
+        self.assertIn('Em dashes', editor.cascade_stats['reasons'][0])
+    
+    def test_per_pass_model_map_without_cascade(self):
+        """Test that EDITOR_PASS_MODELS pins models per pass with no checks when the cascade is off."""
+        with mock.patch.multiple(Config, ENABLE_EDITOR_CASCADE=False, EDITOR_PASS_MODELS={'grammar': 'gpt-small'}):
+            editor, _ = self.run_plan({'gpt-small': lambda article: '', 'gpt-test': lambda article: article})
+        
+        self.assertEqual(self.calls, ['gpt-small', 'gpt-test', 'gpt-test', 'gpt-test'])
+        self.assertEqual(editor.cascade_stats['passes'], 0)
+    
+    def test_cascade_stats_reset_per_polish_and_pass_clients_stream(self):
+        """Test that each polish reports only its own passes and small-model clients share the stream handler."""
+        from api_client import AsyncAPIClient
+        edits = {
+            'gpt-small': lambda article: article.replace('(https://tidesandcurrents.noaa.gov)', ''),
+            'gpt-test': lambda article: article
+        }
+        editor, _ = self.run_plan(edits)
+        self.assertEqual(editor.cascade_stats['escalated'], 4)
+        
+        # Second polish of the same article (served from the response cache)
+        with mock.patch.object(AsyncAPIClient, '_generate_openai', new=mock.AsyncMock(return_value=self.ARTICLE)):
+            editor._run_passes(self.ARTICLE, 'RULES', editor._multipass_plan())
+        
+        self.assertEqual(editor.cascade_stats['passes'], 4)
+        self.assertEqual(editor.cascade_stats['escalated'], 4)
+        
+        handler = mock.Mock()
+        editor.client.stream_handler = handler
+        client, cascaded = editor._pass_client('grammar')
+        
+        self.assertTrue(cascaded)
+        self.assertEqual(client.model, 'gpt-small')
+        self.assertIs(client.stream_handler, handler)
+    
+    def test_concurrent_polishes_keep_separate_cascade_stats(self):
+        """Test that polishes sharing one editor do not reset or add to each other's counts."""
+        from agents import EditorAgent
+        from api_client import AsyncAPIClient, run_sync
+        editor = EditorAgent()
+        plain = self.ARTICLE.replace('[NOAA](https://tidesandcurrents.noaa.gov)', 'the tide office')
+        
+        async def fake_generate(client, prompt, temperature, *args):
+            await asyncio.sleep(0.01)
+            source = self.ARTICLE if 'tidesandcurrents' in prompt else plain
+            if client.model == 'gpt-small':
+                return source.replace('(https://tidesandcurrents.noaa.gov)', '')
+            return source
+        
+        async def polish_both():
+            return await asyncio.gather(
+                editor._run_passes_async(self.ARTICLE, 'RULES', editor._multipass_plan()),
+                editor._run_passes_async(plain, 'RULES', editor._multipass_plan())
+            )
+        
+        with mock.patch.object(AsyncAPIClient, '_generate_openai', new=fake_generate):
+            run_sync(polish_both())
+        
+        self.assertEqual(editor.cascade_stats['passes'], 4)
+        self.assertIn(editor.cascade_stats['escalated'], (0, 4))
+
+
+class TestLLMONBatch(APIClientTestCase):
+    """Test generating every LLMON variation from one request."""
+    
+    ARTICLE = "# Tides\n\n" + "The moon pulls the sea and the coast answers twice a day. " * 10
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        super().setUp()
+        self.rules_path = os.path.join(self.temp_dir, 'llmon_rules.md')
+        with open(self.rules_path, 'w', encoding='utf-8') as f:
+            f.write('Write in plain English.')
+    
+    def test_split_variations_tolerates_marker_noise(self):
+        """Test splitting on loose markers, with missing and cut-off variations as None."""
+        from agents.llmon_agent import split_variations
+        body = "word " * 80
+        response = (f"Here you go:\n=== VARIATION 1 ===\n{body}\n**== variation 2 ==**\n```markdown\n{body}\n```\n"
+                    f"=== VARIATION 2 ===\nrepeat\n=== VARIATION 3 ===\ncut off")
+        
+        variations = split_variations(response, 3, self.ARTICLE)
+        
+        self.assertEqual(variations[0], body.strip())
+        self.assertEqual(variations[1], body.strip())
+        self.assertIsNone(variations[2])
+        self.assertEqual(split_variations("no markers at all", 3), [None, None, None])
+    
+    def test_delimited_mode_makes_one_request(self):
+        """Test that the multi-output prompt yields every variation from one mock call."""
+        from agents import LLMONAgent
+        with mock.patch.multiple(Config, AI_PROVIDER='mock', LLMON_BATCH_MODE='delimited', MOCK_LATENCY_SECONDS=0,
+                                 MOCK_TOKENS_PER_SECOND=0, MOCK_FAILURE_RATE=0, MOCK_OUTPUT_WORDS=200):
+            llmon = LLMONAgent()
+            variations = llmon.generate_variations_parallel(self.ARTICLE, self.rules_path)
+        
+        self.assertEqual(len(variations), 3)
+        self.assertEqual(len(set(variations)), 3)
+        self.assertEqual(token_budget.get_usage_log().get_totals()['calls'], 1)
+    
+    def test_n_sampling_sends_prompt_once(self):
+        """Test that OpenAI `n` sampling returns every variation from one request."""
+        from agents import LLMONAgent
+        from api_client import AsyncAPIClient
+        requests = []
+        
+        async def fake_generate(client, prompt, temperature, max_tokens, usage=None, n=1):
+            requests.append(n)
+            return [f"Variation sample {i}. " * 30 for i in range(n)]
+        
+        with mock.patch.object(Config, 'LLMON_BATCH_MODE', 'auto'), \
+             mock.patch.object(AsyncAPIClient, '_generate_openai', new=fake_generate):
+            variations = LLMONAgent().generate_variations_parallel(self.ARTICLE, self.rules_path)
+        
+        self.assertEqual(requests, [3])
+        self.assertTrue(variations[2].startswith("Variation sample 2."))
+    
+    def test_missing_variations_are_generated_individually(self):
+        """Test the fallback when the batched response lacks a variation."""
+        from agents import LLMONAgent
+        from api_client import AsyncAPIClient
+        body = "Rewritten tide text. " * 30
+        prompts = []
+        
+        async def fake_generate(client, prompt, temperature, max_tokens, usage=None, n=1):
+            prompts.append(prompt)
+            if 'OUTPUT FORMAT' in prompt:
+                return f"=== VARIATION 1 ===\n{body}\n=== VARIATION 2 ===\n{body}"
+            return "single " + body
+        
+        with mock.patch.object(Config, 'LLMON_BATCH_MODE', 'delimited'), \
+             mock.patch.object(AsyncAPIClient, '_generate_openai', new=fake_generate):
+            variations = LLMONAgent().generate_variations_parallel(self.ARTICLE, self.rules_path)
+        
+        self.assertEqual(len(prompts), 2)
+        self.assertIn('variation #3 of 3', prompts[1])
+        self.assertEqual(variations[:2], [body.strip()] * 2)
+        self.assertTrue(variations[2].startswith('single'))
+
+
+class TestVariationStreaming(APIClientTestCase):
+    """Test delivering LLMON variations as each request completes."""
+    
+    DELAYS = {1: 0.3, 2: 0.0, 3: 0.15}
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        super().setUp()
+        self.rules_path = os.path.join(self.temp_dir, 'llmon_rules.md')
+        with open(self.rules_path, 'w', encoding='utf-8') as f:
+            f.write('Write in plain English.')
+        self.cancelled = []
+    
+    async def fake_generate(self, prompt, delays):
+        """Answer each variation prompt after its own delay, recording cancellations."""
+        number = int(prompt.split('variation #')[1].split()[0])
+        try:
+            await asyncio.sleep(delays[number])
+        except asyncio.CancelledError:
+            self.cancelled.append(number)
+            raise
+        return f"Variation {number} text"
+    
+    def test_variations_arrive_in_completion_order(self):
+        """Test that the fastest variation is delivered first, each at its own index."""
+        from agents import LLMONAgent
+        from api_client import AsyncAPIClient
+        
+        async def fake_generate(client, prompt, temperature, max_tokens, usage=None, n=1):
+            return await self.fake_generate(prompt, self.DELAYS)
+        
+        with mock.patch.object(AsyncAPIClient, '_generate_openai', new=fake_generate), \
+             mock.patch.object(Config, 'LLMON_BATCH_MODE', 'off'):
+            stream = LLMONAgent().stream_variations("# Article\n\nBody.", self.rules_path)
+            arrivals = [(index, variation, stream.pending) for index, variation in stream]
+        
+        self.assertEqual([index for index, _, _ in arrivals], [1, 2, 0])
+        self.assertEqual(arrivals[0][1], "Variation 2 text")
+        self.assertEqual(arrivals[-1][2], 0)
+    
+    def test_early_pick_cancels_in_flight_requests(self):
+        """Test that cancelling after the first arrival aborts the other provider requests."""
+        from agents import LLMONAgent
+        from api_client import AsyncAPIClient
+        
+        async def fake_generate(client, prompt, temperature, max_tokens, usage=None, n=1):
+            return await self.fake_generate(prompt, {1: 0.0, 2: 5.0, 3: 5.0})
+        
+        start = time.monotonic()
+        with mock.patch.object(AsyncAPIClient, '_generate_openai', new=fake_generate), \
+             mock.patch.object(Config, 'LLMON_BATCH_MODE', 'off'):
+            stream = LLMONAgent().stream_variations("# Article\n\nBody.", self.rules_path)
+            index, variation = next(iter(stream))
+            cancelled = stream.cancel()
+            time.sleep(0.05)
+        
+        self.assertEqual((index, variation), (0, "Variation 1 text"))
+        self.assertEqual(cancelled, 2)
+        self.assertEqual(sorted(self.cancelled), [2, 3])
+        self.assertLess(time.monotonic() - start, 2)
+
+
+class TestDifferentiationRetry(APIClientTestCase):
+    """Test regenerating too-similar variations."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        super().setUp()
+        self.rules_path = os.path.join(self.temp_dir, 'llmon_rules.md')
+        with open(self.rules_path, 'w', encoding='utf-8') as f:
+            f.write('Write in plain English.')
+    
+    def test_similar_pair_regenerated_concurrently(self):
+        """Test that both variations of a too-similar pair are regenerated together in one round."""
+        from agents import LLMONAgent
+        from api_client import AsyncAPIClient
+        from variation_differentiator import VariationDifferentiator
+        shared = "Tides rise and fall twice each day because the moon pulls the oceans toward it."
+        distinct = {
+            1: "Sailors once read the harbour walls to learn when the water would return to the quay.",
+            2: "Gravity from a nearby world stretches seas into bulges that sweep around the planet.",
+            3: "Children building castles on wet sand learn patience as the afternoon swell creeps closer."
+        }
+        prompts = []
+        active = [0, 0]  # current, peak
+        
+        async def fake_generate(client, prompt, temperature, max_tokens, usage=None, n=1):
+            number = int(prompt.split('variation #')[1].split()[0])
+            prompts.append((number, 'DISTINCTLY DIFFERENT' in prompt))
+            active[0] += 1
+            active[1] = max(active[1], active[0])
+            await asyncio.sleep(0.05)
+            active[0] -= 1
+            if 'DISTINCTLY DIFFERENT' in prompt or number == 3:
+                return distinct[number]
+            return shared
+        
+        with mock.patch.object(AsyncAPIClient, '_generate_openai', new=fake_generate), \
+             mock.patch.object(Config, 'LLMON_BATCH_MODE', 'off'):
+            llmon = LLMONAgent()
+            variations = llmon.generate_variations_parallel(
+                "# Tides\n\nBody.", self.rules_path, VariationDifferentiator(min_difference=0.3)
+            )
+        
+        self.assertEqual(variations, [distinct[1], distinct[2], distinct[3]])
+        self.assertEqual(sorted(prompts[3:]), [(1, True), (2, True)])
+        self.assertEqual(active[1], 3)
+        self.assertEqual(llmon.regeneration_stats['rounds'], 1)
+        self.assertEqual(llmon.regeneration_stats['regenerated'], [0, 1])
+        self.assertTrue(llmon.regeneration_stats['valid'])
+        self.assertLess(llmon.regeneration_stats['seconds'], 1)
+    
+    def test_overgeneration_keeps_diverse_subset(self):
+        """Test that N > K candidates are generated in one burst and the near duplicates dropped."""
+        from agents import LLMONAgent
+        from api_client import AsyncAPIClient
+        texts = {
+            1: "Tides rise and fall twice each day because the moon pulls the oceans toward it.",
+            2: "Tides rise and fall twice each day because the moon pulls the oceans toward it strongly.",
+            3: "Sailors once read the harbour walls to learn when the water would return to the quay.",
+            4: "Tides rise and fall twice a day because the moon pulls the oceans toward it.",
+            5: "Children building castles on wet sand learn patience as the afternoon swell creeps closer."
+        }
+        prompts = []
+        
+        async def fake_generate(client, prompt, temperature, max_tokens, usage=None, n=1):
+            number = int(prompt.split('variation #')[1].split()[0])
+            prompts.append(number)
+            return texts[number]
+        
+        with mock.patch.object(AsyncAPIClient, '_generate_openai', new=fake_generate), \
+             mock.patch.multiple(Config, LLMON_BATCH_MODE='off', LLMON_OVERGENERATE_COUNT=5):
+            llmon = LLMONAgent()
+            variations = llmon.generate_variations_parallel("# Tides\n\nBody.", self.rules_path)
+        
+        self.assertEqual(sorted(prompts), [1, 2, 3, 4, 5])
+        self.assertEqual(len(variations), 3)
+        self.assertIn(texts[3], variations)
+        self.assertIn(texts[5], variations)
+        self.assertEqual(llmon.selection_stats['candidates'], 5)
+    
+    def test_retry_after_overgeneration_keeps_selected_emphasis(self):
+        """Test that a differentiation retry regenerates each kept variation with its candidate's emphasis."""
+        from agents import LLMONAgent
+        from api_client import AsyncAPIClient
+        from variation_differentiator import VariationDifferentiator
+        shared = "Tides rise and fall twice each day because the moon pulls the oceans toward it."
+        distinct = {
+            2: "Sailors once read the harbour walls to learn when the water would return to the quay.",
+            4: "Gravity from a nearby world stretches seas into bulges that sweep around the planet."
+        }
+        prompts = []
+        
+        async def fake_generate(client, prompt, temperature, max_tokens, usage=None, n=1):
+            prompts.append(prompt)
+            return distinct[int(prompt.split('variation #')[1].split()[0])]
+        
+        with mock.patch.object(AsyncAPIClient, '_generate_openai', new=fake_generate), \
+             mock.patch.multiple(Config, LLMON_BATCH_MODE='off', LLMON_OVERGENERATE_COUNT=5):
+            llmon = LLMONAgent()
+            variations = [shared, shared, "Children building castles on wet sand learn patience."]
+            regenerated = llmon.ensure_differentiation(
+                "# Tides\n\nBody.", "Write in plain English.", variations,
+                VariationDifferentiator(min_difference=0.3), variation_nums=[2, 4, 5]
+            )
+        
+        self.assertEqual(regenerated, [0, 1])
+        self.assertEqual(variations[:2], [distinct[2], distinct[4]])
+        self.assertEqual(sorted(p.split('variation #')[1].split('.')[0] for p in prompts), ['2 of 5', '4 of 5'])
+        self.assertTrue(all(llmon._get_variation_emphasis(int(p.split('variation #')[1].split()[0])) in p for p in prompts))
+
+
+class TestLLMScheduler(APIClientTestCase):
+    """Test the shared global in-flight cap and priority classes."""
+    
+    def test_priority_admission_and_interactive_reserve(self):
+        """Test that waiters are admitted by class and only interactive calls use the reserve."""
+        from api_client import run_sync
+        from llm_scheduler import LLMScheduler, INTERACTIVE, STANDARD, BACKGROUND
+        scheduler = LLMScheduler(max_in_flight=2, interactive_reserve=1)
+        admitted = []
+        
+        async def scenario():
+            release_first = asyncio.Event()
+            
+            async def call(name, priority, until=None):
+                async with scheduler.slot(priority):
+                    admitted.append(name)
+                    if until:
+                        await until.wait()
+            
+            first = asyncio.ensure_future(call('background-1', BACKGROUND, release_first))
+            await asyncio.sleep(0)
+            waiting = [asyncio.ensure_future(call('background-2', BACKGROUND)),
+                       asyncio.ensure_future(call('standard', STANDARD))]
+            await asyncio.sleep(0)
+            # The reserved slot is free, but only for interactive calls
+            self.assertEqual(admitted, ['background-1'])
+            await call('interactive', INTERACTIVE)
+            release_first.set()
+            await asyncio.gather(first, *waiting)
+        
+        run_sync(scenario())
+        
+        self.assertEqual(admitted, ['background-1', 'interactive', 'standard', 'background-2'])
+        stats = scheduler.get_stats()
+        self.assertEqual(stats['in_flight'], 0)
+        self.assertEqual(stats['queued'], {'interactive': 0, 'standard': 1, 'background': 1})
+    
+    def test_cap_applies_across_clients(self):
+        """Test that concurrent calls from separate clients share one in-flight limit."""
+        from api_client import AsyncAPIClient, run_sync
+        from llm_scheduler import get_scheduler
+        
+        async def burst():
+            clients = [AsyncAPIClient(), AsyncAPIClient()]
+            await asyncio.gather(*[
+                clients[i % 2].generate_content(f"Prompt {i}", 0.5, use_cache=False) for i in range(6)
+            ])
+        
+        with mock.patch.multiple(Config, AI_PROVIDER='mock', SCHEDULER_MAX_IN_FLIGHT=2,
+                                 SCHEDULER_INTERACTIVE_RESERVE=0, MOCK_LATENCY_DISTRIBUTION='fixed',
+                                 MOCK_LATENCY_SECONDS=0.05, MOCK_TOKENS_PER_SECOND=0, MOCK_FAILURE_RATE=0):
+            run_sync(burst())
+            stats = get_scheduler().get_stats()
+        
+        self.assertEqual(stats['peak_in_flight'], 2)
+        self.assertEqual(stats['admitted']['standard'], 6)
+        self.assertEqual(stats['queued']['standard'], 4)
+    
+    def test_map_keeps_order_and_priority(self):
+        """Test that pooled work returns in input order and runs at the requested priority."""
+        from llm_scheduler import LLMScheduler, BACKGROUND, INTERACTIVE, STANDARD, priority_for, priority_scope
+        scheduler = LLMScheduler(max_workers=4)
+        
+        def work(i):
+            time.sleep(0.01 * (4 - i))
+            return i, priority_for('draft')
+        
+        results = scheduler.map(work, [(i,) for i in range(4)], priority=BACKGROUND)
+        
+        self.assertEqual(results, [(i, BACKGROUND) for i in range(4)])
+        self.assertEqual(priority_for('revision'), INTERACTIVE)
+        self.assertEqual(priority_for('draft'), STANDARD)
+        with priority_scope(BACKGROUND):
+            self.assertEqual(priority_for('revision'), BACKGROUND)
+            self.assertEqual(scheduler.submit(priority_for).result(), BACKGROUND)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,9 +4,13 @@ import os
 import json
 import tempfile
 import shutil
+import random
 from quality_analyzer import QualityAnalyzer
 from workflow_memory import WorkflowMemory
 from variation_differentiator import VariationDifferentiator
+from near_duplicate_index import MinHashIndex
+from originality_index import OriginalityIndex
+import numpy as np
 
 
 class TestQualityAnalyzer(unittest.TestCase):
@@ -297,7 +301,228 @@ adopting machine learning to improve efficiency and make better decisions."""
         # Should suggest regenerating one of the similar variations
         if suggestion is not None:
             self.assertIn(suggestion, [0, 1, 2])
+    
+    def test_similarity_matrix_matches_pairwise_and_is_cached(self):
+        """Test that one fit agrees with pairwise scores on identical and disjoint texts, and is reused."""
+        variations = [self.variation1, self.variation1, "Completely unrelated gardening tomatoes compost soil."]
+        
+        matrix = self.differentiator.similarity_matrix(variations)
+        
+        self.assertAlmostEqual(matrix[0, 1], 1.0)
+        self.assertAlmostEqual(matrix[0, 2], self.differentiator.calculate_similarity(variations[0], variations[2]))
+        self.assertEqual(matrix[0, 2], 0.0)
+        self.assertIs(self.differentiator.similarity_matrix(list(variations)), matrix)
+        self.assertEqual(self.differentiator.validate_variations(variations)['pairs_computed'], 0)
+        self.assertEqual(self.differentiator.identify_least_different_pair(variations)[:2], (0, 1))
+        self.assertEqual(self.differentiator.suggest_regeneration(variations), 0)
+    
+    def test_select_diverse_subset(self):
+        """Test max-min selection drops a near duplicate, and quality weighting picks the better twin."""
+        candidates = [self.variation1, self.similar_variation, self.variation2, self.variation3]
+        
+        selected = self.differentiator.select_diverse_subset(candidates, 3)
+        
+        self.assertEqual(len(selected), 3)
+        self.assertIn(2, selected)
+        self.assertIn(3, selected)
+        self.assertEqual(len({0, 1} & set(selected)), 1)
+        
+        weighted = self.differentiator.select_diverse_subset(candidates, 3, [40, 90, 70, 70], quality_weight=0.5)
+        self.assertEqual(weighted, [1, 2, 3])
+        self.assertEqual(self.differentiator.select_diverse_subset(candidates[:2], 3), [0, 1])
+    
+    def test_session_replace_updates_one_row(self):
+        """Test that a session replace rescores only row i and leaves other vectors untouched."""
+        session = self.differentiator.session([self.variation1, self.similar_variation, self.variation3])
+        first = session.validate()
+        before = session.vectors[2].toarray()
+        full = self.differentiator.validate_variations(session.variations)
+        
+        self.assertTrue(np.allclose(first['similarity_matrix'], full['similarity_matrix']))
+        self.assertFalse(first['valid'])
+        self.assertEqual(first['pairs_computed'], 3)
+        self.assertEqual(session.suggest_regeneration(), 0)
+        
+        untouched = first['similarity_matrix'][0][2]
+        session.replace(1, self.variation2)
+        updated = session.validate()
+        
+        self.assertEqual(updated['pairs_computed'], 2)
+        self.assertEqual(updated['similarity_matrix'][0][2], untouched)
+        self.assertEqual(updated['similarity_matrix'][1][0], updated['similarity_matrix'][0][1])
+        self.assertLess(updated['similarity_matrix'][0][1], first['similarity_matrix'][0][1])
+        self.assertTrue((session.vectors[2].toarray() == before).all())
+        self.assertEqual(session.variations[1], self.variation2)
+
+
+class TestNearDuplicateIndex(unittest.TestCase):
+    """Test MinHashIndex functionality."""
+    
+    def setUp(self):
+        """Set up test fixtures."""
+        self.index = MinHashIndex(num_perm=128, bands=32, shingle_size=3, threshold=0.5)
+        topics = ['gardening', 'finance', 'travel', 'cooking', 'astronomy', 'football']
+        vocabulary = [f"word{i}" for i in range(500)]
+        self.articles = {}
+        for seed, topic in enumerate(topics):
+            rng = random.Random(seed)
+            self.articles[topic] = ' '.join(rng.choice(vocabulary) for _ in range(300))
+        for topic, article in self.articles.items():
+            self.index.add(topic, article)
+    
+    def test_query_finds_edited_copy_only(self):
+        """Test that an edited copy matches its source and scores only bucket candidates."""
+        words = self.articles['travel'].split()
+        words[150] = 'edited'
+        edited = ' '.join(words)
+        
+        matches = self.index.query(edited)
+        
+        self.assertEqual([key for key, _ in matches], ['travel'])
+        self.assertGreater(matches[0][1], 0.8)
+        self.assertLess(self.index.last_candidates, len(self.index))
+        self.assertEqual(self.index.query(edited, exclude='travel'), [])
+    
+    def test_replace_key_and_pairs(self):
+        """Test that re-adding a key replaces its buckets and near_duplicate_pairs finds copies."""
+        self.index.add('copy', self.articles['finance'] + ' one more closing sentence')
+        self.assertEqual([pair[:2] for pair in self.index.near_duplicate_pairs()], [('finance', 'copy')])
+        
+        self.index.add('copy', self.articles['cooking'])
+        self.assertEqual(len(self.index), 7)
+        self.assertEqual([pair[:2] for pair in self.index.near_duplicate_pairs()], [('cooking', 'copy')])
+    
+    def test_save_and_load(self):
+        """Test that a saved index answers the same queries after loading."""
+        temp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(temp_dir, 'index.npz')
+            self.index.save(path)
+            loaded = MinHashIndex.load(path)
+            
+            self.assertEqual(loaded.keys, self.index.keys)
+            self.assertEqual(loaded.query(self.articles['football']), self.index.query(self.articles['football']))
+            loaded.add('new', 'A brand new article about something else entirely.')
+            self.assertIn('new', loaded)
+        finally:
+            shutil.rmtree(temp_dir)
+    
+    def test_bands_must_divide_permutations(self):
+        """Test that an invalid band count is rejected."""
+        with self.assertRaises(ValueError):
+            MinHashIndex(num_perm=128, bands=30)
+    
+    def test_differentiator_find_near_duplicates(self):
+        """Test near-duplicate pairs in a variation pool through the differentiator."""
+        pool = list(self.articles.values()) + [self.articles['astronomy'] + ' Extra closing line.']
+        
+        pairs = VariationDifferentiator().find_near_duplicates(pool)
+        
+        self.assertEqual([pair[:2] for pair in pairs], [(4, 6)])
 
+class TestOriginalityIndex(unittest.TestCase):
+    """Test OriginalityIndex functionality."""
+    
+    def setUp(self):
+        """Set up a temporary outputs directory with two sessions."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.outputs_dir = os.path.join(self.temp_dir, 'outputs')
+        self.index_dir = os.path.join(self.outputs_dir, '.originality_index')
+        vocabulary = [f"word{i}" for i in range(2000)]
+        self.texts = {}
+        for seed, name in enumerate(['s1/FINAL_ARTICLE.md', 's1/02_llmon_variation1_iter0.md',
+                                     's1/01_writer_draft.md', 's2/FINAL_ARTICLE.md']):
+            rng = random.Random(seed)
+            self.texts[name] = ' '.join(rng.choice(vocabulary) for _ in range(400))
+            self._write(name, self.texts[name])
+    
+    def tearDown(self):
+        """Clean up."""
+        shutil.rmtree(self.temp_dir)
+    
+    def _write(self, name, text):
+        """Write an output file."""
+        path = os.path.join(self.outputs_dir, *name.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+    
+    def _open(self, merge_threshold=500):
+        """Open the index from disk."""
+        return OriginalityIndex(self.index_dir, self.outputs_dir, merge_threshold=merge_threshold)
+    
+    def test_sync_and_originality(self):
+        """Test that finals and variations are indexed and scored, and a session can exclude itself."""
+        index = self._open()
+        
+        self.assertEqual(index.sync(), (3, 0))
+        self.assertNotIn('s1/01_writer_draft.md', index)
+        
+        copy = self.texts['s1/FINAL_ARTICLE.md'] + ' with one new closing sentence'
+        result = index.originality(copy)
+        self.assertEqual(result['closest'], 's1/FINAL_ARTICLE.md')
+        self.assertLess(result['score'], 10)
+        self.assertEqual(index.originality(copy, exclude_prefix='s1/')['score'], 100.0)
+        self.assertEqual(index.originality(self.texts['s1/01_writer_draft.md'])['closest'], None)
+    
+    def test_incremental_sync_and_memory_mapped_reload(self):
+        """Test that reloads are memory-mapped and only changed files are re-indexed."""
+        index = self._open(merge_threshold=2)
+        index.sync()
+        index.save()
+        
+        reloaded = self._open(merge_threshold=2)
+        self.assertIsInstance(reloaded.signatures, np.memmap)
+        self.assertEqual(reloaded.sync(), (0, 0))
+        self.assertEqual(len(reloaded), 3)
+        
+        self._write('s2/FINAL_ARTICLE.md', self.texts['s1/01_writer_draft.md'])
+        os.remove(os.path.join(self.outputs_dir, 's1', '02_llmon_variation1_iter0.md'))
+        self.assertEqual(reloaded.sync(), (1, 1))
+        reloaded.save()
+        
+        final = self._open(merge_threshold=2)
+        self.assertEqual(final.sync(), (0, 0))
+        self.assertEqual(len(final), 2)
+        self.assertEqual(final.originality(self.texts['s1/01_writer_draft.md'])['closest'], 's2/FINAL_ARTICLE.md')
+        self.assertEqual(final.originality(self.texts['s1/02_llmon_variation1_iter0.md'])['closest'], None)
+    
+    def test_sync_indexes_nested_batch_outputs(self):
+        """Test that batch runs (outputs/batch_<ts>/<NNN_name>/) are indexed and can exclude their own folder."""
+        self._write('batch_1/001_tides/FINAL_ARTICLE.md', self.texts['s2/FINAL_ARTICLE.md'])
+        self._write('batch_1/001_tides/02_llmon_variation1.md', self.texts['s1/02_llmon_variation1_iter0.md'])
+        self._write('batch_1/001_tides/01_writer_draft.md', self.texts['s1/01_writer_draft.md'])
+        index = self._open()
+        
+        self.assertEqual(index.sync(), (5, 0))
+        self.assertIn('batch_1/001_tides/FINAL_ARTICLE.md', index)
+        self.assertIn('batch_1/001_tides/02_llmon_variation1.md', index)
+        self.assertNotIn('batch_1/001_tides/01_writer_draft.md', index)
+        
+        draft = self.texts['s1/01_writer_draft.md']
+        self.assertEqual(index.originality(draft)['closest'], None)
+        closest = index.originality(self.texts['s2/FINAL_ARTICLE.md'], exclude_prefix='s2/')['closest']
+        self.assertEqual(closest, 'batch_1/001_tides/FINAL_ARTICLE.md')
+        
+        shutil.rmtree(os.path.join(self.outputs_dir, 'batch_1'))
+        self.assertEqual(index.sync(), (0, 2))
+    
+    def test_merge_keeps_results_and_drops_old_segment(self):
+        """Test that merging pending articles into a new segment answers queries the same way."""
+        index = self._open()
+        index.sync()
+        index.save()
+        before = index.query(self.texts['s2/FINAL_ARTICLE.md'])
+        self.assertEqual(index.get_stats()['pending'], 3)
+        
+        index.merge()
+        index.add('s3/FINAL_ARTICLE.md', 'A short unrelated final article.')
+        index.merge()
+        
+        self.assertEqual(index.query(self.texts['s2/FINAL_ARTICLE.md']), before)
+        self.assertEqual(index.get_stats()['main'], 4)
+        self.assertEqual(sorted(name for name in os.listdir(self.index_dir) if name.endswith('.npy')),
+                         ['band_keys-2.npy', 'band_rows-2.npy', 'signatures-2.npy'])
 
 class TestIntegration(unittest.TestCase):
     """Integration tests for combined functionality."""
@@ -348,6 +573,8 @@ def run_tests():
     suite.addTests(loader.loadTestsFromTestCase(TestQualityAnalyzer))
     suite.addTests(loader.loadTestsFromTestCase(TestWorkflowMemory))
     suite.addTests(loader.loadTestsFromTestCase(TestVariationDifferentiator))
+    suite.addTests(loader.loadTestsFromTestCase(TestNearDuplicateIndex))
+    suite.addTests(loader.loadTestsFromTestCase(TestOriginalityIndex))
     suite.addTests(loader.loadTestsFromTestCase(TestIntegration))
     
     # Run tests
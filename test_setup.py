@@ -1,5 +1,6 @@
 """Test script to verify AI-Content-Studio setup."""
 import os
+import re
 import sys
 from colorama import Fore, Style, init
 
@@ -49,12 +50,18 @@ def test_dependencies():
 
 def test_env_file():
     """Test .env file existence and content."""
+    if os.getenv('AI_PROVIDER', '').lower() == 'mock':
+        return True, "Offline mock provider selected (no API key needed)"
+    
     if not os.path.exists('.env'):
         return False, ".env file not found. Run: python setup_env.py"
     
     with open('.env', 'r') as f:
         content = f.read()
     
+    if re.search(r'^AI_PROVIDER\s*=\s*mock\s*$', content, re.IGNORECASE | re.MULTILINE):
+        return True, "Offline mock provider selected (no API key needed)"
+    
     if 'GEMINI_API_KEY' not in content:
         return False, "GEMINI_API_KEY not found in .env"
     
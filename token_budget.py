@@ -0,0 +1,198 @@
+"""Token Budget - Local token estimates, per-task output budgets and a per-call usage log."""
+import os
+import re
+import json
+import threading
+from datetime import datetime
+from config import Config
+
+# Hard ceiling supported by every configured model
+MAX_OUTPUT_TOKENS = 16384
+
+# Rough English averages; good enough for budgeting and rate limiting
+CHARS_PER_TOKEN = 4
+TOKENS_PER_WORD = 1.35
+
+# Models that spend part of the output budget on hidden reasoning tokens
+REASONING_MODEL_PREFIXES = ('gpt-5', 'o1', 'o3', 'o4', 'gemini-2.5')
+
+# Output size relative to the task's expected length
+TASK_HEADROOM = {
+    'outline': 1.0,
+    'draft': 1.5,
+    'tool_review_draft': 1.5,
+    'revision': 2.0,
+    'variation': 1.75,
+    'variation_batch': 1.75,
+    'edit_pass': 1.5
+}
+
+WORD_RANGE_PATTERN = re.compile(r'(\d[\d,]*)\s*(?:-|–|to)\s*(\d[\d,]*)\s*words', re.IGNORECASE)
+
+
+def estimate_tokens(text):
+    """
+    Estimate the token count of a text without a tokenizer.
+    
+    Args:
+        text: Text to measure
+    
+    Returns:
+        Approximate number of tokens
+    """
+    if not text:
+        return 0
+    return max(len(text) // CHARS_PER_TOKEN, int(len(text.split()) * TOKENS_PER_WORD))
+
+
+def is_reasoning_model(model):
+    """Check whether a model spends output tokens on hidden reasoning."""
+    return bool(model) and model.startswith(REASONING_MODEL_PREFIXES)
+
+
+def _requested_words(text):
+    """Largest "N-M words" upper bound mentioned in a brief, or 0."""
+    if not text:
+        return 0
+    bounds = [int(upper.replace(',', '')) for _, upper in WORD_RANGE_PATTERN.findall(text)]
+    return max(bounds, default=0)
+
+
+def output_budget(task, source_text=None, model=None):
+    """
+    Get max output tokens for a task.
+    
+    Args:
+        task: 'outline', 'draft', 'tool_review_draft', 'revision', 'variation',
+              'variation_batch' (every LLMON variation in one response),
+              'edit_pass', or None for the full MAX_OUTPUT_TOKENS
+        source_text: Article being rewritten, or the brief for drafts
+                     (scanned for "N-M words" targets)
+        model: Model name (reasoning models get extra headroom)
+    
+    Returns:
+        Token budget between Config.MIN_OUTPUT_TOKENS and MAX_OUTPUT_TOKENS
+    """
+    if task not in TASK_HEADROOM:
+        return MAX_OUTPUT_TOKENS
+    
+    if task == 'outline':
+        expected = Config.OUTLINE_OUTPUT_TOKENS
+    elif task in ('draft', 'tool_review_draft'):
+        target_words = Config.TOOL_REVIEW_TARGET_WORDS if task == 'tool_review_draft' else Config.ARTICLE_TARGET_WORDS
+        expected = max(target_words[1], _requested_words(source_text)) * TOKENS_PER_WORD
+    elif task == 'variation_batch':
+        expected = estimate_tokens(source_text) * Config.LLMON_VERSIONS_COUNT
+    else:
+        # Rewrites come back roughly the size of the article they transform
+        expected = estimate_tokens(source_text)
+    
+    budget = int(expected * TASK_HEADROOM[task])
+    if is_reasoning_model(model):
+        budget += Config.REASONING_TOKEN_RESERVE
+    
+    return max(Config.MIN_OUTPUT_TOKENS, min(MAX_OUTPUT_TOKENS, budget))
+
+
+class UsageLog:
+    """Appends one JSON line per API call and keeps running token totals."""
+    
+    def __init__(self, log_path):
+        """
+        Initialize usage log.
+        
+        Args:
+            log_path: Path of the JSONL file to append to
+        """
+        self.log_path = log_path
+        self._lock = threading.Lock()
+        self.totals = {
+            'calls': 0,
+            'cache_hits': 0,
+            'coalesced': 0,
+            'prompt_tokens': 0,
+            'cached_tokens': 0,
+            'completion_tokens': 0,
+            'reasoning_tokens': 0,
+            'truncated': 0
+        }
+        self.by_task = {}  # task -> {'calls', 'prompt_tokens', 'cached_tokens'}
+    
+    def record(self, entry):
+        """
+        Record a single call.
+        
+        Args:
+            entry: Dictionary describing the call (provider, model, task,
+                   max_tokens, prompt/completion token counts, latency, ...)
+        """
+        entry = {'timestamp': datetime.now().isoformat(timespec='seconds'), **entry}
+        
+        with self._lock:
+            self.totals['calls'] += 1
+            if entry.get('cache_hit'):
+                self.totals['cache_hits'] += 1
+            if entry.get('coalesced'):
+                self.totals['coalesced'] += 1
+            if entry.get('truncated'):
+                self.totals['truncated'] += 1
+            for field in ('prompt_tokens', 'cached_tokens', 'completion_tokens', 'reasoning_tokens'):
+                self.totals[field] += entry.get(field) or 0
+            
+            if not (entry.get('cache_hit') or entry.get('coalesced')):
+                task = self.by_task.setdefault(
+                    entry.get('task') or 'other', {'calls': 0, 'prompt_tokens': 0, 'cached_tokens': 0}
+                )
+                task['calls'] += 1
+                task['prompt_tokens'] += entry.get('prompt_tokens') or 0
+                task['cached_tokens'] += entry.get('cached_tokens') or 0
+            
+            try:
+                directory = os.path.dirname(self.log_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(self.log_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(entry) + '\n')
+            except OSError:
+                # Logging must never break generation
+                pass
+    
+    def get_totals(self):
+        """
+        Get token totals for this process.
+        
+        Returns:
+            Dictionary with call, cache hit, coalesced, token and truncation counts
+        """
+        with self._lock:
+            return dict(self.totals)
+    
+    def get_prompt_cache_stats(self):
+        """
+        Get provider prompt-cache hit rates per task.
+        
+        Returns:
+            Dictionary of task -> calls, prompt_tokens, cached_tokens, cached_rate
+        """
+        with self._lock:
+            return {
+                task: {
+                    **counts,
+                    'cached_rate': counts['cached_tokens'] / counts['prompt_tokens'] if counts['prompt_tokens'] else 0.0
+                }
+                for task, counts in self.by_task.items()
+            }
+
+
+_usage_log = None
+_usage_log_lock = threading.Lock()
+
+
+def get_usage_log():
+    """Get the process-wide usage log configured from Config."""
+    global _usage_log
+    
+    with _usage_log_lock:
+        if _usage_log is None:
+            _usage_log = UsageLog(Config.API_CALL_LOG_PATH)
+        return _usage_log
@@ -1,5 +1,6 @@
 """Utility functions for the AI-Content-Studio Workflow."""
 import os
+import sys
 from datetime import datetime
 from colorama import Fore, Style, init
 
@@ -54,6 +55,14 @@ def print_info(text):
     """Print info message."""
     print(f"{Fore.BLUE}[INFO] {text}{Style.RESET_ALL}")
 
+def print_stream_chunk(chunk):
+    """Render a streamed text chunk as it arrives (None ends the stream)."""
+    if chunk is None:
+        print("\n")
+        return
+    sys.stdout.write(chunk)
+    sys.stdout.flush()
+
 def get_user_choice(prompt, options):
     """Get user choice from options."""
     print(f"\n{Fore.CYAN}{prompt}{Style.RESET_ALL}")
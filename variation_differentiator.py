@@ -1,6 +1,5 @@
 """Variation Differentiator - Ensures LLMON variations are sufficiently distinct."""
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer
 import numpy as np
 
 
@@ -16,6 +15,10 @@ class VariationDifferentiator:
         """
         self.min_difference = min_difference
     
+        # Similarity matrix of the last list of variations seen
+        self._cache_key = None
+        self._cache_matrix = None
+    
     def calculate_similarity(self, text1, text2):
         """
         Calculate similarity between two texts.
@@ -27,33 +30,7 @@ class VariationDifferentiator:
         Returns:
             Similarity score (0 = completely different, 1 = identical)
         """
-        try:
-            # Use TF-IDF vectorization
-            vectorizer = TfidfVectorizer(
-                max_features=1000,
-                stop_words='english',
-                ngram_range=(1, 2)
-            )
-            
-            # Fit and transform both texts
-            tfidf_matrix = vectorizer.fit_transform([text1, text2])
-            
-            # Calculate cosine similarity
-            similarity = cosine_similarity(tfidf_matrix[0:1], tfidf_matrix[1:2])[0][0]
-            
-            return float(similarity)
-        except Exception as e:
-            # Fallback: simple word overlap
-            words1 = set(text1.lower().split())
-            words2 = set(text2.lower().split())
-            
-            if not words1 or not words2:
-                return 0.0
-            
-            overlap = len(words1 & words2)
-            total = len(words1 | words2)
-            
-            return overlap / total if total > 0 else 0.0
+        return float(self._compute_matrix([text1, text2])[0, 1])
     
     def calculate_difference(self, text1, text2):
         """
@@ -87,38 +64,41 @@ class VariationDifferentiator:
                 'min_difference': 1.0,
                 'avg_difference': 1.0,
                 'similarity_matrix': [],
-                'pairs_below_threshold': []
+                'pairs_below_threshold': [],
+                'pairs_computed': 0
             }
         
-        # Calculate pairwise similarities
-        similarities = []
-        pairs_below_threshold = []
-        
-        for i in range(n):
-            row = []
-            for j in range(n):
-                if i == j:
-                    row.append(1.0)  # Same text = 100% similar
-                elif i < j:
-                    sim = self.calculate_similarity(variations[i], variations[j])
-                    row.append(sim)
-                    similarities.append(sim)
-                    
-                    # Check if difference is below threshold
-                    difference = 1.0 - sim
-                    if difference < self.min_difference:
-                        pairs_below_threshold.append({
-                            'pair': (i + 1, j + 1),  # 1-indexed for display
-                            'similarity': round(sim, 3),
-                            'difference': round(difference, 3)
-                        })
-                else:
-                    # Use already calculated value (matrix is symmetric)
-                    row.append(similarities[self._get_similarity_index(j, i, n)])
+        pairs_computed = 0 if self._cached(variations) is not None else n * (n - 1) // 2
+        matrix = self.similarity_matrix(variations)
+        
+        return self._summarize(matrix, pairs_computed)
+    
+    def _summarize(self, matrix, pairs_computed):
+        """
+        Validation result for a similarity matrix.
+        
+        Args:
+            matrix: n x n numpy similarity matrix (n >= 2)
+            pairs_computed: Pairs scored to build it (reported as-is)
+        
+        Returns:
+            Dictionary as returned by validate_variations()
+        """
+        # Upper triangle in row-major order: (1, 2), (1, 3), ..., (2, 3), ...
+        rows, cols = np.triu_indices(len(matrix), k=1)
+        similarities = matrix[rows, cols]
+        pairs_below_threshold = [
+            {
+                'pair': (int(rows[p]) + 1, int(cols[p]) + 1),  # 1-indexed for display
+                'similarity': round(float(similarities[p]), 3),
+                'difference': round(float(1.0 - similarities[p]), 3)
+            }
+            for p in np.nonzero(1.0 - similarities < self.min_difference)[0]
+        ]
             
         # Calculate statistics
-        min_similarity = min(similarities) if similarities else 0.0
-        avg_similarity = np.mean(similarities) if similarities else 0.0
+        min_similarity = float(similarities.min())
+        avg_similarity = float(similarities.mean())
         
         max_difference = 1.0 - min_similarity
         avg_difference = 1.0 - avg_similarity
@@ -131,14 +111,120 @@ class VariationDifferentiator:
             'avg_difference': round(avg_difference, 3),
             'min_similarity': round(min_similarity, 3),
             'avg_similarity': round(avg_similarity, 3),
+            'similarity_matrix': matrix.tolist(),
             'pairs_below_threshold': pairs_below_threshold,
+            'pairs_computed': pairs_computed,
             'threshold': self.min_difference
         }
     
-    def _get_similarity_index(self, i, j, n):
-        """Get index in flattened similarity list for pair (i, j) where i < j."""
-        # Convert 2D coordinates to 1D index
-        return int(i * n - (i * (i + 1)) / 2 + j - i - 1)
+    def session(self, variations):
+        """
+        Start a stateful session over a set of variations (see DifferentiatorSession).
+        
+        Args:
+            variations: List of variation texts
+        
+        Returns:
+            DifferentiatorSession
+        """
+        return DifferentiatorSession(self, variations)
+    
+    def similarity_matrix(self, variations):
+        """
+        Full pairwise similarity matrix, cached for the last list of variations.
+        
+        Validation, reports, suggestions and subset selection on the same
+        variations share one TF-IDF weighting and one sparse product.
+        
+        Args:
+            variations: List of variation texts
+        
+        Returns:
+            Read-only n x n numpy array (1.0 on the diagonal)
+        """
+        matrix = self._cached(variations)
+        if matrix is None:
+            matrix = self._compute_matrix(list(variations))
+            self._remember(variations, matrix)
+        return matrix
+        
+    def _cached(self, variations):
+        """Cached matrix for exactly these variations, or None."""
+        if self._cache_key is not None and self._cache_key == tuple(variations):
+            return self._cache_matrix
+        return None
+        
+    def _remember(self, variations, matrix):
+        """Cache a matrix for these variations."""
+        matrix.flags.writeable = False
+        self._cache_key = tuple(variations)
+        self._cache_matrix = matrix
+    
+    def _vectorize(self, texts):
+        """Hashed TF-IDF vectors (the same features as DifferentiatorSession); rows are L2-normalized."""
+        return TfidfTransformer().fit_transform(_hashing_vectorizer().transform(texts))
+    
+    def _compute_matrix(self, texts):
+        """
+        Cosine similarity of every pair of texts from one IDF weighting.
+        
+        Rows are unit length, so the sparse product X @ X.T holds every
+        cosine at once.
+        """
+        tfidf = self._vectorize(texts)
+        matrix = (tfidf @ tfidf.T).toarray()
+        np.clip(matrix, 0.0, 1.0, out=matrix)
+        np.fill_diagonal(matrix, 1.0)  # Same text = 100% similar
+        return matrix
+    
+    def select_diverse_subset(self, variations, k, quality_scores=None, quality_weight=0.0):
+        """
+        Pick the k variations that are most different from one another.
+        
+        Greedy max-min diversity: seed with the most different pair, then
+        repeatedly add the candidate whose smallest difference to those
+        already picked is largest. With quality scores, each step maximizes
+        (1 - quality_weight) * difference + quality_weight * quality / 100.
+        
+        Args:
+            variations: Candidate variation texts
+            k: Number of variations to keep
+            quality_scores: Optional overall quality score (0-100) per candidate
+            quality_weight: Share of the objective given to quality (0-1)
+        
+        Returns:
+            Sorted indices of the selected candidates
+        """
+        n = len(variations)
+        if k >= n:
+            return list(range(n))
+        if k <= 0:
+            return []
+        
+        weight = min(max(quality_weight, 0.0), 1.0) if quality_scores else 0.0
+        quality = np.array(quality_scores, dtype=float) / 100 if weight else np.zeros(n)
+        
+        if k == 1:
+            return [int(np.argmax(quality))]
+        
+        difference = 1.0 - self.similarity_matrix(variations)
+        
+        # Seed with the best pair (argmax takes the first in row-major order, so i < j)
+        pair_value = (1 - weight) * difference + weight * (quality[:, None] + quality[None, :]) / 2
+        np.fill_diagonal(pair_value, -np.inf)
+        first, second = np.unravel_index(np.argmax(pair_value), pair_value.shape)
+        selected = [int(first), int(second)]
+        
+        # Smallest difference from each candidate to the ones picked so far
+        nearest = np.minimum(difference[first], difference[second])
+        while len(selected) < k:
+            value = (1 - weight) * nearest + weight * quality
+            value[selected] = -np.inf
+            chosen = int(np.argmax(value))
+            selected.append(chosen)
+            nearest = np.minimum(nearest, difference[chosen])
+        
+        return sorted(selected)
     
     def get_differentiation_report(self, variations):
         """
@@ -186,17 +272,34 @@ class VariationDifferentiator:
         if len(variations) < 2:
             return None
         
-        max_similarity = -1
-        most_similar_pair = (0, 1)
+        matrix = self.similarity_matrix(variations)
+        rows, cols = np.triu_indices(len(variations), k=1)
+        most_similar = int(np.argmax(matrix[rows, cols]))
+        
+        return (int(rows[most_similar]), int(cols[most_similar]), float(matrix[rows[most_similar], cols[most_similar]]))
+    
+    def find_near_duplicates(self, variations, threshold=None):
+        """
+        Find near-duplicate pairs in a large pool of variations.
+        
+        Uses a MinHash/LSH index (shingle Jaccard estimates) instead of the
+        full similarity matrix, so only pairs sharing an LSH bucket are scored.
+        Use it for pools of hundreds or thousands of texts.
+        
+        Args:
+            variations: List of variation texts
+            threshold: Minimum estimated Jaccard similarity (default: Config.NEAR_DUPLICATE_THRESHOLD)
         
-        for i in range(len(variations)):
-            for j in range(i + 1, len(variations)):
-                sim = self.calculate_similarity(variations[i], variations[j])
-                if sim > max_similarity:
-                    max_similarity = sim
-                    most_similar_pair = (i, j)
+        Returns:
+            List of (index1, index2, estimated_similarity), 0-based, most similar first
+        """
+        from near_duplicate_index import create_index
+        index = create_index()
+        for i, variation in enumerate(variations):
+            index.add(str(i), variation)
         
-        return (most_similar_pair[0], most_similar_pair[1], max_similarity)
+        return [(int(first), int(second), similarity)
+                for first, second, similarity in index.near_duplicate_pairs(threshold)]
     
     def suggest_regeneration(self, variations):
         """
@@ -208,13 +311,15 @@ class VariationDifferentiator:
         Returns:
             Index of variation to regenerate (or None if all are good)
         """
-        validation = self.validate_variations(variations)
+        return self._suggest_from(self.validate_variations(variations), len(variations))
         
+    def _suggest_from(self, validation, n):
+        """Index involved in the most below-threshold pairs, or None if valid."""
         if validation['valid']:
             return None
         
         # Count how many problematic pairs each variation is involved in
-        involvement_count = [0] * len(variations)
+        involvement_count = [0] * n
         
         for pair_info in validation['pairs_below_threshold']:
             idx1, idx2 = pair_info['pair']
@@ -228,3 +333,84 @@ class VariationDifferentiator:
         
         return None
 
+
+class DifferentiatorSession:
+    """
+    Similarity state for one set of variations that changes one document at a time.
+    
+    Documents are hashed into the same fixed feature space that
+    validate_variations() uses (no vocabulary to refit) and weighted by IDF
+    frozen from the documents the session started with, so existing vectors
+    stay valid when a document is replaced. The starting matrix equals
+    validate_variations() on the same documents. Replacing document i
+    recomputes only row and column i of the similarity matrix.
+    """
+    
+    def __init__(self, differentiator, variations):
+        """
+        Initialize session.
+        
+        Args:
+            differentiator: VariationDifferentiator providing the threshold
+            variations: Starting variation texts
+        """
+        self.differentiator = differentiator
+        self.variations = list(variations)
+        self.vectorizer = _hashing_vectorizer()
+        counts = self.vectorizer.transform(self.variations)
+        self.idf = TfidfTransformer().fit(counts)
+        self.vectors = self.idf.transform(counts).tolil()
+        
+        tfidf = self.vectors.tocsr()
+        self.matrix = (tfidf @ tfidf.T).toarray()
+        np.clip(self.matrix, 0.0, 1.0, out=self.matrix)
+        np.fill_diagonal(self.matrix, 1.0)  # Same text = 100% similar
+        self.pairs_computed = len(self.variations) * (len(self.variations) - 1) // 2
+    
+    def replace(self, index, text):
+        """
+        Replace one variation and update its row and column.
+        
+        Args:
+            index: 0-based index of the variation
+            text: New variation text
+        """
+        vector = self.idf.transform(self.vectorizer.transform([text]))
+        self.variations[index] = text
+        self.vectors[index] = vector
+        
+        row = (self.vectors.tocsr() @ vector.T).toarray().ravel()
+        np.clip(row, 0.0, 1.0, out=row)
+        row[index] = 1.0
+        self.matrix[index, :] = row
+        self.matrix[:, index] = row
+        self.pairs_computed += len(self.variations) - 1
+    
+    def validate(self):
+        """
+        Validate the current variations.
+        
+        Returns:
+            Dictionary as returned by VariationDifferentiator.validate_variations();
+            pairs_computed counts the pairs scored since the previous validate()
+        """
+        if len(self.variations) < 2:
+            return self.differentiator.validate_variations(self.variations)
+        validation = self.differentiator._summarize(self.matrix, self.pairs_computed)
+        self.pairs_computed = 0  # Counted again from the next replace()
+        return validation
+    
+    def suggest_regeneration(self):
+        """Index of the variation to regenerate, or None if all are different enough."""
+        return self.differentiator._suggest_from(self.validate(), len(self.variations))
+
+
+def _hashing_vectorizer():
+    """Term counts hashed into a fixed feature space; TfidfTransformer adds IDF and L2 norm."""
+    return HashingVectorizer(
+        n_features=2 ** 18,
+        stop_words='english',
+        ngram_range=(1, 2),
+        alternate_sign=False,
+        norm=None
+    )
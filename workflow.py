@@ -6,9 +6,18 @@ from config import Config
 from utils import (
     ensure_dir, write_file, get_timestamp, print_header, print_section,
     print_success, print_error, print_info, get_user_choice, get_user_input,
-    display_content
+    display_content, print_stream_chunk
 )
 from citation_validator import validate_citations
+from token_budget import get_usage_log
+from api_client import get_single_flight
+from provider_router import get_provider_router
+from llm_scheduler import get_scheduler
+from session_cassette import get_cassette, interactive
+
+# Answers to workflow prompts are part of a recorded session
+get_user_choice = interactive(get_user_choice, 'choice')
+get_user_input = interactive(get_user_input, 'input')
 
 # Import enhancement modules if enabled
 if Config.ENABLE_QUALITY_SCORING:
@@ -20,6 +29,9 @@ if Config.ENABLE_WORKFLOW_MEMORY:
 if Config.ENABLE_VARIATION_VALIDATION:
     from variation_differentiator import VariationDifferentiator
 
+if Config.ENABLE_ORIGINALITY_CHECK:
+    from originality_index import get_originality_index
+
 class AIContentStudioWorkflow:
     """Orchestrates the 3-agent content creation workflow."""
     
@@ -29,10 +41,17 @@ class AIContentStudioWorkflow:
         self.llmon = LLMONAgent()
         self.editor = EditorAgent()
         
+        # Render writer and editor output token-by-token. LLMON variations run
+        # in parallel, so each is shown once complete (ENABLE_VARIATION_STREAMING).
+        if Config.ENABLE_STREAMING_OUTPUT:
+            self.writer.client.stream_handler = print_stream_chunk
+            self.editor.client.stream_handler = print_stream_chunk
+        
         # Initialize enhancement modules
         self.quality_analyzer = QualityAnalyzer() if Config.ENABLE_QUALITY_SCORING else None
         self.workflow_memory = WorkflowMemory(Config.MEMORY_DIR) if Config.ENABLE_WORKFLOW_MEMORY else None
         self.differentiator = VariationDifferentiator(Config.MIN_VARIATION_DIFFERENCE) if Config.ENABLE_VARIATION_VALIDATION else None
+        self.originality_index = get_originality_index() if Config.ENABLE_ORIGINALITY_CHECK else None
         
         # Initialize session tracking
         self.session_id = get_timestamp()
@@ -66,6 +85,10 @@ class AIContentStudioWorkflow:
             enhancements.append("Variation Validation")
         if Config.ENABLE_MULTIPASS_EDITING:
             enhancements.append("Multi-Pass Editing")
+        if Config.ENABLE_STREAMING_OUTPUT:
+            enhancements.append("Streaming Output")
+        if Config.ENABLE_ORIGINALITY_CHECK:
+            enhancements.append("Originality Check")
         
         if enhancements:
             print_info(f"Active Enhancements: {', '.join(enhancements)}")
@@ -94,9 +117,17 @@ class AIContentStudioWorkflow:
             # Save final output
             final_path = os.path.join(self.session_dir, "FINAL_ARTICLE.md")
             write_file(final_path, final_article)
+            self._check_originality("Final article", final_article, final_path)
+            self._save_originality_index()
             
             print_header("WORKFLOW COMPLETE")
             print_success(f"Final article saved to: {final_path}")
+            self._report_cache_stats()
+            self._report_rate_limiter_stats()
+            self._report_routing_stats()
+            self._report_scheduler_stats()
+            self._report_token_usage()
+            self._report_cassette_stats()
             
         except KeyboardInterrupt:
             print_error("\n\nWorkflow interrupted by user")
@@ -185,12 +216,14 @@ class AIContentStudioWorkflow:
         if self.quality_analyzer:
             scores = self.quality_analyzer.analyze(draft, self.template_content, self.references_content)
             print(self.quality_analyzer.format_score_summary(scores))
+        self._check_originality("Draft", draft)
         
         # Revision loop
         revision_count = 0
         while True:
             display_content("WRITER'S DRAFT", draft)
             
+            self._prewarm_connections()
             choice = get_user_choice(
                 "What would you like to do?",
                 ["[OK] Approve and continue to LLMON", 
@@ -287,6 +320,7 @@ class AIContentStudioWorkflow:
         while True:
             display_content("ARTICLE OUTLINE", outline)
             
+            self._prewarm_connections()
             choice = get_user_choice(
                 "What would you like to do with this outline?",
                 ["[OK] Approve and proceed to writing",
@@ -344,33 +378,50 @@ class AIContentStudioWorkflow:
             if Config.ENABLE_PARALLEL_VARIATIONS:
                 print_info("Using parallel generation for faster processing...")
             
-            try:
-                # Choose method based on content mode
-                if self.content_mode == 'tool_review':
-                    # Tool review variations preserve story elements and factual details
-                    variations = self.llmon.generate_variations_tool_review(
-                        article, rules_path, self.differentiator
-                    )
-                else:
-                    # Regular article variations
-                    if Config.ENABLE_PARALLEL_VARIATIONS:
-                        variations = self.llmon.generate_variations_parallel(
+            # Over-generated candidates are only shown once the diverse subset is picked
+            streaming = (Config.ENABLE_VARIATION_STREAMING and Config.ENABLE_PARALLEL_VARIATIONS
+                         and not self.llmon.overgenerating)
+            if streaming:
+                # Each variation is scored and shown as soon as it arrives
+                streamed = self._stream_variations(article, rules_path)
+                if streamed is None:
+                    return None
+                variations, picked = streamed
+            else:
+                try:
+                    # Choose method based on content mode
+                    if self.content_mode == 'tool_review':
+                        # Tool review variations preserve story elements and factual details
+                        variations = self.llmon.generate_variations_tool_review(
                             article, rules_path, self.differentiator
                         )
                     else:
-                        variations = self.llmon.generate_variations(article, rules_path)
+                        # Regular article variations
+                        if Config.ENABLE_PARALLEL_VARIATIONS:
+                            variations = self.llmon.generate_variations_parallel(
+                                article, rules_path, self.differentiator
+                            )
+                        else:
+                            variations = self.llmon.generate_variations(article, rules_path)
                 
-            except Exception as e:
-                print_error(f"Failed to generate variations: {str(e)}")
-                return None
+                except Exception as e:
+                    print_error(f"Failed to generate variations: {str(e)}")
+                    return None
             
-            # Save variations
+            # Save variations (an early pick leaves the cancelled ones as None)
             for i, variation in enumerate(variations, 1):
+                if variation is None:
+                    continue
                 var_path = os.path.join(
                     self.session_dir, 
                     f"02_llmon_variation{i}_iter{iteration_count}.md"
                 )
                 write_file(var_path, variation)
+                self._check_originality(f"Variation {i}", variation, var_path)
+            self._save_originality_index()
+            
+            if streaming and picked is not None:
+                return self._accept_variation(variations, picked)
             
             # Show differentiation report
             if self.differentiator:
@@ -378,7 +429,7 @@ class AIContentStudioWorkflow:
                 print(diff_report)
             
             # Show quality scores for each variation
-            if self.quality_analyzer:
+            if self.quality_analyzer and not streaming:
                 print_section("VARIATION QUALITY SCORES")
                 for i, variation in enumerate(variations, 1):
                     scores = self.quality_analyzer.analyze(variation, self.template_content, self.references_content)
@@ -389,8 +440,9 @@ class AIContentStudioWorkflow:
                           f"Engagement: {scores['engagement']['score']}/100")
             
             # Display variations
-            for i, variation in enumerate(variations, 1):
-                display_content(f"VARIATION {i}", variation, max_lines=25)
+            if not streaming:
+                for i, variation in enumerate(variations, 1):
+                    display_content(f"VARIATION {i}", variation, max_lines=25)
             
             # User choice
             options = [f"Select Variation {i}" for i in range(1, len(variations) + 1)]
@@ -399,18 +451,11 @@ class AIContentStudioWorkflow:
                 "[STOP] Reject all and stop workflow"
             ])
             
+            self._prewarm_connections()
             choice = get_user_choice("What would you like to do?", options)
             
             if choice and 1 <= choice <= len(variations):  # Select variation
-                selected = variations[choice - 1]
-                print_success(f"Variation {choice} selected!")
-                
-                # Record approval in memory
-                if self.workflow_memory:
-                    quality_scores = self.quality_analyzer.analyze(selected, self.template_content, self.references_content) if self.quality_analyzer else None
-                    self.workflow_memory.add_approval('llmon', quality_scores)
-                
-                return selected
+                return self._accept_variation(variations, choice - 1)
             
             elif choice == len(variations) + 1:  # Iterate with edited rules
                 print_section("EDIT LLMON RULES")
@@ -446,6 +491,93 @@ class AIContentStudioWorkflow:
                 
                 return None
     
+    def _accept_variation(self, variations, index):
+        """Record the chosen LLMON variation and return it."""
+        selected = variations[index]
+        print_success(f"Variation {index + 1} selected!")
+        
+        # Record approval in memory
+        if self.workflow_memory:
+            quality_scores = self.quality_analyzer.analyze(selected, self.template_content, self.references_content) if self.quality_analyzer else None
+            self.workflow_memory.add_approval('llmon', quality_scores)
+        
+        return selected
+    
+    def _stream_variations(self, article, rules_path):
+        """
+        Show each LLMON variation as soon as it is generated and offer an early pick.
+        
+        Every arrival is scored, displayed and compared against the variations
+        already shown. While others are still generating, the user can select
+        the one just shown, which cancels the requests still in flight. Once
+        all have arrived, variations that are too similar are regenerated and
+        shown again.
+        
+        While a session cassette is recording or replaying there is no early
+        pick: whether it is offered depends on arrival timing, and cancelled
+        requests would never reach the cassette, so the replayed calls and
+        answers would no longer line up with the recording.
+        
+        Args:
+            article: Article to transform
+            rules_path: Path to the LLMON rules file
+        
+        Returns:
+            (variations, picked index or None), or None if generation failed
+        """
+        try:
+            stream = self.llmon.stream_variations(article, rules_path)
+        except Exception as e:
+            print_error(f"Failed to generate variations: {str(e)}")
+            return None
+        
+        variations = [None] * self.llmon.versions_count
+        early_pick = get_cassette() is None
+        try:
+            for index, variation in stream:
+                variations[index] = variation
+                self._show_variation(index, variation, variations)
+                
+                if early_pick and stream.pending:
+                    choice = get_user_choice(
+                        f"Variation {index + 1} is ready ({stream.pending} still generating)",
+                        [f"Select Variation {index + 1} now (cancels the rest)", "Keep waiting for the others"]
+                    )
+                    if choice == 1:
+                        cancelled = stream.cancel()
+                        if cancelled:
+                            print_info(f"Cancelled {cancelled} in-flight variation request(s)")
+                        return variations, index
+            
+            regenerated = self.llmon.ensure_differentiation(article, stream.rules, variations, self.differentiator)
+        except Exception as e:
+            stream.cancel()
+            print_error(f"Failed to generate variations: {str(e)}")
+            return None
+        
+        for index in regenerated:
+            print_info(f"Variation {index + 1} was too similar to another and has been regenerated")
+            self._show_variation(index, variations[index])
+        
+        return variations, None
+    
+    def _show_variation(self, index, variation, variations=None):
+        """Print one variation with its quality score and its difference from the others shown so far."""
+        title = f"VARIATION {index + 1}"
+        if self.quality_analyzer:
+            scores = self.quality_analyzer.analyze(variation, self.template_content, self.references_content)
+            title += f" (Overall {scores['overall_score']}/100)"
+        display_content(title, variation, max_lines=25)
+        
+        if not self.differentiator or not variations:
+            return
+        for other, text in enumerate(variations):
+            if other == index or text is None:
+                continue
+            difference = self.differentiator.calculate_difference(variation, text)
+            note = "" if difference >= self.differentiator.min_difference else " [below threshold]"
+            print_info(f"Variation {index + 1} vs {other + 1}: {difference * 100:.1f}% different{note}")
+    
     def _editor_stage(self, article):
         """Execute Editor agent stage with multi-pass editing and revision option."""
         print_header("STAGE 3: EDITOR AGENT")
@@ -489,6 +621,15 @@ class AIContentStudioWorkflow:
         polished_path = os.path.join(self.session_dir, "03_editor_polished.md")
         write_file(polished_path, polished)
         
+        cascade = self.editor.cascade_stats
+        if cascade['passes']:
+            print_info(
+                f"Editor cascade: {cascade['passes'] - cascade['escalated']} of {cascade['passes']} pass(es) "
+                f"kept the small model's edit, {cascade['escalated']} escalated to {self.editor.client.model}"
+            )
+            for reason in cascade['reasons']:
+                print_info(f"  Escalated {reason}")
+        
         # Show quality scores
         if self.quality_analyzer:
             scores = self.quality_analyzer.analyze(polished, self.template_content, self.references_content)
@@ -499,6 +640,7 @@ class AIContentStudioWorkflow:
         while True:
             display_content("POLISHED ARTICLE", polished)
             
+            self._prewarm_connections()
             choice = get_user_choice(
                 "What would you like to do?",
                 ["[OK] Approve as final output",
@@ -556,5 +698,151 @@ class AIContentStudioWorkflow:
                     self.workflow_memory.add_feedback('editor', "Rejected final polish", approved=False, content_snippet=polished)
                 
                 return None
-
-
+    
+    def _check_originality(self, label, text, path=None):
+        """
+        Print how original a text is compared with the outputs of earlier sessions.
+        
+        Args:
+            label: Name used in the message (for example "Variation 2")
+            text: Text to score
+            path: Output file the text was saved to; it is indexed for later sessions
+        """
+        if self.originality_index is None:
+            return
+        
+        result = self.originality_index.originality(text, exclude_prefix=f"{self.session_id}/")
+        if result['closest']:
+            message = (f"{label} originality: {result['score']:.0f}/100 (closest earlier output: "
+                       f"{result['closest']}, {result['similarity'] * 100:.0f}% shared phrasing)")
+        else:
+            message = f"{label} originality: 100/100 (nothing similar among {result['indexed']} indexed output(s))"
+        
+        if result['score'] < Config.ORIGINALITY_WARN_SCORE:
+            print_error(f"⚠️  {message}")
+        else:
+            print_info(message)
+        
+        if path:
+            self.originality_index.add_file(path, text)
+    
+    def _save_originality_index(self):
+        """Persist outputs indexed so far (if this fails, the next session re-syncs them)."""
+        if self.originality_index is None:
+            return
+        try:
+            self.originality_index.save()
+        except OSError as e:
+            print_error(f"Could not save originality index: {str(e)}")
+    
+    def _prewarm_connections(self):
+        """Warm the shared connection pool while the user reads and decides."""
+        if Config.ENABLE_CONNECTION_PREWARM:
+            self.writer.client.prewarm()
+    
+    def _report_cache_stats(self):
+        """Print response cache hit/miss and request coalescing counters for this session."""
+        cache = self.writer.client.cache
+        if cache:
+            stats = cache.get_stats()
+            print_info(
+                f"Response cache: {stats['hits']} hit(s), {stats['misses']} miss(es) "
+                f"({stats['hit_rate']*100:.0f}% hit rate, {stats['entries']} entries)"
+            )
+        
+        if Config.ENABLE_REQUEST_COALESCING:
+            stats = get_single_flight().get_stats()
+            if stats['coalesced_calls']:
+                print_info(
+                    f"Request coalescing: {stats['coalesced_calls']} call(s) shared an identical in-flight "
+                    f"request ({stats['upstream_requests']} upstream)"
+                )
+    
+    def _report_rate_limiter_stats(self):
+        """Print time spent queueing for rate limits vs waiting on the model."""
+        limiter = self.writer.client.rate_limiter
+        if not limiter:
+            return
+        
+        stats = limiter.get_stats()
+        if not stats['total_requests']:
+            return
+        
+        print_info(
+            f"API requests: {stats['total_requests']} "
+            f"({stats['throttled_requests']} throttled, concurrency limit {stats['concurrency_limit']:.1f})"
+        )
+        print_info(
+            f"Queueing delay: {stats['total_queue_delay']:.1f}s total, {stats['avg_queue_delay']:.2f}s avg | "
+            f"Model latency: {stats['total_model_latency']:.1f}s total, {stats['avg_model_latency']:.2f}s avg"
+        )
+    
+    def _report_routing_stats(self):
+        """Print per-provider call counts, failures, latency and circuit state (AI_PROVIDER=auto)."""
+        if Config.AI_PROVIDER != 'auto':
+            return
+        
+        for name, stats in get_provider_router().get_stats().items():
+            if not stats['calls']:
+                continue
+            latency = f"{stats['latency']:.2f}s avg latency" if stats['latency'] is not None else "no latency sample"
+            print_info(
+                f"Routing ({name}): {stats['calls']} call(s), {stats['failures']} failed, "
+                f"{latency}, circuit {stats['state'].replace('_', '-')}"
+            )
+    
+    def _report_scheduler_stats(self):
+        """Print how many calls waited for a global in-flight slot, per priority class."""
+        if not Config.ENABLE_LLM_SCHEDULER:
+            return
+        
+        stats = get_scheduler().get_stats()
+        if not any(stats['queued'].values()):
+            return
+        
+        waits = ", ".join(
+            f"{name} {stats['queued'][name]} queued / {stats['queue_delay'][name]:.1f}s"
+            for name in stats['queued'] if stats['queued'][name]
+        )
+        print_info(f"Scheduler: peak {stats['peak_in_flight']}/{stats['max_in_flight']} in flight | {waits}")
+    
+    def _report_token_usage(self):
+        """Print prompt and completion token totals from the API call log."""
+        if not Config.ENABLE_API_CALL_LOG:
+            return
+        
+        totals = get_usage_log().get_totals()
+        if not totals['calls']:
+            return
+        
+        print_info(
+            f"Tokens: {totals['prompt_tokens']:,} prompt + {totals['completion_tokens']:,} completion "
+            f"({totals['reasoning_tokens']:,} reasoning) across {totals['calls']} call(s); "
+            f"details in {Config.API_CALL_LOG_PATH}"
+        )
+        if totals['cached_tokens']:
+            for task, stats in get_usage_log().get_prompt_cache_stats().items():
+                print_info(
+                    f"Prompt cache ({task}): {stats['cached_tokens']:,} of {stats['prompt_tokens']:,} "
+                    f"prompt tokens cached ({stats['cached_rate']*100:.0f}%) over {stats['calls']} call(s)"
+                )
+        if totals['truncated']:
+            print_info(f"{totals['truncated']} call(s) hit their output budget (re-requested with the full budget; replies still cut off were not cached)")
+    
+    def _report_cassette_stats(self):
+        """Print how many calls were recorded to or replayed from the session cassette."""
+        cassette = get_cassette()
+        if not cassette:
+            return
+        
+        stats = cassette.get_stats()
+        if cassette.mode == 'record':
+            print_info(
+                f"Session recorded: {stats['recorded']} call(s), "
+                f"{stats['recorded_latency']:.1f}s of API time -> {cassette.path}"
+            )
+        else:
+            print_info(
+                f"Session replayed: {stats['replayed']} call(s), {stats['replayed_latency']:.1f}s simulated "
+                f"of {stats['recorded_latency']:.1f}s recorded (latency x{cassette.latency_scale})"
+            )